@@ -1,5 +1,18 @@
-from django.contrib import admin
-from .models import TipoAlga, ParametroSimulacion, Simulacion
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Sum
+from django.utils.functional import cached_property
+from .models import (
+    TipoAlga, ParametroSimulacion, Simulacion, OcupacionDiaria, ProduccionDiaria, ProduccionMensual, ProgresoTrabajo
+)
+from .exportacion import exportar_simulaciones
+from .forms import validar_presupuesto_ensayos
+from .reportes import cartera_admitida, respuesta_cartera
+from .motor import guardar_simulacion
+from .recalculo import CAMPOS_PARAMETROS, programar_seleccion
 
 # Configuración del admin para TipoAlga
 @admin.register(TipoAlga)
@@ -11,16 +24,31 @@ class TipoAlgaAdmin(admin.ModelAdmin):
     list_filter = ('creado_en',)
     search_fields = ('nombre', 'descripcion')
     ordering = ('nombre',)
+    readonly_fields = ('version_parametros',)
     
     fieldsets = (
         ('Información Básica', {
             'fields': ('nombre', 'descripcion')
         }),
         ('Parámetros de Cultivo', {
-            'fields': ('tiempo_cultivo_dias', 'porcentaje_perdida')
+            'fields': ('tiempo_cultivo_dias', 'porcentaje_perdida', 'version_parametros')
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        """
+        Al cambiar los parámetros, las simulaciones del tipo se recalculan
+        en segundo plano (ver recalculo.py).
+        """
+        super().save_model(request, obj, form, change)
+        if change and any(campo in form.changed_data for campo in CAMPOS_PARAMETROS):
+            self.message_user(
+                request,
+                'Las simulaciones de este tipo de alga que aún no comienzan a cultivarse '
+                'se están recalculando en segundo plano.',
+                messages.INFO,
+            )
+
 
 # Configuración del admin para ParametroSimulacion
 @admin.register(ParametroSimulacion)
@@ -43,6 +71,77 @@ class ParametroSimulacionAdmin(admin.ModelAdmin):
     )
 
 
+# Campos de entrada cuyo cambio obliga a recalcular la simulación
+CAMPOS_ENTRADA = [
+    'toneladas_deseadas', 'fecha_objetivo', 'tipo_alga',
+    'modo_estocastico', 'distribucion', 'variacion_perdida', 'variacion_dias', 'ensayos',
+]
+
+
+def filas_estimadas(modelo):
+    """
+    Cantidad aproximada de filas de la tabla de un modelo, sin recorrerla,
+    según las estadísticas del planificador de PostgreSQL. None si no hay
+    estadísticas o en otras bases de datos: en SQLite el mayor id sobrestima
+    la cantidad después de eliminar filas.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [modelo._meta.db_table])
+        fila = cursor.fetchone()
+    # reltuples es -1 si la tabla nunca se ha analizado
+    return fila[0] if fila and fila[0] > 0 else None
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginador del admin que cuenta las filas exactas solo hasta
+    ADMIN_CONTEO_EXACTO_MAXIMO, en vez de un COUNT(*) que recorre millones
+    de filas. Por sobre ese límite la cantidad es el tamaño estimado de la
+    tabla si la lista no tiene filtros y hay estadísticas, o si no solo un
+    mínimo ("más de N"). En esos casos se puede avanzar a cualquier página
+    que tenga filas: cada página lee una fila de más para saber si existe
+    la siguiente, y la cantidad se corrige con lo que se va conociendo.
+    """
+    # 'exacto', 'estimado' o 'minimo' (existen al menos count filas)
+    tipo_conteo = 'exacto'
+
+    @cached_property
+    def count(self):
+        limite = settings.ADMIN_CONTEO_EXACTO_MAXIMO
+        conteo = self.object_list.order_by()[:limite + 1].count()
+        if conteo <= limite:
+            return conteo
+        estimado = None if self.object_list.query.has_filters() else filas_estimadas(self.object_list.model)
+        if estimado and estimado > conteo:
+            self.tipo_conteo = 'estimado'
+            return estimado
+        self.tipo_conteo = 'minimo'
+        return conteo
+
+    def page(self, number):
+        if self.count <= settings.ADMIN_CONTEO_EXACTO_MAXIMO or self.tipo_conteo == 'exacto':
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        inicio = (number - 1) * self.per_page
+        filas = list(self.object_list[inicio:inicio + self.per_page + 1])
+        if not filas:
+            raise EmptyPage(self.error_messages['no_results'])
+        if len(filas) <= self.per_page:
+            # Es la última página: ahora se conoce la cantidad exacta
+            self.count, self.tipo_conteo = inicio + len(filas), 'exacto'
+        else:
+            self.count = max(self.count, inicio + len(filas))
+        self.__dict__.pop('num_pages', None)
+        return self._get_page(filas[:self.per_page], number, self)
+
+
 # Configuración del admin para Simulacion
 @admin.register(Simulacion)
 class SimulacionAdmin(admin.ModelAdmin):
@@ -59,9 +158,14 @@ class SimulacionAdmin(admin.ModelAdmin):
         'creado_en'
     )
     list_filter = ('tipo_alga', 'creado_en', 'fecha_objetivo')
+    list_select_related = ('usuario', 'tipo_alga')
     search_fields = ('usuario__username', 'tipo_alga__nombre', 'notas')
     ordering = ('-creado_en',)
-    readonly_fields = ('creado_en',)
+    date_hierarchy = 'creado_en'
+    # Con millones de filas los conteos exactos son lo más lento de la lista
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    readonly_fields = ('version_parametros', 'creado_en', 'actualizado_en')
     
     fieldsets = (
         ('Usuario', {
@@ -71,19 +175,139 @@ class SimulacionAdmin(admin.ModelAdmin):
             'fields': ('tipo_alga', 'toneladas_deseadas', 'fecha_objetivo')
         }),
         ('Resultados Calculados', {
-            'fields': ('toneladas_a_plantar', 'fecha_inicio_cultivo', 'dias_cultivo')
+            'fields': (
+                'toneladas_a_plantar', 'fecha_inicio_cultivo', 'dias_cultivo', 'factor_estacional',
+                'version_parametros',
+            )
+        }),
+        ('Modo Estocástico', {
+            'fields': ('modo_estocastico', 'distribucion', 'variacion_perdida', 'variacion_dias', 'ensayos'),
+            'classes': ('collapse',)
         }),
         ('Información Adicional', {
-            'fields': ('notas', 'creado_en'),
+            'fields': ('notas', 'creado_en', 'actualizado_en'),
             'classes': ('collapse',)
         }),
     )
     
+    actions = ['recalcular', 'exportar_csv', 'exportar_ndjson', 'exportar_cartera']
+    
     def save_model(self, request, obj, form, change):
         """
         Sobrescribir el método save para calcular automáticamente 
         los resultados de la simulación antes de guardar.
         """
-        if not change or any(field in form.changed_data for field in ['toneladas_deseadas', 'fecha_objetivo', 'tipo_alga']):
-            obj.calcular_simulacion()
-        super().save_model(request, obj, form, change)
+        recalcular = not change or any(field in form.changed_data for field in CAMPOS_ENTRADA)
+        guardar_simulacion(obj, recalcular=recalcular)
+
+    @admin.action(description='Recalcular seleccionadas')
+    def recalcular(self, request, queryset):
+        """
+        Encarga el recálculo de las seleccionadas al hilo de recálculos y
+        responde de inmediato: se recorren por id en bloques que se guardan
+        junto con su avance en Progreso de Trabajos (ver
+        recalculo.recalcular_seleccion).
+        Si las seleccionadas piden más ensayos Monte Carlo de los que admite
+        una petición no se recalcula ninguna.
+        """
+        ensayos = queryset.filter(modo_estocastico=True).aggregate(total=Sum('ensayos'))['total']
+        try:
+            validar_presupuesto_ensayos(ensayos or 0)
+        except ValidationError as error:
+            self.message_user(
+                request, f'{error.messages[0]} Seleccione menos simulaciones estocásticas.', messages.ERROR
+            )
+            return
+        progreso = programar_seleccion(queryset)
+        self.message_user(
+            request,
+            f'Se encargó el recálculo de las simulaciones seleccionadas. El avance se registra en '
+            f'Progreso de Trabajos como "{progreso.clave}".',
+            messages.SUCCESS
+        )
+
+    @admin.action(description='Exportar seleccionadas a CSV')
+    def exportar_csv(self, request, queryset):
+        return exportar_simulaciones(queryset.order_by('id'), 'csv', request=request)
+
+    @admin.action(description='Exportar seleccionadas a NDJSON')
+    def exportar_ndjson(self, request, queryset):
+        return exportar_simulaciones(queryset.order_by('id'), 'ndjson', request=request)
+
+    @admin.action(description='Exportar seleccionadas a un PDF de cartera')
+    def exportar_cartera(self, request, queryset):
+        if not cartera_admitida(queryset.count()):
+            self.message_user(
+                request,
+                f'Seleccione como máximo {settings.PDF_CARTERA_MAXIMO} simulaciones para un PDF de cartera.',
+                messages.ERROR
+            )
+            return
+        return respuesta_cartera(request, queryset.order_by('id'), 'Cartera de Simulaciones', 'cartera')
+
+
+# Configuración del admin para OcupacionDiaria
+@admin.register(OcupacionDiaria)
+class OcupacionDiariaAdmin(admin.ModelAdmin):
+    """
+    Panel de solo lectura con la ocupación diaria de las líneas de cultivo.
+    Se mantiene automáticamente a partir de las simulaciones.
+    """
+    list_display = ('fecha', 'tipo_alga', 'toneladas')
+    list_filter = ('tipo_alga',)
+    list_select_related = ('tipo_alga',)
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Configuración del admin para ProgresoTrabajo
+@admin.register(ProgresoTrabajo)
+class ProgresoTrabajoAdmin(admin.ModelAdmin):
+    """
+    Panel de solo lectura con el avance de los trabajos largos: recálculos
+    e importaciones.
+    """
+    list_display = ('clave', 'posicion', 'completado', 'actualizado_en')
+    list_filter = ('completado',)
+    search_fields = ('clave',)
+    ordering = ('-actualizado_en',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Configuración del admin para ProduccionDiaria y ProduccionMensual
+class ProduccionAdmin(admin.ModelAdmin):
+    """
+    Panel de solo lectura con la producción por tipo de alga y usuario.
+    Se mantiene automáticamente a partir de las simulaciones.
+    """
+    list_display = ('tipo_alga', 'usuario', 'toneladas_plantadas', 'siembras', 'toneladas_entregadas', 'entregas')
+    list_filter = ('tipo_alga',)
+    list_select_related = ('tipo_alga', 'usuario')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProduccionDiaria)
+class ProduccionDiariaAdmin(ProduccionAdmin):
+    list_display = ('fecha',) + ProduccionAdmin.list_display
+    date_hierarchy = 'fecha'
+
+
+@admin.register(ProduccionMensual)
+class ProduccionMensualAdmin(ProduccionAdmin):
+    list_display = ('mes',) + ProduccionAdmin.list_display
+    date_hierarchy = 'mes'
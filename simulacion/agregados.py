@@ -0,0 +1,384 @@
+"""
+Tablas agregadas que se mantienen de forma incremental.
+
+Cada cambio en una simulación se expresa como una ocupación que se quita
+(los valores anteriores) y otra que se agrega (los nuevos). Las ocupaciones
+de un lote se combinan por tipo de alga en un arreglo de diferencias, de
+modo que solo se leen y escriben las filas de los días que realmente
+cambian, con una consulta por tipo de alga.
+
+Las mismas ocupaciones alimentan la producción diaria y mensual por tipo
+de alga y usuario: toneladas plantadas en la fecha de inicio de cultivo y
+entregadas en la fecha objetivo. Esas variaciones se suman a las filas
+guardadas con un upsert, sin leerlas antes.
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .escritura import escritura
+from .motor import a_centesimas, desde_centesimas
+
+# Campos de Simulacion que usan las tablas agregadas; los cuatro primeros
+# definen su ocupación
+CAMPOS_OCUPACION = (
+    'tipo_alga_id', 'fecha_inicio_cultivo', 'fecha_objetivo', 'toneladas_a_plantar',
+    'usuario_id', 'toneladas_deseadas',
+)
+
+# Columnas de ProduccionDiaria y ProduccionMensual que se suman
+CAMPOS_PRODUCCION = ('toneladas_plantadas', 'toneladas_entregadas', 'siembras', 'entregas')
+
+logger = logging.getLogger(__name__)
+
+
+def ocupacion_de(simulacion):
+    """
+    Tupla (tipo_alga_id, inicio, fin, toneladas, usuario_id,
+    toneladas_deseadas) de una simulación.
+    """
+    return tuple(getattr(simulacion, campo) for campo in CAMPOS_OCUPACION)
+
+
+def ocupaciones_actuales(ids):
+    """
+    Ocupaciones guardadas en la base de datos para los ids indicados.
+    """
+    from .models import Simulacion
+
+    return list(Simulacion.objects.filter(pk__in=ids).values_list(*CAMPOS_OCUPACION))
+
+
+def deltas_por_dia(ocupaciones, signo=1):
+    """
+    Agrupa ocupaciones por tipo de alga y calcula la variación diaria con
+    un arreglo de diferencias. Retorna {tipo_alga_id: (dias, deltas)},
+    con 'dias' datetime64[D] y 'deltas' en centésimas de tonelada, solo
+    para los días con variación distinta de cero.
+    """
+    por_tipo = defaultdict(list)
+    for tipo_alga_id, inicio, fin, toneladas, *_, sig in ocupaciones:
+        por_tipo[tipo_alga_id].append((inicio, fin, toneladas, sig))
+
+    resultado = {}
+    for tipo_alga_id, filas in por_tipo.items():
+        inicios = np.array([fila[0] for fila in filas], dtype='datetime64[D]')
+        fines = np.array([fila[1] for fila in filas], dtype='datetime64[D]')
+        toneladas = a_centesimas(fila[2] for fila in filas) * np.array([fila[3] for fila in filas])
+        origen = inicios.min()
+        largo = int((fines.max() - origen).astype(np.int64)) + 1
+
+        diferencias = np.zeros(largo + 1, dtype=np.int64)
+        np.add.at(diferencias, (inicios - origen).astype(np.int64), toneladas)
+        np.add.at(diferencias, (fines - origen).astype(np.int64), -toneladas)
+        deltas = np.cumsum(diferencias[:-1])
+
+        dias = np.flatnonzero(deltas)
+        if len(dias):
+            resultado[tipo_alga_id] = (origen + dias.astype('timedelta64[D]'), deltas[dias])
+    return resultado
+
+
+def _aplicar_ocupacion(deltas):
+    from .models import OcupacionDiaria
+
+    for tipo_alga_id, (dias, cambios) in deltas.items():
+        fechas = dias.astype(object)
+        existentes = dict(
+            OcupacionDiaria.objects.select_for_update().filter(
+                tipo_alga_id=tipo_alga_id, fecha__range=(fechas[0], fechas[-1])
+            ).values_list('fecha', 'toneladas').order_by()
+        )
+        # Filas nuevas y modificadas se escriben juntas con un upsert sobre
+        # (tipo_alga, fecha); bulk_update arma un CASE por fila y es lento
+        escribir, vacias, faltantes = [], [], []
+        for fecha, cambio in zip(fechas, cambios.tolist()):
+            anterior = existentes.get(fecha)
+            if anterior is None and cambio < 0:
+                # Quitar toneladas de un día sin ocupación: la tabla no
+                # coincide con las simulaciones
+                faltantes.append(fecha)
+                continue
+            total = cambio if anterior is None else int(anterior * 100) + cambio
+            if total == 0:
+                vacias.append(fecha)
+            else:
+                escribir.append(OcupacionDiaria(
+                    tipo_alga_id=tipo_alga_id, fecha=fecha, toneladas=desde_centesimas(total)
+                ))
+
+        OcupacionDiaria.objects.bulk_create(
+            escribir,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['tipo_alga', 'fecha'],
+            update_fields=['toneladas'],
+        )
+        if vacias:
+            OcupacionDiaria.objects.filter(tipo_alga_id=tipo_alga_id, fecha__in=vacias).delete()
+        if faltantes:
+            logger.warning(
+                'La ocupación diaria del tipo de alga %s no tiene filas para %d días (%s a %s) de los que se '
+                'quitan toneladas; ejecute reconstruir_ocupacion.',
+                tipo_alga_id, len(faltantes), faltantes[0], faltantes[-1],
+            )
+
+
+def deltas_produccion(ocupaciones):
+    """
+    Variación de la producción diaria de un lote de ocupaciones con signo.
+    Retorna {(fecha, tipo_alga_id, usuario_id): [plantadas, entregadas,
+    siembras, entregas]}, con las toneladas en centésimas, solo para las
+    claves que cambian.
+    """
+    if not ocupaciones:
+        return {}
+    plantadas = a_centesimas(fila[3] for fila in ocupaciones).tolist()
+    entregadas = a_centesimas(fila[5] for fila in ocupaciones).tolist()
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for (tipo_alga_id, inicio, fin, _, usuario_id, _, signo), plantada, entregada in zip(
+        ocupaciones, plantadas, entregadas
+    ):
+        siembra = deltas[inicio, tipo_alga_id, usuario_id]
+        siembra[0] += signo * plantada
+        siembra[2] += signo
+        entrega = deltas[fin, tipo_alga_id, usuario_id]
+        entrega[1] += signo * entregada
+        entrega[3] += signo
+    return {clave: valores for clave, valores in deltas.items() if any(valores)}
+
+
+def por_mes(deltas):
+    """
+    Agrupa variaciones diarias de producción por mes (primer día del mes).
+    """
+    mensuales = defaultdict(lambda: [0, 0, 0, 0])
+    for (fecha, tipo_alga_id, usuario_id), valores in deltas.items():
+        acumulado = mensuales[fecha.replace(day=1), tipo_alga_id, usuario_id]
+        for posicion, valor in enumerate(valores):
+            acumulado[posicion] += valor
+    return {clave: valores for clave, valores in mensuales.items() if any(valores)}
+
+
+def _aplicar_produccion(modelo, campo_fecha, deltas):
+    """
+    Suma las variaciones a las filas de producción sin leerlas antes: las
+    claves que ganan simulaciones con un INSERT ... ON CONFLICT DO UPDATE
+    que incrementa los valores guardados (SQLite y PostgreSQL), y las que
+    solo pierden con un UPDATE, que no hace nada si la fila ya se eliminó
+    en cascada con su tipo de alga o usuario. Las filas que quedan sin
+    siembras ni entregas se eliminan.
+    """
+    if not deltas:
+        return
+    conexion = connections[DEFAULT_DB_ALIAS]
+    nombre = conexion.ops.quote_name
+    tabla = nombre(modelo._meta.db_table)
+    clave = [nombre(columna) for columna in (campo_fecha, 'tipo_alga_id', 'usuario_id')]
+    sumas = [nombre(columna) for columna in CAMPOS_PRODUCCION]
+    donde = ' AND '.join(f'{columna} = %s' for columna in clave)
+    insertar = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT ({}) DO UPDATE SET {}'.format(
+        tabla,
+        ', '.join(clave + sumas),
+        ', '.join(['%s'] * (len(clave) + len(sumas))),
+        ', '.join(clave),
+        ', '.join(f'{columna} = {tabla}.{columna} + excluded.{columna}' for columna in sumas),
+    )
+    restar = 'UPDATE {} SET {} WHERE {}'.format(
+        tabla, ', '.join(f'{columna} = {columna} + %s' for columna in sumas), donde
+    )
+    eliminar = 'DELETE FROM {} WHERE {} AND {} = 0 AND {} = 0'.format(
+        tabla, donde, nombre('siembras'), nombre('entregas')
+    )
+
+    agregadas, restadas, quitadas = [], [], []
+    for (fecha, tipo_alga_id, usuario_id), (plantadas, entregadas, siembras, entregas) in deltas.items():
+        fila_clave = [conexion.ops.adapt_datefield_value(fecha), tipo_alga_id, usuario_id]
+        valores = [
+            conexion.ops.adapt_decimalfield_value(desde_centesimas(plantadas), 16, 2),
+            conexion.ops.adapt_decimalfield_value(desde_centesimas(entregadas), 16, 2),
+            siembras, entregas,
+        ]
+        if siembras > 0 or entregas > 0:
+            agregadas.append(fila_clave + valores)
+        else:
+            restadas.append(valores + fila_clave)
+        # Solo una fila que pierde simulaciones puede quedar vacía
+        if siembras < 0 or entregas < 0:
+            quitadas.append(fila_clave)
+    with conexion.cursor() as cursor:
+        if agregadas:
+            cursor.executemany(insertar, agregadas)
+        if restadas:
+            cursor.executemany(restar, restadas)
+        if quitadas:
+            cursor.executemany(eliminar, quitadas)
+
+
+def aumentar_versiones(usuario_ids):
+    """
+    Aumenta en uno la versión de las simulaciones de cada usuario (ver
+    VersionSimulaciones) con un upsert, sin leerla antes.
+    """
+    from .models import VersionSimulaciones
+
+    usuario_ids = sorted(set(usuario_ids))
+    if not usuario_ids:
+        return
+    conexion = connections[DEFAULT_DB_ALIAS]
+    nombre = conexion.ops.quote_name
+    tabla = nombre(VersionSimulaciones._meta.db_table)
+    version = nombre('version')
+    with conexion.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO {0} ({1}, {2}) VALUES (%s, 1) ON CONFLICT ({1}) DO UPDATE SET {2} = {0}.{2} + 1'.format(
+                tabla, nombre('usuario_id'), version
+            ),
+            [(usuario_id,) for usuario_id in usuario_ids],
+        )
+
+
+def registrar_cambios(quitar=(), agregar=()):
+    """
+    Actualiza las tablas agregadas quitando las ocupaciones anteriores y
+    agregando las nuevas. Ambas son iterables de tuplas como las de
+    ocupacion_de(). También aumenta la versión de las simulaciones de los
+    usuarios involucrados.
+    """
+    from .models import ProduccionDiaria, ProduccionMensual
+
+    ocupaciones = [(*fila, -1) for fila in quitar] + [(*fila, 1) for fila in agregar]
+    if not ocupaciones:
+        return
+    with escritura():
+        _aplicar_ocupacion(deltas_por_dia(ocupaciones))
+        diarios = deltas_produccion(ocupaciones)
+        _aplicar_produccion(ProduccionDiaria, 'fecha', diarios)
+        _aplicar_produccion(ProduccionMensual, 'mes', por_mes(diarios))
+        aumentar_versiones(fila[4] for fila in ocupaciones)
+
+
+def reconstruir_ocupacion(tamano_bloque=10000):
+    """
+    Reconstruye por completo la tabla de ocupación diaria a partir de
+    todas las simulaciones. Retorna la cantidad de filas creadas.
+    """
+    from .models import OcupacionDiaria, Simulacion
+
+    acumulado = {}
+    filas = Simulacion.objects.values_list(*CAMPOS_OCUPACION[:4]).order_by().iterator(chunk_size=tamano_bloque)
+    bloque = []
+    for fila in filas:
+        bloque.append((*fila, 1))
+        if len(bloque) >= tamano_bloque:
+            _acumular(acumulado, deltas_por_dia(bloque))
+            bloque = []
+    _acumular(acumulado, deltas_por_dia(bloque))
+
+    with escritura():
+        OcupacionDiaria.objects.all().delete()
+        creadas = 0
+        for tipo_alga_id, por_dia in acumulado.items():
+            filas_nuevas = [
+                OcupacionDiaria(tipo_alga_id=tipo_alga_id, fecha=fecha, toneladas=desde_centesimas(toneladas))
+                for fecha, toneladas in sorted(por_dia.items())
+                if toneladas
+            ]
+            OcupacionDiaria.objects.bulk_create(filas_nuevas, batch_size=1000)
+            creadas += len(filas_nuevas)
+    return creadas
+
+
+def reconstruir_produccion():
+    """
+    Reconstruye por completo la producción diaria y mensual a partir de
+    todas las simulaciones, agrupando en la base de datos. Retorna la
+    cantidad de filas diarias y mensuales creadas.
+    """
+    from django.db.models import Count, Sum
+
+    from .models import ProduccionDiaria, ProduccionMensual, Simulacion
+
+    diarios = defaultdict(lambda: [0, 0, 0, 0])
+    for campo_fecha, campo_toneladas, posicion in (
+        ('fecha_inicio_cultivo', 'toneladas_a_plantar', 0),
+        ('fecha_objetivo', 'toneladas_deseadas', 1),
+    ):
+        grupos = list(
+            Simulacion.objects.values_list(campo_fecha, 'tipo_alga_id', 'usuario_id')
+            .annotate(toneladas=Sum(campo_toneladas), cantidad=Count('id')).order_by()
+        )
+        toneladas = a_centesimas(grupo[3] for grupo in grupos).tolist() if grupos else []
+        for (fecha, tipo_alga_id, usuario_id, _, cantidad), total in zip(grupos, toneladas):
+            valores = diarios[fecha, tipo_alga_id, usuario_id]
+            valores[posicion] += total
+            valores[posicion + 2] += cantidad
+
+    def filas(modelo, campo_fecha, deltas):
+        return [
+            modelo(**{campo_fecha: fecha}, tipo_alga_id=tipo_alga_id, usuario_id=usuario_id,
+                   toneladas_plantadas=desde_centesimas(plantadas), toneladas_entregadas=desde_centesimas(entregadas),
+                   siembras=siembras, entregas=entregas)
+            for (fecha, tipo_alga_id, usuario_id), (plantadas, entregadas, siembras, entregas) in deltas.items()
+        ]
+
+    with escritura():
+        ProduccionDiaria.objects.all().delete()
+        ProduccionMensual.objects.all().delete()
+        creadas_diarias = ProduccionDiaria.objects.bulk_create(filas(ProduccionDiaria, 'fecha', diarios), batch_size=1000)
+        creadas_mensuales = ProduccionMensual.objects.bulk_create(
+            filas(ProduccionMensual, 'mes', por_mes(diarios)), batch_size=1000
+        )
+    return len(creadas_diarias), len(creadas_mensuales)
+
+
+def _acumular(acumulado, deltas):
+    for tipo_alga_id, (dias, cambios) in deltas.items():
+        por_dia = acumulado.setdefault(tipo_alga_id, defaultdict(int))
+        for fecha, cambio in zip(dias.astype(object), cambios.tolist()):
+            por_dia[fecha] += cambio
+
+
+def ocupacion_en_rango(desde, hasta, tipo_alga_id=None):
+    """
+    Toneladas en cultivo por día y tipo de alga entre dos fechas
+    (inclusive), leídas desde la tabla de ocupación diaria.
+    """
+    from .models import OcupacionDiaria
+
+    filas = OcupacionDiaria.objects.filter(fecha__range=(desde, hasta))
+    if tipo_alga_id is not None:
+        filas = filas.filter(tipo_alga_id=tipo_alga_id)
+    return filas.values_list('fecha', 'tipo_alga_id', 'toneladas').order_by('fecha', 'tipo_alga_id')
+
+
+def produccion_del_anio(anio, agrupar='tipo_alga', usuario_id=None):
+    """
+    Toneladas plantadas y entregadas por mes de un año, agrupadas por tipo
+    de alga o por usuario ('agrupar'), leídas desde la producción mensual.
+    Retorna filas (mes, id, plantadas, entregadas, siembras, entregas).
+    """
+    from django.db.models import Sum
+
+    from .models import ProduccionMensual
+
+    filas = ProduccionMensual.objects.filter(mes__year=anio)
+    if usuario_id is not None:
+        filas = filas.filter(usuario_id=usuario_id)
+    campo = f'{agrupar}_id'
+    filas = list(
+        filas.values_list('mes', campo)
+        .annotate(Sum('toneladas_plantadas'), Sum('toneladas_entregadas'), Sum('siembras'), Sum('entregas'))
+        .order_by('mes', campo)
+    )
+    if not filas:
+        return []
+    # SQLite suma los decimales como números de punto flotante
+    plantadas = a_centesimas(fila[2] for fila in filas).tolist()
+    entregadas = a_centesimas(fila[3] for fila in filas).tolist()
+    return [
+        (mes, grupo, desde_centesimas(plantada), desde_centesimas(entregada), siembras, entregas)
+        for (mes, grupo, _, _, siembras, entregas), plantada, entregada in zip(filas, plantadas, entregadas)
+    ]
@@ -0,0 +1,223 @@
+"""
+Análisis sobre el catálogo completo de tipos de alga.
+
+Evalúa las fórmulas del motor de cálculo sobre grillas completas de fechas
+y tipos de alga en una sola pasada de NumPy. Los resultados se guardan en
+memoria solo para la versión vigente del catálogo de tipos de alga y
+parámetros de simulación (ver catalogo.py).
+"""
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import catalogo
+from .estaciones import FACTOR_NEUTRO
+from .motor import a_centesimas, calcular_lote, desde_centesimas
+
+
+class _CachePorVersion:
+    """
+    Caché LRU de una función cuyo primer argumento es el catálogo. Solo se
+    guardan resultados de una versión del catálogo, con el resto de los
+    argumentos como clave: al llegar otra versión se vacía, así los
+    catálogos anteriores y sus resultados no quedan retenidos en memoria.
+    """
+
+    def __init__(self, funcion, maximo):
+        self.funcion = funcion
+        self.maximo = maximo
+        self.version = None
+        self.resultados = OrderedDict()
+        self.candado = threading.Lock()
+
+    def __call__(self, vigente, *argumentos):
+        with self.candado:
+            if vigente.version != self.version:
+                self.version = vigente.version
+                self.resultados.clear()
+            elif argumentos in self.resultados:
+                self.resultados.move_to_end(argumentos)
+                return self.resultados[argumentos]
+        # Se calcula fuera del candado; un resultado de una versión que ya
+        # se reemplazó no se guarda
+        resultado = self.funcion(vigente, *argumentos)
+        with self.candado:
+            if vigente.version == self.version:
+                self.resultados[argumentos] = resultado
+                if len(self.resultados) > self.maximo:
+                    self.resultados.popitem(last=False)
+        return resultado
+
+
+def _por_version(maximo):
+    return lambda funcion: _CachePorVersion(funcion, maximo)
+
+
+def _arreglos_catalogo(vigente):
+    """
+    Tipos de alga como arreglos: ids, nombres, días de cultivo y pérdida
+    en centésimas.
+    """
+    tipos = vigente.tipos_ordenados
+    return (
+        [tipo.id for tipo in tipos],
+        [tipo.nombre for tipo in tipos],
+        np.array([tipo.tiempo_cultivo_dias for tipo in tipos], dtype=np.int64),
+        a_centesimas(tipo.porcentaje_perdida for tipo in tipos),
+    )
+
+
+def _sumar_meses(fecha, meses):
+    mes = np.datetime64(fecha, 'M') + meses
+    dias_mes = int(((mes + 1).astype('datetime64[D]') - mes.astype('datetime64[D]')).astype(np.int64))
+    return mes.astype('datetime64[D]') + min(fecha.day, dias_mes) - 1
+
+
+def resolver_entregas(toneladas_plantar, inicio, meses, paso=1):
+    """
+    Problema inverso de la simulación: con 'toneladas_plantar' (en
+    centésimas) disponibles para sembrar en cada fecha desde 'inicio'
+    hasta 'meses' meses después (cada 'paso' días), calcula para cada
+    tipo de alga la fecha de entrega y las toneladas entregables.
+
+    Para cada tipo se evalúa el cálculo normal sobre todas las fechas
+    objetivo posibles; la fecha de entrega de una siembra es la primera
+    fecha objetivo cuyo inicio de cultivo calculado no es anterior a la
+    fecha de siembra. Las toneladas entregables son el mayor valor cuyo
+    cálculo de toneladas a plantar no supera lo disponible.
+    """
+    return _resolver_entregas(catalogo.obtener(), toneladas_plantar, inicio, meses, paso)
+
+
+@_por_version(maximo=256)
+def _resolver_entregas(vigente, toneladas_plantar, inicio, meses, paso):
+    """
+    Los resultados se guardan para la versión vigente del catálogo: al
+    cambiar el catálogo las entradas anteriores se descartan.
+    """
+    ids, nombres, dias_base, perdidas_base = _arreglos_catalogo(vigente)
+    siembras = np.arange(
+        np.datetime64(inicio, 'D'), _sumar_meses(inicio, meses) + 1, paso, dtype='datetime64[D]'
+    )
+    resultado = {
+        'toneladas_plantar': str(desde_centesimas(toneladas_plantar)),
+        'fechas_siembra': [fecha.isoformat() for fecha in siembras.astype(object)],
+        'tipos': [],
+    }
+    if not ids:
+        return resultado
+
+    # Fechas objetivo candidatas: alcanzan a cubrir el cultivo más largo
+    tabla = vigente.tabla_factores
+    dias_maximos = int(dias_base.max() * tabla.max() // FACTOR_NEUTRO) + 2
+    objetivos = np.arange(siembras[0], siembras[-1] + dias_maximos + 1, dtype='datetime64[D]')
+
+    # Cálculo directo para todos los tipos (filas) y fechas objetivo (columnas)
+    calculo = calcular_lote(
+        0, objetivos[np.newaxis, :], perdidas_base[:, np.newaxis], dias_base[:, np.newaxis],
+        tabla_estacional=tabla,
+    )
+    inicios = (calculo['fecha_inicio_cultivo'] - siembras[0]).astype(np.int64)
+
+    # El máximo acumulado del inicio es no decreciente en cada fila; al
+    # desplazar cada fila a su propio rango, una sola búsqueda binaria
+    # resuelve todos los tipos a la vez
+    cantidad_tipos, largo = inicios.shape
+    desplazamiento = (np.arange(cantidad_tipos) * (largo + dias_maximos + 1))[:, np.newaxis]
+    maximo = np.maximum.accumulate(inicios, axis=1) + desplazamiento
+    buscados = (siembras - siembras[0]).astype(np.int64)[np.newaxis, :] + desplazamiento
+    posiciones = np.searchsorted(maximo.ravel(), buscados.ravel()).reshape(cantidad_tipos, -1)
+    posiciones -= np.arange(cantidad_tipos)[:, np.newaxis] * largo
+    posiciones = np.minimum(posiciones, largo - 1)
+
+    filas = np.arange(cantidad_tipos)[:, np.newaxis]
+    perdidas = np.broadcast_to(calculo['porcentaje_perdida'], inicios.shape)[filas, posiciones]
+    dias = np.broadcast_to(calculo['dias_cultivo'], inicios.shape)[filas, posiciones]
+    entregas = objetivos[posiciones]
+
+    # Mayor D tal que redondear(D × (1 + pérdida/100)) <= toneladas a plantar.
+    # Con la mitad al par, T + 0,5 redondea a T solo si T es par
+    limite = np.int64(toneladas_plantar) * 10000 + (5000 if toneladas_plantar % 2 == 0 else 4999)
+    entregables = limite // (10000 + perdidas)
+
+    for i, (tipo_id, nombre) in enumerate(zip(ids, nombres)):
+        resultado['tipos'].append({
+            'id': tipo_id,
+            'nombre': nombre,
+            'fechas_entrega': [fecha.isoformat() for fecha in entregas[i].astype(object)],
+            'toneladas_entregables': [str(desde_centesimas(valor)) for valor in entregables[i].tolist()],
+            'dias_cultivo': dias[i].tolist(),
+        })
+    return resultado
+
+
+def barrido(toneladas, fechas, variaciones):
+    """
+    Evalúa el cálculo de la simulación sobre la grilla completa de
+    toneladas deseadas × fechas objetivo × tipos de alga × variaciones del
+    porcentaje de pérdida, para comparar alternativas antes de crear una
+    simulación.
+
+    - toneladas: (desde, hasta, paso) en centésimas de tonelada
+    - fechas: (desde, hasta, paso en días) como date
+    - variaciones: puntos porcentuales que se suman a la pérdida de cada
+      tipo de alga, en centésimas (por ejemplo (-500, 0, 500) para ±5%)
+
+    Retorna un diccionario con los ejes y la matriz de toneladas a plantar
+    de forma [tipo, variación, fecha, toneladas], en centésimas, como
+    enteros little-endian codificados en base64. Los días de cultivo no
+    dependen de la pérdida ni de las toneladas y se entregan por tipo y
+    fecha.
+    """
+    return _barrido(catalogo.obtener(), toneladas, fechas, variaciones)
+
+
+@_por_version(maximo=16)
+def _barrido(vigente, toneladas, fechas, variaciones):
+    """
+    Una sola llamada a calcular_lote con los ejes en dimensiones distintas:
+    NumPy combina todas las celdas sin recorrerlas en Python. Como en
+    _resolver_entregas, los resultados se guardan para la versión vigente
+    del catálogo; la caché guarda pocas grillas porque cada una puede
+    ocupar varios MB.
+    """
+    ids, nombres, dias_base, perdidas_base = _arreglos_catalogo(vigente)
+    desde, hasta, paso = toneladas
+    ejes_toneladas = np.arange(desde, hasta + 1, paso, dtype=np.int64)
+    objetivos = np.arange(
+        np.datetime64(fechas[0], 'D'), np.datetime64(fechas[1], 'D') + 1, fechas[2], dtype='datetime64[D]'
+    )
+    # La pérdida con variación no puede ser negativa
+    perdidas = np.maximum(perdidas_base[:, np.newaxis] + np.array(variaciones, dtype=np.int64), 0)
+
+    calculo = calcular_lote(
+        ejes_toneladas[np.newaxis, np.newaxis, np.newaxis, :],
+        objetivos[np.newaxis, np.newaxis, :, np.newaxis],
+        perdidas[:, :, np.newaxis, np.newaxis],
+        dias_base[:, np.newaxis, np.newaxis, np.newaxis],
+        tabla_estacional=vigente.tabla_factores,
+    )
+    forma = (len(ids), len(variaciones), len(objetivos), len(ejes_toneladas))
+    matriz = np.broadcast_to(calculo['toneladas_a_plantar'], forma)
+    tipo_dato = '<i4' if not matriz.size or matriz.max() <= np.iinfo(np.int32).max else '<i8'
+    dias = np.broadcast_to(calculo['dias_cultivo'], (len(ids), 1, len(objetivos), 1))[:, 0, :, 0]
+
+    return {
+        'tipos': [{'id': tipo_id, 'nombre': nombre} for tipo_id, nombre in zip(ids, nombres)],
+        'variaciones_perdida': [str(desde_centesimas(valor)) for valor in variaciones],
+        'fechas_objetivo': [fecha.isoformat() for fecha in objetivos.astype(object)],
+        'toneladas_deseadas': {
+            'desde': str(desde_centesimas(desde)),
+            'paso': str(desde_centesimas(paso)),
+            'cantidad': len(ejes_toneladas),
+        },
+        'dias_cultivo': dias.tolist(),
+        'toneladas_a_plantar': {
+            'forma': list(forma),
+            'tipo': tipo_dato,
+            'unidad': 'centésimas de tonelada',
+            'datos': base64.b64encode(np.ascontiguousarray(matriz, dtype=tipo_dato).tobytes()).decode('ascii'),
+        },
+    }
@@ -0,0 +1,237 @@
+"""
+API JSON de simulaciones.
+
+Permite a otros sistemas (por ejemplo el ERP) crear simulaciones por lotes
+y leerlas sin pasar por las páginas HTML. Usa la misma sesión de Django
+que el sitio, por lo que las escrituras requieren el token CSRF.
+
+- GET  /api/simulaciones/             lista paginada por cursor (?despues=)
+- POST /api/simulaciones/             crea un lote {"simulaciones": [...]}
+- GET  /api/simulaciones/<id>/        detalle
+
+Las lecturas responden con ETag (y Last-Modified en el detalle), de modo
+que un cliente que repite la consulta con If-None-Match recibe 304 sin
+contenido si nada cambió.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_http_methods, require_safe
+
+from . import catalogo
+from .forms import validar_datos_simulacion, validar_presupuesto_ensayos
+from .models import Simulacion, VersionSimulaciones
+from .motor import crear_simulaciones
+from .paginacion import crear_cursor, despues_de, leer_cursor
+
+# Campos que entrega la API para cada simulación
+CAMPOS_API = (
+    'id',
+    'tipo_alga_id',
+    'toneladas_deseadas',
+    'fecha_objetivo',
+    'toneladas_a_plantar',
+    'fecha_inicio_cultivo',
+    'dias_cultivo',
+    'factor_estacional',
+    'modo_estocastico',
+    'notas',
+    'creado_en',
+    'actualizado_en',
+)
+
+
+def _requiere_sesion(vista):
+    """
+    Como login_required, pero responde 401 en JSON en lugar de redirigir
+    a la página de inicio de sesión.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Autenticación requerida.'}, status=401)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def _simulacion_json(simulacion):
+    """
+    Representación JSON de una simulación. Los decimales se entregan como
+    texto para no perder precisión.
+    """
+    return {
+        'id': simulacion.id,
+        'tipo_alga': {'id': simulacion.tipo_alga_id, 'nombre': simulacion.tipo_alga.nombre},
+        'toneladas_deseadas': str(simulacion.toneladas_deseadas),
+        'fecha_objetivo': simulacion.fecha_objetivo.isoformat(),
+        'toneladas_a_plantar': str(simulacion.toneladas_a_plantar),
+        'fecha_inicio_cultivo': simulacion.fecha_inicio_cultivo.isoformat(),
+        'dias_cultivo': simulacion.dias_cultivo,
+        'factor_estacional': str(simulacion.factor_estacional),
+        'modo_estocastico': simulacion.modo_estocastico,
+        'notas': simulacion.notas,
+        'creado_en': simulacion.creado_en.isoformat(),
+        'actualizado_en': simulacion.actualizado_en.isoformat(),
+    }
+
+
+def _etag(*partes):
+    return hashlib.sha256(repr(partes).encode()).hexdigest()[:32]
+
+
+# Marcas para las lecturas condicionales
+
+def _marcas_detalle(request, pk):
+    """
+    Fecha de modificación de la simulación y de su tipo de alga (el nombre
+    del tipo forma parte de la respuesta). None si no existe.
+    """
+    fila = (
+        Simulacion.objects
+        .filter(pk=pk, usuario=request.user)
+        .values_list('actualizado_en', 'tipo_alga_id')
+        .first()
+    )
+    if fila is None:
+        return None
+    tipo = catalogo.obtener().tipos.get(fila[1])
+    return (fila[0], tipo.actualizado_en) if tipo else (fila[0],)
+
+
+def _etag_detalle(request, pk):
+    marcas = _marcas_detalle(request, pk)
+    return _etag('detalle', pk, *marcas) if marcas else None
+
+
+def _ultima_modificacion_detalle(request, pk):
+    marcas = _marcas_detalle(request, pk)
+    return max(marcas) if marcas else None
+
+
+def _etag_lista(request):
+    """
+    La lista cambia si se crea, modifica o elimina una simulación del
+    usuario (aumenta su versión, ver VersionSimulaciones) o si cambia algún
+    tipo de alga. Lee una sola fila.
+    """
+    version = (
+        VersionSimulaciones.objects
+        .filter(usuario_id=request.user.pk)
+        .values_list('version', flat=True)
+        .first()
+    )
+    return _etag(
+        'lista', request.user.pk, request.GET.get('despues', ''),
+        version or 0, catalogo.obtener().ultima_modificacion,
+    )
+
+
+# Vista de la colección: lista (GET) y creación por lotes (POST)
+@_requiere_sesion
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def simulaciones(request):
+    if request.method == 'POST':
+        return _crear_lote(request)
+    return _listar(request)
+
+
+@condition(etag_func=_etag_lista)
+def _listar(request):
+    """
+    Lista las simulaciones del usuario, paginadas por cursor igual que la
+    vista HTML. 'siguiente' es el cursor para pedir la página siguiente.
+    """
+    por_pagina = settings.API_SIMULACIONES_POR_PAGINA
+    consulta = (
+        Simulacion.objects
+        .filter(usuario=request.user)
+        .only(*CAMPOS_API)
+        .order_by('-creado_en', '-id')
+    )
+    consulta = despues_de(consulta, leer_cursor(request.GET.get('despues')))
+
+    pagina = catalogo.asignar_tipos(list(consulta[:por_pagina + 1]))
+    siguiente = None
+    if len(pagina) > por_pagina:
+        pagina = pagina[:por_pagina]
+        siguiente = crear_cursor(pagina[-1])
+
+    return JsonResponse({
+        'simulaciones': [_simulacion_json(simulacion) for simulacion in pagina],
+        'siguiente': siguiente,
+    })
+
+
+def _crear_lote(request):
+    """
+    Crea un lote de simulaciones. Cada elemento se valida con las mismas
+    reglas que el formulario; si alguno tiene errores no se crea ninguno
+    y se responde 400 con los errores por posición; si el lote pide más
+    ensayos Monte Carlo de los que admite una petición se responde 413
+    (ver forms.validar_presupuesto_ensayos). Los cálculos se hacen
+    en una sola pasada del motor y la inserción es por bloques dentro de
+    una única transacción.
+    """
+    try:
+        datos = json.loads(request.body)
+    except RequestDataTooBig:
+        return JsonResponse({'error': 'El lote es demasiado grande.'}, status=413)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'El cuerpo debe ser JSON válido.'}, status=400)
+
+    filas = datos.get('simulaciones') if isinstance(datos, dict) else datos
+    if not isinstance(filas, list) or not filas:
+        return JsonResponse({'error': 'Se espera una lista "simulaciones" no vacía.'}, status=400)
+    if len(filas) > settings.API_MAXIMO_LOTE:
+        return JsonResponse(
+            {'error': f'El lote puede tener como máximo {settings.API_MAXIMO_LOTE} simulaciones.'},
+            status=413
+        )
+
+    # Todos los tipos de alga se cargan una sola vez para validar el lote
+    tipos = catalogo.obtener().tipos
+    nuevas = []
+    errores = []
+    for posicion, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            errores.append({'posicion': posicion, 'errores': {'__all__': ['Se espera un objeto.']}})
+            continue
+        limpios, errores_fila = validar_datos_simulacion(fila, tipos)
+        if errores_fila:
+            errores.append({'posicion': posicion, 'errores': errores_fila})
+        elif not errores:
+            nuevas.append(Simulacion(usuario=request.user, **limpios))
+    if errores:
+        return JsonResponse({'error': 'El lote tiene datos inválidos.', 'detalle': errores}, status=400)
+    # Los ensayos Monte Carlo se calculan dentro de la petición
+    try:
+        validar_presupuesto_ensayos(sum(simulacion.ensayos for simulacion in nuevas if simulacion.modo_estocastico))
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages[0]}, status=413)
+
+    crear_simulaciones(nuevas)
+    return JsonResponse(
+        {'creadas': len(nuevas), 'simulaciones': [_simulacion_json(simulacion) for simulacion in nuevas]},
+        status=201
+    )
+
+
+# Vista de detalle
+@_requiere_sesion
+@require_safe
+@condition(etag_func=_etag_detalle, last_modified_func=_ultima_modificacion_detalle)
+def detalle(request, pk):
+    simulacion = (
+        Simulacion.objects
+        .filter(pk=pk, usuario=request.user)
+        .only(*CAMPOS_API)
+        .first()
+    )
+    if simulacion is None:
+        return JsonResponse({'error': 'Simulación no encontrada.'}, status=404)
+    catalogo.asignar_tipos([simulacion])
+    return JsonResponse(_simulacion_json(simulacion))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SimulacionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'simulacion'
+
+    def ready(self):
+        # Registrar las señales de la aplicación
+        from . import signals  # noqa: F401
@@ -0,0 +1,88 @@
+"""
+Precarga al arrancar el servidor.
+
+Django carga de forma perezosa las URL (y con ellas las vistas y todos sus
+módulos), arma las tablas de reverse() con el primer {% url %}, compila
+cada plantilla la primera vez que se usa y lee los catálogos de traducción y
+los formatos de fecha con la primera petición. Con
+PRECALENTAR_AL_ARRANCAR, wsgi.py y asgi.py llaman a precalentar() para
+hacer todo eso antes de recibir tráfico, así la primera petición de cada
+worker cuesta lo mismo que las demás.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import engines
+from django.template.loader_tags import ExtendsNode
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+from django.utils import formats, translation
+
+logger = logging.getLogger(__name__)
+
+
+def plantillas_del_proyecto():
+    """
+    Nombres de las plantillas del proyecto (no las de Django ni las de
+    otros paquetes instalados).
+    """
+    base = Path(settings.BASE_DIR).resolve()
+    nombres = set()
+    for motor in engines.all():
+        carpetas = [*motor.dirs, *get_app_template_dirs('templates')]
+        for carpeta in map(Path, carpetas):
+            if not carpeta.resolve().is_relative_to(base):
+                continue
+            nombres.update(ruta.relative_to(carpeta).as_posix() for ruta in carpeta.rglob('*.html'))
+    return sorted(nombres)
+
+
+def precalentar():
+    """
+    Carga URL, vistas, traducciones, plantillas del proyecto (y las que
+    extienden) y el catálogo de tipos de alga. No hace nada si
+    PRECALENTAR_AL_ARRANCAR está desactivado. Retorna los segundos usados.
+    """
+    if not settings.PRECALENTAR_AL_ARRANCAR:
+        return 0.0
+    inicio = time.perf_counter()
+
+    # Importa las vistas y arma las tablas que usa {% url %} / reverse()
+    get_resolver().reverse_dict
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+        formats.get_format('DATE_FORMAT')
+
+    motor = engines['django']
+    motor.engine.template_context_processors
+    pendientes = plantillas_del_proyecto()
+    cargadas = set()
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre in cargadas:
+            continue
+        cargadas.add(nombre)
+        plantilla = motor.get_template(nombre).template
+        # Las plantillas base se buscan al renderizar; se cargan aquí también
+        padre = plantilla.nodelist.get_nodes_by_type(ExtendsNode)[:1]
+        if padre and isinstance(padre[0].parent_name.var, str):
+            pendientes.append(padre[0].parent_name.var)
+
+    from . import catalogo
+
+    try:
+        catalogo.obtener()
+    except DatabaseError:
+        # Base de datos aún sin migrar: el catálogo se carga en la primera petición
+        logger.warning('No se pudo precargar el catálogo de tipos de alga.', exc_info=True)
+    finally:
+        # Sin conexiones abiertas: el proceso puede bifurcarse en workers
+        connections.close_all()
+
+    segundos = time.perf_counter() - inicio
+    logger.info('Precarga: %d plantillas en %.2f s.', len(cargadas), segundos)
+    return segundos
+
@@ -0,0 +1,161 @@
+"""
+Catálogo en memoria de tipos de alga y parámetros de simulación.
+
+Los tipos de alga y los ParametroSimulacion activos son pocos y casi no
+cambian, pero se leen en casi todas las peticiones: formulario, motor de
+cálculo, lista, detalle, PDF y API. Cada proceso los carga una sola vez y
+los reutiliza, de modo que esas rutas no consultan el catálogo.
+
+Para que un cambio hecho en un proceso llegue a los demás, el catálogo
+lleva una versión guardada en un archivo (CATALOGO_VERSION_ARCHIVO). Al
+confirmar un cambio se escribe una versión nueva; al comenzar cada
+petición el proceso lee el archivo y, si la versión no es la que cargó,
+descarta su copia. Leer un archivo de pocos bytes es mucho más barato que
+consultar la base de datos.
+
+Las instancias de TipoAlga del catálogo se comparten entre peticiones y
+no se deben modificar.
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .estaciones import construir_tabla
+
+_catalogo = None
+
+
+class Catalogo:
+    """
+    Copia inmutable del catálogo vigente.
+    """
+
+    def __init__(self, version, tipos, parametros):
+        self.version = version
+        # Tipos de alga ordenados por nombre y por id
+        self.tipos_ordenados = tipos
+        self.tipos = {tipo.pk: tipo for tipo in tipos}
+        self.ultima_modificacion = max((tipo.actualizado_en for tipo in tipos), default=None)
+        # Pares (estación, factor) de los parámetros activos y su tabla diaria
+        self.parametros = parametros
+        self.tabla_factores = construir_tabla(parametros)
+
+    def opciones_tipo_alga(self):
+        """
+        Opciones del campo tipo_alga del formulario.
+        """
+        return [(tipo.pk, str(tipo)) for tipo in self.tipos_ordenados]
+
+
+def _ruta_version():
+    return Path(settings.CATALOGO_VERSION_ARCHIVO)
+
+
+def _leer_version():
+    try:
+        return _ruta_version().read_text()
+    except FileNotFoundError:
+        return ''
+
+
+def _escribir_version():
+    """
+    Escribe una versión nueva. Es un valor único (no un contador), así dos
+    procesos que publican a la vez nunca escriben la misma versión.
+    """
+    ruta = _ruta_version()
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as archivo:
+        archivo.write(uuid.uuid4().hex)
+    os.replace(temporal, ruta)
+
+
+def obtener():
+    """
+    Retorna el catálogo vigente, cargándolo si hace falta.
+    """
+    global _catalogo
+    catalogo = _catalogo
+    if catalogo is None:
+        from .models import ParametroSimulacion, TipoAlga
+
+        # La versión se lee antes que los datos: si cambian entre medio, la
+        # copia queda con una versión antigua y se recarga en la próxima
+        # petición, nunca al revés
+        version = _leer_version()
+        catalogo = _catalogo = Catalogo(
+            version,
+            list(TipoAlga.objects.order_by('nombre', 'id')),
+            list(ParametroSimulacion.objects.filter(activo=True).values_list('estacion', 'factor_ajuste')),
+        )
+    return catalogo
+
+
+async def aobtener():
+    """
+    Versión de obtener() para las vistas asíncronas.
+    """
+    catalogo = _catalogo
+    if catalogo is None:
+        catalogo = await sync_to_async(obtener)()
+    return catalogo
+
+
+def verificar_version():
+    """
+    Descarta la copia del proceso si otro proceso publicó una versión
+    nueva. Se llama al comenzar cada petición.
+    """
+    global _catalogo
+    catalogo = _catalogo
+    if catalogo is not None and catalogo.version != _leer_version():
+        _catalogo = None
+
+
+def invalidar():
+    """
+    Publica una versión nueva del catálogo al confirmarse la transacción
+    actual (de inmediato si no hay una abierta), para que este y los demás
+    procesos lo vuelvan a cargar.
+    """
+    transaction.on_commit(_publicar)
+
+
+def _publicar():
+    global _catalogo
+    _escribir_version()
+    _catalogo = None
+
+
+def asignar_tipos(simulaciones):
+    """
+    Asigna a cada simulación su TipoAlga desde el catálogo, sin consultas.
+    Si falta algún tipo (recién creado en otro proceso), el catálogo se
+    vuelve a cargar.
+    """
+    global _catalogo
+    tipos = obtener().tipos
+    if any(simulacion.tipo_alga_id not in tipos for simulacion in simulaciones):
+        _catalogo = None
+        tipos = obtener().tipos
+    for simulacion in simulaciones:
+        simulacion.tipo_alga = tipos[simulacion.tipo_alga_id]
+    return simulaciones
+
+
+async def aasignar_tipos(simulaciones):
+    """
+    Versión de asignar_tipos() para las vistas asíncronas.
+    """
+    tipos = (await aobtener()).tipos
+    if any(simulacion.tipo_alga_id not in tipos for simulacion in simulaciones):
+        return await sync_to_async(asignar_tipos)(simulaciones)
+    for simulacion in simulaciones:
+        simulacion.tipo_alga = tipos[simulacion.tipo_alga_id]
+    return simulaciones
@@ -0,0 +1,41 @@
+"""
+Escrituras serializadas en la base de datos.
+
+SQLite admite un solo escritor a la vez. Con el modo WAL los lectores no
+se bloquean, pero varios hilos que intentan escribir al mismo tiempo
+compiten por el bloqueo de la base de datos y, si la espera supera el
+timeout, fallan con "database is locked". Las escrituras de la aplicación
+pasan por escritura(), que las pone en fila dentro del proceso antes de
+abrir la transacción.
+
+El candado es del proceso: no ordena las escrituras de varios workers.
+Entre procesos las ordena el propio SQLite (transacciones IMMEDIATE con
+busy_timeout, SQLITE_CONCURRENTE en settings.py), y una escritura que
+espera más que ese timeout falla igual con "database is locked".
+prueba_concurrencia solo ejercita hilos de un mismo proceso.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+_candado = threading.Lock()
+
+
+@contextmanager
+def escritura():
+    """
+    Transacción de escritura serializada.
+
+    El candado del proceso se toma siempre antes que el bloqueo de SQLite.
+    Si ya hay una transacción abierta (por ejemplo la del admin, que ya
+    tiene el bloqueo de escritura) solo se abre un punto de guardado: tomar
+    el candado en ese momento invertiría el orden y podría bloquear a otro
+    hilo que espera a SQLite con el candado tomado.
+    """
+    if connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+    else:
+        with _candado, transaction.atomic():
+            yield
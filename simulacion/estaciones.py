@@ -0,0 +1,85 @@
+"""
+Tabla de ajuste estacional por día del año.
+
+Los ParametroSimulacion activos se resuelven una sola vez en una tabla de
+366 entradas (una por día del año, incluyendo el 29 de febrero) según el
+calendario de estaciones del hemisferio sur usado en Caldera. La tabla se
+guarda en el catálogo en memoria del proceso (ver catalogo.py) y solo se
+reconstruye cuando cambia algún ParametroSimulacion, por lo que calcular
+una simulación no requiere consultas adicionales.
+"""
+from datetime import date
+
+import numpy as np
+
+# Factor neutro en diezmilésimas (1.0000)
+FACTOR_NEUTRO = 10000
+
+# Calendario de estaciones del hemisferio sur: (estación, mes, día de inicio)
+CALENDARIO_ESTACIONES = [
+    ('verano', 12, 21),
+    ('otono', 3, 21),
+    ('invierno', 6, 21),
+    ('primavera', 9, 23),
+]
+
+# Día del año (base 0) en que comienza cada mes, usando un año bisiesto
+# como referencia para que el 29 de febrero tenga su propia entrada
+_INICIO_MES = np.array(
+    [date(2000, mes, 1).timetuple().tm_yday - 1 for mes in range(1, 13)],
+    dtype=np.int64,
+)
+
+
+def indice_dia(fechas):
+    """
+    Convierte un arreglo datetime64[D] al índice 0-365 de la tabla.
+    """
+    fechas = np.asarray(fechas, dtype='datetime64[D]')
+    meses = fechas.astype('datetime64[M]')
+    numero_mes = (meses - fechas.astype('datetime64[Y]')).astype(np.int64)
+    dia_mes = (fechas - meses).astype(np.int64)
+    return _INICIO_MES[numero_mes] + dia_mes
+
+
+def estacion_por_dia():
+    """
+    Retorna un arreglo de 366 posiciones con la estación de cada día.
+    """
+    estaciones = np.empty(366, dtype=object)
+    # El verano cruza el fin de año: se asigna primero a todo el año y
+    # luego cada estación sobrescribe desde su fecha de inicio
+    estaciones[:] = 'verano'
+    for estacion, mes, dia in sorted(CALENDARIO_ESTACIONES, key=lambda e: (e[1], e[2])):
+        inicio = date(2000, mes, dia).timetuple().tm_yday - 1
+        estaciones[inicio:] = estacion
+    return estaciones
+
+
+def _a_diezmilesimas(factor):
+    return int((factor * FACTOR_NEUTRO).to_integral_value())
+
+
+def construir_tabla(parametros):
+    """
+    Construye la tabla de factores a partir de pares (estacion, factor_ajuste).
+    Un parámetro sin estación aplica a todo el año. Si varios parámetros
+    aplican al mismo día sus factores se multiplican.
+    Los factores quedan como enteros en diezmilésimas (10000 = 1.0).
+    """
+    tabla = np.full(366, FACTOR_NEUTRO, dtype=np.int64)
+    estaciones = estacion_por_dia()
+    for estacion, factor in parametros:
+        factor = _a_diezmilesimas(factor)
+        dias = slice(None) if not estacion else estaciones == estacion
+        tabla[dias] = (tabla[dias] * factor + FACTOR_NEUTRO // 2) // FACTOR_NEUTRO
+    return tabla
+
+
+def tabla_factores():
+    """
+    Retorna la tabla de factores vigente, desde el catálogo en memoria.
+    """
+    from .catalogo import obtener
+
+    return obtener().tabla_factores
@@ -0,0 +1,184 @@
+"""
+Archivos estáticos para producción.
+
+AlmacenEstaticos versiona los nombres de los archivos como
+ManifestStaticFilesStorage (base.css -> base.5af66c1b1797.css) y, al
+ejecutar collectstatic, guarda junto a cada archivo de texto su versión
+comprimida con gzip (.gz) y, si está instalado el paquete brotli, con
+brotli (.br). Así el servidor nunca comprime mientras atiende.
+
+EstaticosMiddleware sirve esos archivos desde STATIC_ROOT antes de que la
+petición pase por las sesiones y la autenticación. Los archivos con nombre
+versionado cambian de nombre cuando cambia su contenido, así que se envían
+como inmutables por un año; según Accept-Encoding se envía la versión
+comprimida.
+"""
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponse
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se genera .gz
+    brotli = None
+
+# Extensiones de los archivos que vale la pena comprimir
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html')
+
+# Archivos más chicos que esto no se comprimen
+TAMANO_MINIMO_COMPRESION = 256
+
+# Codificaciones en orden de preferencia: (Content-Encoding, extensión)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_SIN_VERSION = 'public, max-age=60'
+
+
+def comprimir(ruta):
+    """
+    Escribe ruta.gz (y ruta.br con brotli) si la versión comprimida es al
+    menos un 5% más chica. Retorna las extensiones escritas.
+    """
+    contenido = ruta.read_bytes()
+    compresores = [('.gz', lambda datos: gzip.compress(datos, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compresores.append(('.br', lambda datos: brotli.compress(datos, quality=11)))
+
+    escritas = []
+    for extension, compresor in compresores:
+        comprimido = compresor(contenido)
+        destino = ruta.with_name(ruta.name + extension)
+        if len(comprimido) < len(contenido) * 0.95:
+            destino.write_bytes(comprimido)
+            escritas.append(extension)
+        elif destino.exists():
+            destino.unlink()
+    return escritas
+
+
+class AlmacenEstaticos(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que, después de versionar los archivos,
+    agrega sus versiones comprimidas (ver comprimir()).
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for carpeta, _, archivos in os.walk(self.location):
+            for nombre in archivos:
+                ruta = Path(carpeta) / nombre
+                if ruta.suffix in EXTENSIONES_COMPRIMIBLES and ruta.stat().st_size >= TAMANO_MINIMO_COMPRESION:
+                    comprimir(ruta)
+
+
+class _Archivo:
+    __slots__ = ('ruta', 'tipo', 'cache', 'variantes')
+
+    def __init__(self, ruta, tipo, cache, variantes):
+        self.ruta = ruta
+        self.tipo = tipo
+        self.cache = cache
+        self.variantes = variantes
+
+
+def indexar(raiz, prefijo, versionados):
+    """
+    Recorre STATIC_ROOT una sola vez y retorna {ruta URL: _Archivo}, para
+    que atender un archivo no requiera revisar el disco. 'versionados' son
+    los nombres con hash del manifiesto.
+    """
+    archivos = {}
+    for carpeta, _, nombres in os.walk(raiz):
+        presentes = set(nombres)
+        for nombre in nombres:
+            if nombre.endswith(('.gz', '.br')) or nombre == 'staticfiles.json':
+                continue
+            ruta = Path(carpeta) / nombre
+            relativo = ruta.relative_to(raiz).as_posix()
+            tipo, _ = mimetypes.guess_type(nombre)
+            variantes = {
+                codificacion: ruta.with_name(nombre + extension)
+                for codificacion, extension in CODIFICACIONES
+                if nombre + extension in presentes
+            }
+            archivos[prefijo + relativo] = _Archivo(
+                ruta,
+                tipo or 'application/octet-stream',
+                CACHE_INMUTABLE if relativo in versionados else CACHE_SIN_VERSION,
+                variantes,
+            )
+    return archivos
+
+
+class EstaticosMiddleware:
+    """
+    Sirve los archivos de STATIC_ROOT, con las cabeceras de caché y la
+    versión comprimida que corresponda. Debe ir primero en MIDDLEWARE.
+    Los archivos se indexan al arrancar: después de collectstatic hay que
+    reiniciar el servidor. Funciona con vistas síncronas y asíncronas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        prefijo = '/' + settings.STATIC_URL.lstrip('/')
+        versionados = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        raiz = Path(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        self.archivos = indexar(raiz, prefijo, versionados) if raiz and raiz.is_dir() else {}
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        elegido = self._elegir(request)
+        if elegido is None:
+            return self.get_response(request)
+        archivo, ruta, codificacion = elegido
+        response = FileResponse(open(ruta, 'rb'), content_type=archivo.tipo)
+        # FileResponse agrega el nombre del archivo, que aquí no corresponde
+        del response['Content-Disposition']
+        return self._cabeceras(response, archivo, codificacion)
+
+    async def __acall__(self, request):
+        elegido = self._elegir(request)
+        if elegido is None:
+            return await self.get_response(request)
+        archivo, ruta, codificacion = elegido
+        # Bajo ASGI Django leería el archivo completo de todas formas; se lee
+        # en un hilo para no bloquear el ciclo de eventos
+        contenido = await sync_to_async(ruta.read_bytes)()
+        return self._cabeceras(HttpResponse(contenido, content_type=archivo.tipo), archivo, codificacion)
+
+    def _elegir(self, request):
+        """
+        Retorna (archivo, ruta a enviar, Content-Encoding) o None si la
+        petición no es de un archivo estático.
+        """
+        archivo = self.archivos.get(request.path_info)
+        if archivo is None or request.method not in ('GET', 'HEAD'):
+            return None
+
+        aceptadas = {parte.split(';')[0].strip() for parte in request.headers.get('Accept-Encoding', '').split(',')}
+        for codificacion, variante in archivo.variantes.items():
+            if codificacion in aceptadas:
+                return archivo, variante, codificacion
+        return archivo, archivo.ruta, None
+
+    def _cabeceras(self, response, archivo, codificacion):
+        response['Cache-Control'] = archivo.cache
+        if archivo.variantes:
+            response['Vary'] = 'Accept-Encoding'
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        return response
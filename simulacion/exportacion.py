@@ -0,0 +1,174 @@
+"""
+Exportación de datos en CSV y NDJSON por partes.
+
+Los generadores de este módulo producen el contenido en bloques para
+usarlos con StreamingHttpResponse, de modo que las exportaciones grandes
+empiezan a enviarse de inmediato y nunca se arman completas en memoria.
+
+Bajo ASGI, Django lee los iteradores síncronos de una StreamingHttpResponse
+completos (sync_to_async(list)) antes de enviar el primer byte. Por eso,
+cuando la petición llega por el manejador ASGI, el contenido se entrega
+como un iterador asíncrono que pide cada parte por separado (ver
+contenido_para).
+"""
+import csv
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# Cantidad de filas que se agrupan en cada bloque enviado al cliente
+FILAS_POR_BLOQUE = 1000
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Eco:
+    """
+    Objeto con método write() que retorna lo escrito, para que csv.writer
+    entregue cada línea en vez de escribirla en un archivo.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(encabezado, bloques):
+    """
+    Genera texto CSV a partir de un encabezado y un iterable de bloques
+    de filas. Produce un fragmento por bloque.
+    """
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezado)
+    for filas in bloques:
+        yield ''.join(escritor.writerow(fila) for fila in filas)
+
+
+def generar_ndjson(encabezado, bloques):
+    """
+    Genera NDJSON (un objeto JSON por línea) usando el encabezado como
+    nombres de las claves. Produce un fragmento por bloque.
+    """
+    for filas in bloques:
+        yield ''.join(
+            json.dumps(dict(zip(encabezado, fila)), ensure_ascii=False, default=str) + '\n'
+            for fila in filas
+        )
+
+
+GENERADORES = {
+    'csv': generar_csv,
+    'ndjson': generar_ndjson,
+}
+
+# Columnas de la exportación de simulaciones: (encabezado, campo)
+COLUMNAS_SIMULACIONES = [
+    ('id', 'id'),
+    ('usuario', 'usuario__username'),
+    ('tipo_alga', 'tipo_alga__nombre'),
+    ('toneladas_deseadas', 'toneladas_deseadas'),
+    ('fecha_objetivo', 'fecha_objetivo'),
+    ('toneladas_a_plantar', 'toneladas_a_plantar'),
+    ('fecha_inicio_cultivo', 'fecha_inicio_cultivo'),
+    ('dias_cultivo', 'dias_cultivo'),
+    ('factor_estacional', 'factor_estacional'),
+    ('modo_estocastico', 'modo_estocastico'),
+    ('notas', 'notas'),
+    ('creado_en', 'creado_en'),
+]
+
+
+async def iterar_asincrono(partes):
+    """
+    Recorre un iterable síncrono desde el ciclo de eventos pidiendo cada
+    parte con sync_to_async: las lecturas de la base de datos ocurren en el
+    hilo de la petición y cada parte se envía apenas está lista. Si el
+    cliente se desconecta, el iterador síncrono se cierra en ese hilo.
+    """
+    iterador = iter(partes)
+    siguiente = sync_to_async(next)
+    fin = object()
+    try:
+        while (parte := await siguiente(iterador, fin)) is not fin:
+            yield parte
+    finally:
+        if hasattr(iterador, 'close'):
+            await sync_to_async(iterador.close)()
+
+
+def contenido_para(request, partes):
+    """
+    Contenido de una respuesta por partes según cómo se atiende la
+    petición: el iterable tal cual bajo WSGI, o envuelto en
+    iterar_asincrono() bajo ASGI.
+    """
+    if isinstance(request, ASGIRequest):
+        return iterar_asincrono(partes)
+    return partes
+
+
+def respuesta_streaming(formato, encabezado, bloques, nombre_archivo, request=None):
+    """
+    StreamingHttpResponse que envía los bloques en el formato pedido
+    ('csv' o 'ndjson') como archivo adjunto.
+    """
+    response = StreamingHttpResponse(
+        contenido_para(request, GENERADORES[formato](encabezado, bloques)),
+        content_type=TIPOS_CONTENIDO[formato]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return response
+
+
+def bloques_biomasa(simulacion, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Recorre la curva de biomasa de una simulación en bloques de filas
+    (día, fecha, toneladas). Solo se convierte a objetos Python el bloque
+    que se está enviando.
+    """
+    serie = simulacion.serie_biomasa
+    for inicio in range(0, len(serie), filas_por_bloque):
+        bloque = serie[inicio:inicio + filas_por_bloque]
+        yield [
+            (dia, (simulacion.fecha_inicio_cultivo + timedelta(days=dia)).isoformat(), round(toneladas, 4))
+            for dia, toneladas in enumerate(bloque.tolist(), start=inicio)
+        ]
+
+
+def bloques_simulaciones(consulta, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Recorre las simulaciones de 'consulta' en bloques de filas con las
+    columnas de COLUMNAS_SIMULACIONES. Se leen como tuplas con
+    values_list() y un cursor por partes (iterator), con los nombres del
+    usuario y del tipo de alga en la misma consulta: nunca se crean
+    instancias del modelo ni se carga el resultado completo en memoria.
+    """
+    filas = consulta.values_list(*(campo for _, campo in COLUMNAS_SIMULACIONES)).iterator(
+        chunk_size=filas_por_bloque
+    )
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= filas_por_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def exportar_simulaciones(consulta, formato, nombre_archivo='simulaciones', request=None):
+    """
+    Respuesta con la exportación de las simulaciones de 'consulta'.
+    """
+    return respuesta_streaming(
+        formato,
+        [encabezado for encabezado, _ in COLUMNAS_SIMULACIONES],
+        bloques_simulaciones(consulta),
+        nombre_archivo,
+        request,
+    )
@@ -1,6 +1,51 @@
 from django import forms
+from django.conf import settings
+from django.forms.models import ModelChoiceIterator
+from .catalogo import obtener as obtener_catalogo
 from .models import Simulacion, TipoAlga
 
+
+class _OpcionesTipoAlga(ModelChoiceIterator):
+    """
+    Opciones del tipo de alga leídas del catálogo en memoria.
+    """
+
+    def _tipos(self):
+        return self.field.catalogo().tipos_ordenados
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for tipo in self._tipos():
+            yield self.choice(tipo)
+
+    def __len__(self):
+        return len(self._tipos()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._tipos())
+
+
+class CampoTipoAlga(forms.ModelChoiceField):
+    """
+    Campo del tipo de alga que muestra y valida las opciones con el
+    catálogo en memoria (ver catalogo.py), sin consultar la base de datos.
+    """
+    iterator = _OpcionesTipoAlga
+    vigente = None
+
+    def catalogo(self):
+        return self.vigente or obtener_catalogo()
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.catalogo().tipos[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
 class SimulacionForm(forms.ModelForm):
     """
     Formulario para crear una nueva simulación.
@@ -8,7 +53,13 @@ class SimulacionForm(forms.ModelForm):
     """
     class Meta:
         model = Simulacion
-        fields = ['tipo_alga', 'toneladas_deseadas', 'fecha_objetivo', 'notas']
+        fields = [
+            'tipo_alga', 'toneladas_deseadas', 'fecha_objetivo', 'notas',
+            'modo_estocastico', 'distribucion', 'variacion_perdida', 'variacion_dias', 'ensayos',
+        ]
+        field_classes = {
+            'tipo_alga': CampoTipoAlga,
+        }
         widgets = {
             'tipo_alga': forms.Select(attrs={
                 'class': 'form-control',
@@ -31,33 +82,183 @@ class SimulacionForm(forms.ModelForm):
                 'rows': 3,
                 'placeholder': 'Notas adicionales (opcional)'
             }),
+            'modo_estocastico': forms.CheckboxInput(attrs={
+                'class': 'form-check-input'
+            }),
+            'distribucion': forms.Select(attrs={
+                'class': 'form-control'
+            }),
+            'variacion_perdida': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': '0.01',
+                'min': '0'
+            }),
+            'variacion_dias': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0'
+            }),
+            'ensayos': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '1000',
+                'step': '1000'
+            }),
         }
         labels = {
             'tipo_alga': 'Tipo de Alga',
             'toneladas_deseadas': 'Toneladas Deseadas',
             'fecha_objetivo': 'Fecha Objetivo de Entrega',
-            'notas': 'Notas Adicionales'
+            'notas': 'Notas Adicionales',
+            'modo_estocastico': 'Simulación estocástica (Monte Carlo)',
+            'distribucion': 'Distribución',
+            'variacion_perdida': 'Variación de la pérdida (puntos %)',
+            'variacion_dias': 'Variación del tiempo de cultivo (días)',
+            'ensayos': 'Cantidad de ensayos',
         }
         help_texts = {
             'toneladas_deseadas': 'Cantidad de toneladas que desea obtener al final',
             'fecha_objetivo': 'Fecha en la que necesita tener las algas listas',
+            'modo_estocastico': 'Estima percentiles P50/P90/P99 considerando la variabilidad de pérdidas y tiempos',
         }
 
+    # Campos del modo estocástico: si se omiten se usan los valores por defecto
+    CAMPOS_ESTOCASTICOS = ['distribucion', 'variacion_perdida', 'variacion_dias', 'ensayos']
+
+    def __init__(self, *args, catalogo=None, **kwargs):
+        # 'catalogo' permite usar un catálogo ya cargado (vistas asíncronas)
+        super().__init__(*args, **kwargs)
+        self.fields['tipo_alga'].vigente = catalogo
+        for campo in self.CAMPOS_ESTOCASTICOS:
+            self.fields[campo].required = False
+
+    def _get_validation_exclusions(self):
+        # El tipo de alga ya se validó contra el catálogo en memoria; así el
+        # modelo no vuelve a consultar que exista
+        exclusiones = super()._get_validation_exclusions()
+        exclusiones.add('tipo_alga')
+        return exclusiones
+
+    def _valor_o_defecto(self, campo):
+        valor = self.cleaned_data.get(campo)
+        if valor in (None, ''):
+            return Simulacion._meta.get_field(campo).get_default()
+        return valor
+
+    def clean_distribucion(self):
+        return self._valor_o_defecto('distribucion')
+
     def clean_toneladas_deseadas(self):
-        """
-        Validar que las toneladas sean un número positivo.
-        """
-        toneladas = self.cleaned_data.get('toneladas_deseadas')
-        if toneladas and toneladas <= 0:
-            raise forms.ValidationError('Las toneladas deben ser un número positivo.')
-        return toneladas
+        return validar_toneladas_deseadas(self.cleaned_data.get('toneladas_deseadas'))
 
     def clean_fecha_objetivo(self):
-        """
-        Validar que la fecha objetivo sea futura.
-        """
-        from datetime import date
-        fecha = self.cleaned_data.get('fecha_objetivo')
-        if fecha and fecha < date.today():
-            raise forms.ValidationError('La fecha objetivo debe ser futura.')
-        return fecha
+        return validar_fecha_objetivo(self.cleaned_data.get('fecha_objetivo'))
+
+    def clean_variacion_perdida(self):
+        return validar_variacion(self._valor_o_defecto('variacion_perdida'))
+
+    def clean_variacion_dias(self):
+        return validar_variacion(self._valor_o_defecto('variacion_dias'))
+
+    def clean_ensayos(self):
+        return validar_ensayos(self._valor_o_defecto('ensayos'))
+
+
+# Reglas de validación compartidas por el formulario y la API JSON
+
+def validar_toneladas_deseadas(toneladas):
+    """
+    Validar que las toneladas sean un número positivo.
+    """
+    if toneladas is not None and toneladas <= 0:
+        raise forms.ValidationError('Las toneladas deben ser un número positivo.')
+    return toneladas
+
+
+def validar_fecha_objetivo(fecha):
+    """
+    Validar que la fecha objetivo sea futura.
+    """
+    from datetime import date
+    if fecha and fecha < date.today():
+        raise forms.ValidationError('La fecha objetivo debe ser futura.')
+    return fecha
+
+
+def validar_variacion(variacion):
+    """
+    Validar que una variación del modo estocástico no sea negativa.
+    """
+    if variacion < 0:
+        raise forms.ValidationError('La variación no puede ser negativa.')
+    return variacion
+
+
+def validar_ensayos(ensayos):
+    """
+    Validar que la cantidad de ensayos esté dentro del rango permitido.
+    """
+    if not 1000 <= ensayos <= 1000000:
+        raise forms.ValidationError('La cantidad de ensayos debe estar entre 1.000 y 1.000.000.')
+    return ensayos
+
+
+def validar_presupuesto_ensayos(total):
+    """
+    Validar que el total de ensayos Monte Carlo que calcula una sola petición
+    (la suma de los ensayos de sus simulaciones estocásticas) no supere
+    MONTECARLO_ENSAYOS_POR_PETICION.
+    """
+    maximo = settings.MONTECARLO_ENSAYOS_POR_PETICION
+    if total > maximo:
+        raise forms.ValidationError(
+            f'Las simulaciones estocásticas suman {total:,} ensayos y una petición admite '
+            f'como máximo {maximo:,}.'.replace(',', '.')
+        )
+    return total
+
+
+def validar_datos_simulacion(datos, tipos, permitir_pasadas=False):
+    """
+    Valida un diccionario con los datos de entrada de una simulación con
+    los mismos campos y reglas de SimulacionForm, sin consultar la base de
+    datos: 'tipos' es un diccionario {id: TipoAlga} ya cargado.
+    Con 'permitir_pasadas' se aceptan fechas objetivo pasadas (datos
+    históricos).
+    Retorna (datos_limpios, errores) donde errores es {campo: [mensajes]}.
+    """
+    campos = SimulacionForm.base_fields
+    limpios = {}
+    errores = {}
+    for nombre, campo in campos.items():
+        valor = datos.get(nombre)
+        try:
+            if nombre == 'tipo_alga':
+                limpios[nombre] = _tipo_alga_de(valor, tipos)
+            elif nombre in SimulacionForm.CAMPOS_ESTOCASTICOS and valor in campo.empty_values:
+                limpios[nombre] = Simulacion._meta.get_field(nombre).get_default()
+            else:
+                limpios[nombre] = campo.clean(valor)
+            if not (permitir_pasadas and nombre == 'fecha_objetivo'):
+                limpios[nombre] = _REGLAS.get(nombre, _sin_regla)(limpios[nombre])
+        except forms.ValidationError as error:
+            errores[nombre] = error.messages
+    return limpios, errores
+
+
+def _tipo_alga_de(valor, tipos):
+    try:
+        return tipos[int(valor)]
+    except (KeyError, TypeError, ValueError):
+        raise forms.ValidationError('Seleccione un tipo de alga válido.')
+
+
+def _sin_regla(valor):
+    return valor
+
+
+_REGLAS = {
+    'toneladas_deseadas': validar_toneladas_deseadas,
+    'fecha_objetivo': validar_fecha_objetivo,
+    'variacion_perdida': validar_variacion,
+    'variacion_dias': validar_variacion,
+    'ensayos': validar_ensayos,
+}
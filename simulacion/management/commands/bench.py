@@ -0,0 +1,219 @@
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from simulacion import pdf, reportes, sinteticos
+from simulacion.models import Simulacion
+from simulacion.motor import calcular_simulaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento del simulador sobre datos sintéticos en una base '
+        'de datos de prueba temporal y guarda los resultados en JSON. Con '
+        '--base compara contra resultados anteriores e informa regresiones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos', type=int, nargs='+', default=[10000],
+            help='Cantidades de simulaciones a generar (ej: 10000 100000 1000000)'
+        )
+        parser.add_argument('--usuarios', type=int, default=20, help='Usuarios sintéticos')
+        parser.add_argument('--tipos', type=int, default=5, help='Tipos de alga sintéticos')
+        parser.add_argument('--repeticiones', type=int, default=30, help='Repeticiones de cada petición medida')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla de los datos sintéticos')
+        parser.add_argument('--salida', help='Guardar los resultados en este archivo JSON')
+        parser.add_argument('--base', help='Archivo JSON de resultados anteriores para comparar')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.2,
+            help='Variación aceptada respecto de la base antes de marcar una regresión (0.2 = 20%%)'
+        )
+
+    def handle(self, *args, **options):
+        base = None
+        if options['base']:
+            with open(options['base'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+
+        # Todo se mide en una base de datos de prueba que se elimina al final
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                resultados = self._medir(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        informe = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plataforma': platform.platform(),
+            },
+            'parametros': {
+                campo: options[campo] for campo in ('tamanos', 'usuarios', 'tipos', 'repeticiones', 'semilla')
+            },
+            'resultados': resultados,
+        }
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida']}.")
+
+        regresiones = self._informar(resultados, base['resultados'] if base else {}, options['tolerancia'])
+        if regresiones:
+            raise CommandError(f'{regresiones} regresiones respecto de {options["base"]}.')
+
+    def _medir(self, options):
+        resultados = {}
+        usuarios = sinteticos.generar_usuarios(options['usuarios'])
+        tipos = sinteticos.generar_tipos(options['tipos'], semilla=options['semilla'])
+        repeticiones = options['repeticiones']
+
+        # Cálculo sin base de datos: una simulación a la vez y por lote
+        muestras = [
+            Simulacion(usuario_id=usuarios[0], tipo_alga=tipos[i % len(tipos)],
+                       toneladas_deseadas=10 + i % 50, fecha_objetivo=datetime(2030, 1, 1 + i % 28).date())
+            for i in range(10000)
+        ]
+        muestras[-1].calcular_simulacion()
+        inicio = time.perf_counter()
+        for simulacion in muestras[:2000]:
+            simulacion.calcular_simulacion()
+        _registrar(resultados, 'calculo_individual', 2000 / (time.perf_counter() - inicio), 'simulaciones/s', 'mayor')
+        inicio = time.perf_counter()
+        calcular_simulaciones(muestras)
+        _registrar(resultados, 'calculo_lote', len(muestras) / (time.perf_counter() - inicio), 'simulaciones/s', 'mayor')
+
+        # Generación de datos y peticiones, para cada tamaño
+        creadas = 0
+        for tamano in sorted(options['tamanos']):
+            self.stdout.write(f'Generando {tamano - creadas} simulaciones...')
+            inicio = time.perf_counter()
+            sinteticos.generar_simulaciones(
+                tamano - creadas, usuarios, tipos, semilla=options['semilla'] + tamano
+            )
+            _registrar(
+                resultados, f'generacion_{tamano}', (tamano - creadas) / (time.perf_counter() - inicio),
+                'simulaciones/s', 'mayor'
+            )
+            creadas = tamano
+
+            # Peticiones del usuario con más simulaciones
+            cliente = Client()
+            usuario_id = (
+                Simulacion.objects.values('usuario').annotate(total=Count('id'))
+                .order_by('-total').values_list('usuario', flat=True).first()
+            )
+            cliente.force_login(User.objects.get(pk=usuario_id))
+            simulacion = Simulacion.objects.filter(usuario_id=usuario_id).order_by('id').last()
+
+            for nombre, url in (
+                (f'lista_{tamano}', reverse('lista_simulaciones')),
+                (f'detalle_{tamano}', reverse('detalle_simulacion', args=[simulacion.pk])),
+            ):
+                tiempos, consultas = _medir_peticion(cliente, url, repeticiones)
+                _registrar(resultados, f'{nombre}_p50', statistics.median(tiempos), 'ms', 'menor', consultas)
+                _registrar(resultados, f'{nombre}_p95', _percentil(tiempos, 95), 'ms', 'menor')
+
+        # Render de PDF (sin caché)
+        simulaciones = Simulacion.objects.select_related('tipo_alga', 'usuario').order_by('id')[:20]
+        datos = [reportes.datos_reporte(simulacion) for simulacion in simulaciones]
+        inicio = time.perf_counter()
+        for dato in datos:
+            pdf.renderizar_pdf(dato)
+        _registrar(resultados, 'pdf_render', (time.perf_counter() - inicio) * 1000 / len(datos), 'ms', 'menor')
+        return resultados
+
+    def _informar(self, resultados, base, tolerancia):
+        """
+        Muestra los resultados y, si hay base, la variación de cada medida.
+        Retorna la cantidad de regresiones.
+        """
+        regresiones = 0
+        for nombre, medida in resultados.items():
+            linea = f"  {nombre:<24} {medida['valor']:>12.2f} {medida['unidad']}"
+            if 'consultas' in medida:
+                linea += f" ({medida['consultas']} consultas)"
+            anterior = base.get(nombre)
+            if anterior:
+                problemas = _comparar(medida, anterior, tolerancia)
+                cambio = medida['valor'] / anterior['valor'] - 1 if anterior['valor'] else 0
+                linea += f'  [{cambio:+.1%} vs base]'
+                if problemas:
+                    regresiones += 1
+                    self.stdout.write(self.style.ERROR(f"{linea}  REGRESIÓN: {', '.join(problemas)}"))
+                    continue
+            self.stdout.write(linea)
+        return regresiones
+
+
+def _registrar(resultados, nombre, valor, unidad, mejor, consultas=None):
+    """
+    Agrega una medida. 'mejor' indica si conviene un valor 'menor'
+    (tiempos) o 'mayor' (rendimiento).
+    """
+    resultados[nombre] = {'valor': round(valor, 4), 'unidad': unidad, 'mejor': mejor}
+    if consultas is not None:
+        resultados[nombre]['consultas'] = consultas
+
+
+def _comparar(medida, anterior, tolerancia):
+    """
+    Lista de motivos por los que 'medida' empeora respecto de 'anterior'.
+    """
+    problemas = []
+    if anterior['valor']:
+        cambio = medida['valor'] / anterior['valor'] - 1
+        if medida['mejor'] == 'menor' and cambio > tolerancia:
+            problemas.append(f'{cambio:+.1%} más lento')
+        elif medida['mejor'] == 'mayor' and cambio < -tolerancia:
+            problemas.append(f'{cambio:+.1%} de rendimiento')
+    if medida.get('consultas', 0) > anterior.get('consultas', medida.get('consultas', 0)):
+        problemas.append(f"{anterior['consultas']} → {medida['consultas']} consultas")
+    return problemas
+
+
+def _medir_peticion(cliente, url, repeticiones):
+    """
+    Tiempos en milisegundos de 'repeticiones' peticiones GET a 'url' y la
+    cantidad de consultas SQL de una petición. Las consultas se cuentan con
+    un execute_wrapper porque el registro de consultas de Django se
+    reinicia al comenzar cada petición.
+    """
+    consultas = []
+
+    def contar(ejecutar, sql, params, many, context):
+        consultas.append(sql)
+        return ejecutar(sql, params, many, context)
+
+    with connection.execute_wrapper(contar):
+        respuesta = cliente.get(url)
+    if respuesta.status_code != 200:
+        raise CommandError(f'{url} respondió {respuesta.status_code}.')
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cliente.get(url)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos, len(consultas)
+
+
+def _percentil(valores, percentil):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * percentil / 100))]
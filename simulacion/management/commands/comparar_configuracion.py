@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from simulacion import sinteticos
+from simulacion.models import Simulacion
+
+# Perfiles comparados: (nombre, módulo de configuración)
+PERFILES = (
+    ('actual', 'simulador_algas.settings'),
+    ('produccion', 'simulador_algas.settings_produccion'),
+)
+
+# Archivo estático de ejemplo para revisar cabeceras y tamaño
+ESTATICO_DE_PRUEBA = 'admin/css/base.css'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la configuración actual con settings_produccion: tiempo de '
+        'arranque de un worker (importar simulador_algas.wsgi en un proceso '
+        'nuevo), costo de la primera petición y de las siguientes, consultas '
+        'por petición y cabeceras de los archivos estáticos, sobre una base de '
+        'datos temporal con datos sintéticos.'
+    )
+    # Las verificaciones cargarían las URL y las plantillas antes de medir
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arranques', type=int, default=7, help='Arranques medidos por perfil')
+        parser.add_argument('--peticiones', type=int, default=30, help='Peticiones medidas por URL')
+        parser.add_argument('--simulaciones', type=int, default=2000, help='Simulaciones sintéticas')
+        # Uso interno: mide las peticiones dentro del proceso hijo de un perfil
+        parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['medir']:
+            self.stdout.write(json.dumps(self._medir_peticiones(options)))
+            return
+        if options['arranques'] < 1 or options['peticiones'] < 1:
+            raise CommandError('Arranques y peticiones deben ser mayores que cero.')
+
+        directorio = tempfile.mkdtemp(prefix='comparar_configuracion_')
+        nombre_original = connection.settings_dict['NAME']
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}), 'NAME': os.path.join(directorio, 'prueba.sqlite3')
+        }
+        base_datos = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            usuarios = sinteticos.generar_usuarios(5)
+            sinteticos.generar_simulaciones(options['simulaciones'], usuarios, sinteticos.generar_tipos(5))
+            connections.close_all()
+
+            entorno = {
+                **os.environ,
+                'DJANGO_SECRET_KEY': 'comparar-configuracion-' + 'x' * 40,
+                'DJANGO_ALLOWED_HOSTS': 'testserver',
+                'DJANGO_BASE_DATOS': base_datos,
+                'DJANGO_STATIC_ROOT': os.path.join(directorio, 'staticfiles'),
+                'DJANGO_COOKIES_SEGURAS': '0',
+                'DJANGO_USUARIO_ID': str(usuarios[0]),
+            }
+            resultados = {}
+            for perfil, modulo in PERFILES:
+                entorno_perfil = {**entorno, 'DJANGO_SETTINGS_MODULE': modulo}
+                if perfil == 'produccion':
+                    inicio = time.perf_counter()
+                    self._ejecutar(entorno_perfil, ['collectstatic', '--noinput', '-v', '0'])
+                    self.stdout.write(f'collectstatic (versionado y compresión): {time.perf_counter() - inicio:.2f} s')
+                resultados[perfil] = {
+                    'arranque': self._medir_arranque(entorno_perfil, options['arranques']),
+                    **json.loads(self._ejecutar(entorno_perfil, [
+                        'comparar_configuracion', '--medir', '--peticiones', str(options['peticiones'])
+                    ])),
+                }
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        self._informar(resultados)
+
+    def _ejecutar(self, entorno, argumentos):
+        """
+        Ejecuta manage.py en un proceso nuevo y retorna su salida.
+        """
+        proceso = subprocess.run(
+            [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), *argumentos],
+            env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode:
+            raise CommandError(f"Falló '{' '.join(argumentos)}':\n{proceso.stderr}")
+        return proceso.stdout
+
+    def _medir_arranque(self, entorno, veces):
+        """
+        Mediana del tiempo total de un proceso que solo importa la
+        aplicación WSGI (lo que tarda un worker nuevo en estar listo) y
+        cuántos módulos quedan cargados.
+        """
+        programa = (
+            'import json, sys, time\n'
+            'inicio = time.perf_counter()\n'
+            'import simulador_algas.wsgi\n'
+            'print(json.dumps({"importar": time.perf_counter() - inicio, "modulos": len(sys.modules),'
+            ' "reportlab": "reportlab" in sys.modules}))\n'
+        )
+        totales, importaciones = [], []
+        for _ in range(veces):
+            inicio = time.perf_counter()
+            proceso = subprocess.run(
+                [sys.executable, '-c', programa], env=entorno, cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            totales.append(time.perf_counter() - inicio)
+            if proceso.returncode:
+                raise CommandError(f'Falló el arranque:\n{proceso.stderr}')
+            datos = json.loads(proceso.stdout.splitlines()[-1])
+            importaciones.append(datos['importar'])
+        return {
+            'total_ms': statistics.median(totales) * 1000,
+            'importar_ms': statistics.median(importaciones) * 1000,
+            'modulos': datos['modulos'],
+            'reportlab': datos['reportlab'],
+        }
+
+    def _medir_peticiones(self, options):
+        """
+        Dentro del proceso hijo: importa la aplicación WSGI como lo haría el
+        servidor y mide la primera petición y las siguientes de cada URL.
+        """
+        connection.settings_dict['NAME'] = os.environ['DJANGO_BASE_DATOS']
+        # La configuración actual no tiene ALLOWED_HOSTS; no cambia lo medido
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        import simulador_algas.wsgi  # noqa: F401  (con precarga si el perfil la activa)
+
+        usuario = User.objects.get(pk=os.environ['DJANGO_USUARIO_ID'])
+        pk = Simulacion.objects.filter(usuario=usuario).values_list('pk', flat=True).first()
+        navegador = Client()
+        navegador.force_login(usuario)
+        anonimo = Client()
+        urls = [
+            ('inicio', navegador, reverse('inicio')),
+            ('lista', navegador, reverse('lista_simulaciones')),
+            ('detalle', navegador, reverse('detalle_simulacion', args=[pk])),
+            ('login', anonimo, settings.LOGIN_URL),
+        ]
+
+        resultado = {'urls': {}}
+        for nombre, cliente, url in urls:
+            latencias = []
+            for _ in range(options['peticiones'] + 1):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    respuesta = cliente.get(url)
+                    latencias.append(time.perf_counter() - inicio)
+                if respuesta.status_code != 200:
+                    raise CommandError(f'{url} respondió {respuesta.status_code}.')
+            resultado['urls'][nombre] = {
+                'primera_ms': latencias[0] * 1000,
+                'mediana_ms': statistics.median(latencias[1:]) * 1000,
+                'consultas': len(consultas),
+                'sesion': sum('django_session' in consulta['sql'] for consulta in consultas.captured_queries),
+            }
+
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        respuesta = anonimo.get(staticfiles_storage.url(ESTATICO_DE_PRUEBA), HTTP_ACCEPT_ENCODING='gzip, br')
+        cuerpo = b''.join(respuesta) if respuesta.status_code == 200 else b''
+        resultado['estatico'] = {
+            'url': staticfiles_storage.url(ESTATICO_DE_PRUEBA),
+            'estado': respuesta.status_code,
+            'bytes': len(cuerpo),
+            'cache': respuesta.get('Cache-Control', '-'),
+            'codificacion': respuesta.get('Content-Encoding', '-'),
+        }
+        return resultado
+
+    def _informar(self, resultados):
+        for perfil, resultado in resultados.items():
+            arranque = resultado['arranque']
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil {perfil}'))
+            self.stdout.write(
+                f"  Arranque: {arranque['total_ms']:.0f} ms por proceso "
+                f"({arranque['importar_ms']:.0f} ms importando la aplicación), "
+                f"{arranque['modulos']} módulos, ReportLab {'cargado' if arranque['reportlab'] else 'sin cargar'}"
+            )
+            for nombre, medicion in resultado['urls'].items():
+                self.stdout.write(
+                    f"  {nombre:<8} primera {medicion['primera_ms']:7.1f} ms, "
+                    f"siguientes {medicion['mediana_ms']:6.2f} ms, "
+                    f"{medicion['consultas']} consultas ({medicion['sesion']} de sesión)"
+                )
+            estatico = resultado['estatico']
+            self.stdout.write(
+                f"  {estatico['url']}: {estatico['estado']}, {estatico['bytes']} bytes, "
+                f"Cache-Control {estatico['cache']}, Content-Encoding {estatico['codificacion']}"
+            )
+
+        actual, produccion = resultados['actual'], resultados['produccion']
+        primera = [
+            (actual['urls'][nombre]['primera_ms'], produccion['urls'][nombre]['primera_ms'])
+            for nombre in actual['urls']
+        ]
+        self.stdout.write(self.style.SUCCESS(
+            f"Arranque {actual['arranque']['total_ms']:.0f} -> {produccion['arranque']['total_ms']:.0f} ms; "
+            f"primera petición de cada URL {sum(a for a, _ in primera):.0f} -> {sum(p for _, p in primera):.0f} ms "
+            f"(en producción la precarga ocurre al arrancar)."
+        ))
@@ -0,0 +1,256 @@
+import codecs
+import csv
+import hashlib
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacion import catalogo
+from simulacion.escritura import escritura
+from simulacion.forms import validar_datos_simulacion
+from simulacion.models import ProgresoTrabajo, Simulacion
+from simulacion.motor import crear_simulaciones
+
+# Columnas obligatorias del archivo CSV
+COLUMNAS = ['usuario', 'tipo_alga', 'toneladas_deseadas', 'fecha_objetivo']
+
+# Bytes del comienzo del archivo que identifican su contenido
+BYTES_HUELLA = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa simulaciones desde un archivo CSV con las columnas usuario, '
+        'tipo_alga (nombre), toneladas_deseadas, fecha_objetivo y opcionalmente '
+        'notas y los campos del modo estocástico. Lee el archivo por bloques y '
+        'si se interrumpe continúa desde el último bloque guardado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo CSV a importar')
+        parser.add_argument(
+            '--tamano-bloque', type=int, default=5000,
+            help='Filas que se validan, calculan y guardan en cada transacción'
+        )
+        parser.add_argument(
+            '--permitir-pasadas', action='store_true',
+            help='Aceptar fechas objetivo pasadas (pedidos históricos)'
+        )
+        parser.add_argument('--delimitador', default=',', help='Separador de columnas del CSV')
+        parser.add_argument('--errores', help='Guardar las filas rechazadas y su motivo en este CSV')
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help='Ignorar el avance guardado y comenzar desde la primera fila'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        tamano_bloque = options['tamano_bloque']
+        if tamano_bloque < 1:
+            raise CommandError('El tamaño de bloque debe ser mayor que cero.')
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}.')
+
+        # Mapas en memoria para resolver nombres sin consultar por fila
+        tipos = catalogo.obtener().tipos
+        tipos_por_nombre = {tipo.nombre.strip().lower(): tipo.id for tipo in tipos.values()}
+        usuarios = dict(User.objects.values_list('username', 'id'))
+
+        progreso, _ = ProgresoTrabajo.objects.get_or_create(clave=_clave_importacion(ruta))
+        if options['reiniciar']:
+            progreso.posicion, progreso.desplazamiento, progreso.completado = 0, 0, False
+            progreso.save()
+        if progreso.completado:
+            self.stdout.write(self.style.WARNING(
+                f'El archivo ya fue importado ({progreso.posicion} filas). Use --reiniciar para importarlo de nuevo.'
+            ))
+            return
+
+        with open(ruta, 'rb') as archivo, _ArchivoErrores(options['errores']) as errores:
+            if archivo.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                archivo.seek(0)
+            lineas = _Lineas(archivo)
+            lector = csv.DictReader(lineas, delimiter=options['delimitador'])
+            faltantes = [columna for columna in COLUMNAS if columna not in (lector.fieldnames or [])]
+            if faltantes:
+                raise CommandError(f'Faltan columnas en el CSV: {", ".join(faltantes)}.')
+            errores.abrir(lector.fieldnames, progreso.posicion)
+
+            # Las filas ya confirmadas en una ejecución anterior se saltan:
+            # el avance guarda el byte donde termina la última
+            if progreso.posicion:
+                self.stdout.write(f'Retomando desde la fila {progreso.posicion + 1}.')
+                if progreso.desplazamiento:
+                    lineas.ir_a(progreso.desplazamiento)
+                else:
+                    # Avance guardado antes de registrar el desplazamiento
+                    for _ in islice(lector, progreso.posicion):
+                        pass
+
+            inicio = time.perf_counter()
+            leidas = creadas = rechazadas = 0
+            while True:
+                filas = list(islice(lector, tamano_bloque))
+                if not filas:
+                    break
+
+                nuevas = []
+                for numero, fila in enumerate(filas, start=progreso.posicion + 1):
+                    simulacion, motivo = _simulacion_desde_fila(
+                        fila, tipos, tipos_por_nombre, usuarios, options['permitir_pasadas']
+                    )
+                    if simulacion is None:
+                        errores.agregar(numero, fila, motivo)
+                        rechazadas += 1
+                    else:
+                        nuevas.append(simulacion)
+
+                # El bloque y el avance se confirman juntos
+                with escritura():
+                    crear_simulaciones(nuevas)
+                    progreso.posicion += len(filas)
+                    progreso.desplazamiento = lineas.posicion
+                    progreso.save(update_fields=['posicion', 'desplazamiento', 'actualizado_en'])
+                errores.confirmar()
+
+                leidas += len(filas)
+                creadas += len(nuevas)
+                transcurrido = time.perf_counter() - inicio
+                self.stdout.write(
+                    f'  {progreso.posicion} filas procesadas, {creadas} creadas, {rechazadas} rechazadas '
+                    f'({leidas / transcurrido:.0f} filas/s)'
+                )
+
+        progreso.completado = True
+        progreso.save(update_fields=['completado', 'actualizado_en'])
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Importación terminada: {creadas} simulaciones creadas, {rechazadas} filas rechazadas '
+            f'en {transcurrido:.2f} s ({leidas / max(transcurrido, 1e-9):.0f} filas/s).'
+        ))
+        if rechazadas and not options['errores']:
+            self.stdout.write(self.style.WARNING('Use --errores archivo.csv para ver las filas rechazadas.'))
+
+
+def _clave_importacion(ruta):
+    """
+    Identifica el archivo por su ruta, su tamaño y un hash de su comienzo:
+    si el archivo cambia, la importación comienza de nuevo. El hash es del
+    contenido y no de la fecha de modificación, para que copiar o tocar el
+    archivo no repita filas ya importadas.
+    """
+    ruta = os.path.abspath(ruta)
+    huella = hashlib.sha256(f'{ruta}:{os.path.getsize(ruta)}:'.encode())
+    with open(ruta, 'rb') as archivo:
+        huella.update(archivo.read(BYTES_HUELLA))
+    return f'importar_simulaciones:{huella.hexdigest()[:32]}'
+
+
+def _simulacion_desde_fila(fila, tipos, tipos_por_nombre, usuarios, permitir_pasadas):
+    """
+    Convierte una fila del CSV en una Simulacion sin guardar.
+    Retorna (simulacion, None) o (None, motivo del rechazo).
+    """
+    usuario_id = usuarios.get((fila.get('usuario') or '').strip())
+    if usuario_id is None:
+        return None, f"Usuario desconocido: {fila.get('usuario')!r}"
+
+    datos = {campo: valor.strip() if isinstance(valor, str) else valor for campo, valor in fila.items()}
+    datos['tipo_alga'] = tipos_por_nombre.get((datos.get('tipo_alga') or '').lower())
+    limpios, errores = validar_datos_simulacion(datos, tipos, permitir_pasadas=permitir_pasadas)
+    if errores:
+        return None, '; '.join(f'{campo}: {" ".join(mensajes)}' for campo, mensajes in errores.items())
+    return Simulacion(usuario_id=usuario_id, **limpios), None
+
+
+class _Lineas:
+    """
+    Líneas de un archivo abierto en binario, decodificadas como UTF-8, que
+    lleva la cuenta del byte donde termina la última entregada. csv.reader
+    pide líneas solo hasta completar cada fila, así que después de una fila
+    'posicion' es el byte donde comienza la siguiente.
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.posicion = archivo.tell()
+
+    def ir_a(self, posicion):
+        self.archivo.seek(posicion)
+        self.posicion = posicion
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linea = self.archivo.readline()
+        if not linea:
+            raise StopIteration
+        self.posicion += len(linea)
+        return linea.decode('utf-8')
+
+
+class _ArchivoErrores:
+    """
+    Escribe las filas rechazadas en un CSV, si se indicó un archivo, con
+    una columna para el número de fila y otra para el motivo antes de las
+    columnas del archivo importado.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.archivo = None
+        self.escritor = None
+
+    def __enter__(self):
+        return self
+
+    def abrir(self, columnas, posicion):
+        """
+        Al comenzar crea el archivo con su encabezado. Al retomar conserva
+        solo las filas rechazadas hasta 'posicion' (las que quedaron después
+        del último bloque confirmado se vuelven a procesar) y continúa
+        agregando al final.
+        """
+        if not self.ruta:
+            return
+        if posicion and os.path.isfile(self.ruta):
+            _recortar_errores(self.ruta, posicion)
+            self.archivo = open(self.ruta, 'a', newline='', encoding='utf-8')
+            self.escritor = csv.writer(self.archivo)
+        else:
+            self.archivo = open(self.ruta, 'w', newline='', encoding='utf-8')
+            self.escritor = csv.writer(self.archivo)
+            self.escritor.writerow(['fila', 'motivo', *columnas])
+
+    def agregar(self, numero, fila, motivo):
+        if self.escritor is not None:
+            self.escritor.writerow([numero, motivo, *fila.values()])
+
+    def confirmar(self):
+        """
+        Lleva al disco las filas rechazadas de un bloque ya confirmado.
+        """
+        if self.archivo is not None:
+            self.archivo.flush()
+
+    def __exit__(self, *exc):
+        if self.archivo is not None:
+            self.archivo.close()
+
+
+def _recortar_errores(ruta, posicion):
+    """
+    Reescribe el archivo de errores sin las filas posteriores a 'posicion'.
+    """
+    temporal = f'{ruta}.tmp'
+    with open(ruta, newline='', encoding='utf-8') as origen, \
+            open(temporal, 'w', newline='', encoding='utf-8') as destino:
+        lector = csv.reader(origen)
+        escritor = csv.writer(destino)
+        escritor.writerow(next(lector, ['fila', 'motivo']))
+        escritor.writerows(fila for fila in lector if fila and int(fila[0]) <= posicion)
+    os.replace(temporal, ruta)
@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from simulacion.planificador import planificar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        'Planifica todas las simulaciones pendientes respetando la capacidad '
+        'de las líneas de cultivo e informa los ajustes necesarios.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--capacidad', type=float, default=settings.CAPACIDAD_CULTIVO_TONELADAS,
+            help='Toneladas que caben en el agua al mismo tiempo'
+        )
+        parser.add_argument(
+            '--adelanto-maximo', type=int, default=settings.ADELANTO_MAXIMO_DIAS,
+            help='Días que se puede adelantar una siembra'
+        )
+        parser.add_argument(
+            '--lote-minimo', type=float, default=settings.LOTE_MINIMO_TONELADAS,
+            help='Toneladas mínimas de cada lote al dividir una siembra'
+        )
+        parser.add_argument('--json', dest='archivo_json', help='Guardar el resultado completo en un archivo JSON')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resultado = planificar_pendientes(
+            capacidad=options['capacidad'],
+            adelanto_maximo=options['adelanto_maximo'],
+            lote_minimo=options['lote_minimo'],
+        )
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{resultado['simulaciones']} simulaciones pendientes planificadas en {duracion:.2f} s "
+            f"(capacidad {resultado['capacidad']:g} t)."
+        )
+        for desde, hasta, exceso in resultado['ventanas_sobrecarga']:
+            self.stdout.write(f'  Sobrecarga {desde:%d/%m/%Y} - {hasta:%d/%m/%Y}: hasta {exceso:.2f} t sobre la capacidad')
+
+        self.stdout.write(f"{len(resultado['ajustes'])} siembras adelantadas o divididas.")
+        for ajuste in resultado['ajustes'][:20]:
+            lotes = ', '.join(f'{cantidad:.2f} t desde {desde:%d/%m/%Y}' for desde, _, cantidad in ajuste['lotes'])
+            self.stdout.write(f"  Simulación #{ajuste['simulacion_id']}: {lotes}")
+        if len(resultado['ajustes']) > 20:
+            self.stdout.write(f"  ... y {len(resultado['ajustes']) - 20} más.")
+
+        if resultado['no_satisfechas']:
+            pendientes = sum(fila['toneladas_pendientes'] for fila in resultado['no_satisfechas'])
+            self.stdout.write(self.style.WARNING(
+                f"{len(resultado['no_satisfechas'])} simulaciones sin capacidad suficiente "
+                f"({pendientes:.2f} t sin acomodar)."
+            ))
+        for desde, hasta, exceso in resultado['ventanas_restantes']:
+            self.stdout.write(self.style.WARNING(
+                f'  Persiste sobrecarga {desde:%d/%m/%Y} - {hasta:%d/%m/%Y}: {exceso:.2f} t'
+            ))
+        if not resultado['no_satisfechas'] and not resultado['ventanas_restantes']:
+            self.stdout.write(self.style.SUCCESS('Todas las siembras caben en la capacidad disponible.'))
+
+        if options['archivo_json']:
+            with open(options['archivo_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, ensure_ascii=False, indent=2, default=str)
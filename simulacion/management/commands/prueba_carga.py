@@ -0,0 +1,305 @@
+import asyncio
+import http.client
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from simulacion import sinteticos
+from simulacion.models import Simulacion
+
+HOST = '127.0.0.1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga que compara las vistas servidas por un servidor '
+        'WSGI con una cantidad fija de hilos y por un servidor ASGI con un '
+        'único ciclo de eventos, con la misma cantidad de clientes HTTP '
+        'simultáneos. Cada cliente recorre la lista, el detalle y el PDF de '
+        'sus simulaciones sobre una base de datos temporal.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=200, help='Clientes conectados al mismo tiempo')
+        parser.add_argument('--recorridos', type=int, default=3, help='Recorridos lista-detalle-PDF de cada cliente')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor WSGI')
+        parser.add_argument('--usuarios', type=int, default=20, help='Usuarios sintéticos')
+        parser.add_argument('--simulaciones', type=int, default=5000, help='Simulaciones sintéticas')
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['hilos'] < 1:
+            raise CommandError('Clientes e hilos deben ser mayores que cero.')
+
+        # Base de datos y caché de PDF temporales, para que las vistas se
+        # midan con conexiones reales y sin reportes generados de antemano
+        directorio = tempfile.mkdtemp(prefix='prueba_carga_')
+        nombre_original = connection.settings_dict['NAME']
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}), 'NAME': os.path.join(directorio, 'prueba.sqlite3')
+        }
+        # La base de datos temporal se configura como en producción
+        originales = {clave: connection.settings_dict[clave] for clave in settings.SQLITE_CONCURRENTE}
+        connection.settings_dict.update(settings.SQLITE_CONCURRENTE)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            usuarios = sinteticos.generar_usuarios(options['usuarios'])
+            sinteticos.generar_simulaciones(options['simulaciones'], usuarios, sinteticos.generar_tipos(5))
+            recorridos = self._recorridos(usuarios, options)
+            connection.close()
+
+            resultados = {}
+            for modo, servidor in (('wsgi', lambda: _ServidorWsgi(options['hilos'])), ('asgi', _ServidorAsgi)):
+                with override_settings(
+                    ALLOWED_HOSTS=[HOST], PDF_CACHE_DIR=os.path.join(directorio, f'pdf_{modo}')
+                ), servidor() as puerto:
+                    resultados[modo] = self._medir(puerto, recorridos)
+                connections.close_all()
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            connection.settings_dict.update(originales)
+
+        for modo, resultado in resultados.items():
+            self._informar(modo, resultado)
+        wsgi, asgi = resultados['wsgi'], resultados['asgi']
+        self.stdout.write(self.style.SUCCESS(
+            f"Con {options['clientes']} clientes simultáneos: ASGI {asgi['por_segundo']:.0f} peticiones/s "
+            f"(p95 {asgi['p95']:.0f} ms), WSGI con {options['hilos']} hilos {wsgi['por_segundo']:.0f} "
+            f"peticiones/s (p95 {wsgi['p95']:.0f} ms)."
+        ))
+
+    def _recorridos(self, usuarios, options):
+        """
+        Para cada cliente: la cookie de sesión de su usuario y las URL que
+        visita en orden.
+        """
+        azar = random.Random(0)
+        simulaciones = {}
+        for usuario_id, pk in Simulacion.objects.values_list('usuario_id', 'pk').iterator():
+            simulaciones.setdefault(usuario_id, []).append(pk)
+
+        sesiones = {}
+        for usuario in User.objects.filter(pk__in=usuarios):
+            navegador = Client()
+            navegador.force_login(usuario)
+            sesiones[usuario.pk] = f'{settings.SESSION_COOKIE_NAME}={navegador.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        recorridos = []
+        for numero in range(options['clientes']):
+            usuario_id = usuarios[numero % len(usuarios)]
+            urls = []
+            for _ in range(options['recorridos']):
+                pk = azar.choice(simulaciones[usuario_id])
+                urls += [
+                    reverse('lista_simulaciones'),
+                    reverse('detalle_simulacion', args=[pk]),
+                    reverse('exportar_pdf', args=[pk]),
+                ]
+            recorridos.append((sesiones[usuario_id], urls))
+        return recorridos
+
+    def _medir(self, puerto, recorridos):
+        """
+        Cada cliente es un hilo que hace sus peticiones HTTP una tras otra
+        y lee cada respuesta completa; todos comienzan a la vez. Lo mismo
+        para ambos servidores, así la concurrencia ofrecida es la misma.
+        """
+        medicion = _Medicion()
+        comienzo = threading.Barrier(len(recorridos))
+
+        def cliente(cookie, urls):
+            comienzo.wait()
+            for url in urls:
+                inicio = time.perf_counter()
+                conexion = http.client.HTTPConnection(HOST, puerto, timeout=300)
+                try:
+                    conexion.request('GET', url, headers={'Cookie': cookie})
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    codigo = respuesta.status
+                except OSError:
+                    codigo = 599
+                finally:
+                    conexion.close()
+                medicion.registrar(codigo, time.perf_counter() - inicio)
+
+        hilos = [threading.Thread(target=cliente, args=recorrido) for recorrido in recorridos]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return medicion.resumen(time.perf_counter() - inicio)
+
+    def _informar(self, modo, resultado):
+        self.stdout.write(
+            f"{modo.upper()}: {resultado['peticiones']} peticiones en {resultado['duracion']:.2f} s "
+            f"({resultado['por_segundo']:.0f}/s), latencia mediana {resultado['p50']:.0f} ms, "
+            f"p95 {resultado['p95']:.0f} ms."
+        )
+        if resultado['errores']:
+            self.stdout.write(self.style.WARNING(f"  Respuestas con error: {resultado['errores']}"))
+
+
+class _Medicion:
+    """
+    Latencias y errores de las peticiones.
+    """
+
+    def __init__(self):
+        self.latencias = []
+        self.errores = {}
+        self.candado = threading.Lock()
+
+    def registrar(self, codigo, segundos):
+        with self.candado:
+            self.latencias.append(segundos * 1000)
+            if codigo >= 400:
+                self.errores[codigo] = self.errores.get(codigo, 0) + 1
+
+    def resumen(self, duracion):
+        ordenadas = sorted(self.latencias)
+        return {
+            'peticiones': len(ordenadas),
+            'duracion': duracion,
+            'por_segundo': len(ordenadas) / duracion,
+            'p50': statistics.median(ordenadas),
+            'p95': ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))],
+            'errores': self.errores,
+        }
+
+
+class _ManejadorWsgi(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ServidorWsgi(WSGIServer):
+    """
+    Servidor WSGI de la biblioteca estándar que atiende cada conexión en un
+    grupo de 'hilos' hilos, como un worker con hilos (gunicorn --threads):
+    las conexiones que llegan con todos los hilos ocupados esperan en cola.
+    Se usa como contexto que retorna el puerto.
+    """
+    request_queue_size = 1024
+
+    def __init__(self, hilos):
+        super().__init__((HOST, 0), _ManejadorWsgi)
+        self.set_app(get_wsgi_application())
+        self.ejecutor = ThreadPoolExecutor(hilos, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.ejecutor.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.ejecutor.shutdown()
+        self.server_close()
+
+
+class _ServidorAsgi:
+    """
+    Servidor HTTP mínimo sobre asyncio que entrega cada petición GET al
+    manejador ASGI de Django, en un ciclo de eventos de un hilo propio.
+    Una conexión por petición. Se usa como contexto que retorna el puerto.
+    """
+
+    def __init__(self):
+        self.aplicacion = get_asgi_application()
+        self.ciclo = asyncio.new_event_loop()
+        self.hilo = threading.Thread(target=self.ciclo.run_forever, daemon=True)
+        self.conexiones = set()
+
+    def __enter__(self):
+        self.hilo.start()
+        self.servidor = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._conexion, HOST, 0, backlog=1024), self.ciclo
+        ).result()
+        return self.servidor.sockets[0].getsockname()[1]
+
+    def __exit__(self, *exc):
+        async def detener():
+            self.servidor.close()
+            await self.servidor.wait_closed()
+            # Las respuestas ya se leyeron, pero Django puede estar cerrándolas
+            await asyncio.gather(*self.conexiones)
+
+        asyncio.run_coroutine_threadsafe(detener(), self.ciclo).result()
+        self.ciclo.call_soon_threadsafe(self.ciclo.stop)
+        self.hilo.join()
+        self.ciclo.close()
+
+    async def _conexion(self, lector, escritor):
+        tarea = asyncio.current_task()
+        self.conexiones.add(tarea)
+        try:
+            await self._atender(lector, escritor)
+        finally:
+            self.conexiones.discard(tarea)
+
+    async def _atender(self, lector, escritor):
+        desconectado = asyncio.Event()
+        try:
+            metodo, ruta, _ = (await lector.readline()).decode('latin-1').split(' ', 2)
+            cabeceras = []
+            while (linea := await lector.readline()) not in (b'\r\n', b'\n', b''):
+                nombre, _, valor = linea.decode('latin-1').partition(':')
+                cabeceras.append((nombre.strip().lower().encode('latin-1'), valor.strip().encode('latin-1')))
+            camino, _, consulta = ruta.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': metodo, 'scheme': 'http', 'path': unquote(camino), 'raw_path': camino.encode('latin-1'),
+                'query_string': consulta.encode('latin-1'), 'root_path': '', 'headers': cabeceras,
+                'client': escritor.get_extra_info('peername'), 'server': escritor.get_extra_info('sockname'),
+            }
+            pedido = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def recibir():
+                # Después del cuerpo, Django espera la desconexión del cliente
+                if pedido:
+                    return pedido.pop()
+                await desconectado.wait()
+                return {'type': 'http.disconnect'}
+
+            async def enviar(mensaje):
+                if mensaje['type'] == 'http.response.start':
+                    escritor.write(
+                        f"HTTP/1.1 {mensaje['status']} \r\n".encode('latin-1')
+                        + b''.join(nombre + b': ' + valor + b'\r\n' for nombre, valor in mensaje['headers'])
+                        + b'Connection: close\r\n\r\n'
+                    )
+                elif mensaje['type'] == 'http.response.body':
+                    escritor.write(mensaje.get('body', b''))
+                    await escritor.drain()
+
+            await self.aplicacion(scope, recibir, enviar)
+        finally:
+            desconectado.set()
+            escritor.close()
@@ -0,0 +1,157 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from simulacion import sinteticos
+from simulacion.escritura import escritura
+from simulacion.models import Simulacion
+from simulacion.motor import guardar_simulacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de escrituras concurrentes sobre una copia temporal '
+        'de la base de datos SQLite: varios hilos crean, modifican y eliminan '
+        'simulaciones mientras otros leen, e informa los errores de bloqueo '
+        'y la latencia de las lecturas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=50, help='Hilos que escriben')
+        parser.add_argument('--lectores', type=int, default=10, help='Hilos que leen')
+        parser.add_argument('--operaciones', type=int, default=40, help='Escrituras por cada escritor')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Esta prueba es para SQLite.')
+
+        # Base de datos de prueba en un archivo, para que los hilos usen
+        # conexiones reales con los mismos ajustes que en producción
+        directorio = tempfile.mkdtemp(prefix='prueba_concurrencia_')
+        nombre_original = connection.settings_dict['NAME']
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}), 'NAME': os.path.join(directorio, 'prueba.sqlite3')
+        }
+        # La base de datos temporal se configura como en producción
+        originales = {clave: connection.settings_dict[clave] for clave in settings.SQLITE_CONCURRENTE}
+        connection.settings_dict.update(settings.SQLITE_CONCURRENTE)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultado = self._ejecutar(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            connection.settings_dict.update(originales)
+
+        modo = resultado['modo']
+        self.stdout.write(
+            f"Modo de diario: {modo}. {resultado['escrituras']} escrituras de {options['escritores']} hilos "
+            f"en {resultado['duracion']:.2f} s ({resultado['escrituras'] / resultado['duracion']:.0f} escrituras/s)."
+        )
+        self.stdout.write(
+            f"{resultado['lecturas']} lecturas de {options['lectores']} hilos: "
+            f"mediana {resultado['lectura_p50']:.1f} ms, máximo {resultado['lectura_max']:.1f} ms."
+        )
+        if resultado['errores']:
+            for error in resultado['errores'][:10]:
+                self.stdout.write(self.style.ERROR(f'  {error}'))
+            raise CommandError(f"{len(resultado['errores'])} errores durante la prueba.")
+        self.stdout.write(self.style.SUCCESS('Sin errores de bloqueo.'))
+
+    def _ejecutar(self, options):
+        usuarios = sinteticos.generar_usuarios(10)
+        tipos = sinteticos.generar_tipos(3)
+        sinteticos.generar_simulaciones(1000, usuarios, tipos)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            modo = cursor.fetchone()[0]
+        connection.close()
+
+        errores = []
+        escrituras = []
+        lecturas = []
+        fin_escritores = threading.Event()
+        inicio_comun = threading.Barrier(options['escritores'] + options['lectores'])
+
+        def escritor(numero):
+            azar = random.Random(numero)
+            try:
+                inicio_comun.wait()
+                for _ in range(options['operaciones']):
+                    operacion = azar.random()
+                    try:
+                        if operacion < 0.6:
+                            # Crear una simulación como lo hace la vista
+                            guardar_simulacion(Simulacion(
+                                usuario_id=azar.choice(usuarios),
+                                tipo_alga=azar.choice(tipos),
+                                toneladas_deseadas=Decimal(azar.randint(100, 10000)).scaleb(-2),
+                                fecha_objetivo=date.today() + timedelta(days=azar.randint(1, 365)),
+                            ))
+                        elif operacion < 0.8:
+                            # Eliminar una simulación como lo hace la vista
+                            simulacion = Simulacion.objects.filter(usuario_id=azar.choice(usuarios)).first()
+                            if simulacion is not None:
+                                with escritura():
+                                    simulacion.delete()
+                        else:
+                            # Escritura suelta fuera de escritura(): la ordena
+                            # el bloqueo de SQLite con busy_timeout
+                            Simulacion.objects.filter(
+                                pk__in=Simulacion.objects.filter(usuario_id=azar.choice(usuarios)).values('pk')[:1]
+                            ).update(notas=f'Modificada por el hilo {numero}')
+                        escrituras.append(1)
+                    except OperationalError as error:
+                        errores.append(f'Escritor {numero}: {error}')
+            finally:
+                connection.close()
+
+        def lector(numero):
+            azar = random.Random(-numero)
+            try:
+                inicio_comun.wait()
+                while not fin_escritores.is_set():
+                    inicio = time.perf_counter()
+                    try:
+                        list(
+                            Simulacion.objects.filter(usuario_id=azar.choice(usuarios))
+                            .select_related('tipo_alga').order_by('-creado_en', '-id')[:24]
+                        )
+                    except OperationalError as error:
+                        errores.append(f'Lector {numero}: {error}')
+                    lecturas.append((time.perf_counter() - inicio) * 1000)
+                    # Pausa como la de un usuario real, para no acaparar la CPU
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        hilos_escritores = [threading.Thread(target=escritor, args=(i,)) for i in range(options['escritores'])]
+        hilos_lectores = [threading.Thread(target=lector, args=(i,)) for i in range(options['lectores'])]
+        inicio = time.perf_counter()
+        for hilo in hilos_escritores + hilos_lectores:
+            hilo.start()
+        for hilo in hilos_escritores:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        fin_escritores.set()
+        for hilo in hilos_lectores:
+            hilo.join()
+
+        return {
+            'modo': modo,
+            'escrituras': len(escrituras),
+            'duracion': duracion,
+            'lecturas': len(lecturas),
+            'lectura_p50': statistics.median(lecturas) if lecturas else 0,
+            'lectura_max': max(lecturas, default=0),
+            'errores': errores,
+        }
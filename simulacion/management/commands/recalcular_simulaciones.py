@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacion.models import TipoAlga
+from simulacion.recalculo import TAMANO_BLOQUE, pendientes, recalcular_tipo
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula las simulaciones que aún no comienzan a cultivarse y que '
+        'se calcularon con parámetros anteriores de su tipo de alga. Retoma '
+        'los recálculos que se interrumpieron en segundo plano.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', help='Nombre del tipo de alga (por defecto, todos)')
+        parser.add_argument(
+            '--tamano-bloque', type=int, default=TAMANO_BLOQUE,
+            help='Simulaciones que se recalculan y guardan en cada transacción'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano_bloque'] < 1:
+            raise CommandError('El tamaño de bloque debe ser mayor que cero.')
+        tipos = TipoAlga.objects.order_by('nombre')
+        if options['tipo']:
+            tipos = tipos.filter(nombre__iexact=options['tipo'])
+            if not tipos:
+                raise CommandError(f"No existe el tipo de alga {options['tipo']!r}.")
+
+        inicio = time.perf_counter()
+        recalculadas = 0
+        for tipo in tipos:
+            if not pendientes(tipo).exists():
+                continue
+            self.stdout.write(f'{tipo.nombre} (versión {tipo.version_parametros}):')
+
+            def informar(hechas, total):
+                self.stdout.write(f'  {hechas} de {total} simulaciones recalculadas')
+
+            antes = time.perf_counter()
+            progreso = recalcular_tipo(tipo.pk, options['tamano_bloque'], informar)
+            if not progreso.completado:
+                self.stdout.write(self.style.WARNING(
+                    '  Los parámetros cambiaron durante el recálculo; ejecute el comando otra vez para la versión nueva.'
+                ))
+            recalculadas += progreso.posicion
+            self.stdout.write(f'  Terminado en {time.perf_counter() - antes:.2f} s.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{recalculadas} simulaciones recalculadas en {time.perf_counter() - inicio:.2f} s.'
+        ))
@@ -0,0 +1,329 @@
+"""
+Métricas de la aplicación en formato Prometheus.
+
+Cada hilo registra sus mediciones en su propio conjunto de contadores e
+histogramas, por lo que registrar una medición no requiere candados: solo
+se modifica memoria del propio hilo. Al consultar /metrics se suman los
+registros de todos los hilos del proceso; los de los hilos que terminaron
+se acumulan en un solo registro. Cada proceso (worker) expone sus propios
+valores con la etiqueta "proceso".
+
+Las consultas SQL de una petición se cuentan con un execute_wrapper que
+se instala en cada conexión y suma en el contador de la petición actual
+(una ContextVar). Así se cuentan también las consultas de las vistas
+asíncronas, que se ejecutan en otro hilo mediante sync_to_async.
+"""
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Límites de los histogramas
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Nombre: (tipo, descripción, límites del histograma)
+METRICAS = {
+    'simulador_peticiones_total': (
+        'counter', 'Peticiones atendidas por vista, método y código de estado.', None
+    ),
+    'simulador_peticion_segundos': (
+        'histogram', 'Duración de las peticiones por vista.', LIMITES_SEGUNDOS
+    ),
+    'simulador_consultas_db_total': (
+        'counter', 'Consultas SQL ejecutadas por vista.', None
+    ),
+    'simulador_consultas_db_segundos': (
+        'histogram', 'Tiempo total en la base de datos por petición, por vista.', LIMITES_SEGUNDOS
+    ),
+    'simulador_respuesta_bytes': (
+        'histogram', 'Tamaño de las respuestas por vista.', LIMITES_BYTES
+    ),
+    'simulador_pdf_render_segundos': (
+        'histogram', 'Duración del render de cada reporte PDF.', LIMITES_SEGUNDOS
+    ),
+    'simulador_pdf_cartera_segundos': (
+        'histogram', 'Duración del render de cada reporte PDF de cartera.', LIMITES_SEGUNDOS
+    ),
+}
+
+
+class _Histograma:
+    __slots__ = ('cuentas', 'suma')
+
+    def __init__(self, cantidad_limites):
+        self.cuentas = [0] * (cantidad_limites + 1)
+        self.suma = 0.0
+
+
+class _Registro:
+    """
+    Mediciones de un hilo: {(nombre, etiquetas): valor o _Histograma}.
+    """
+
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}
+
+    def acumular(self, otro):
+        """
+        Suma las mediciones de otro registro a este.
+        """
+        for clave, valor in otro.contadores.items():
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+        for clave, histograma in otro.histogramas.items():
+            total = self.histogramas.get(clave)
+            if total is None:
+                total = self.histogramas[clave] = _Histograma(len(histograma.cuentas) - 1)
+            total.cuentas = [a + b for a, b in zip(total.cuentas, histograma.cuentas)]
+            total.suma += histograma.suma
+
+
+_local = threading.local()
+# Registros de los hilos vivos: [(referencia débil al hilo, registro)]
+_registros = []
+# Suma de los registros de los hilos que ya terminaron: los contadores no
+# deben disminuir cuando un hilo termina
+_terminados = _Registro()
+# Solo para agregar y podar registros, no al registrar una medición
+_candado = threading.Lock()
+
+
+def _registro():
+    try:
+        return _local.registro
+    except AttributeError:
+        registro = _local.registro = _Registro()
+        with _candado:
+            _podar()
+            _registros.append((weakref.ref(threading.current_thread()), registro))
+        return registro
+
+
+def _podar():
+    """
+    Pasa a _terminados los registros de los hilos que terminaron (ya no
+    los modifican) y los quita de la lista. Se llama con _candado tomado.
+    """
+    vivos = []
+    for referencia, registro in _registros:
+        hilo = referencia()
+        if hilo is not None and hilo.is_alive():
+            vivos.append((referencia, registro))
+        else:
+            _terminados.acumular(registro)
+    _registros[:] = vivos
+
+
+def incrementar(nombre, etiquetas=(), valor=1):
+    """
+    Suma 'valor' a un contador. 'etiquetas' es una tupla de pares
+    (nombre, valor).
+    """
+    contadores = _registro().contadores
+    clave = (nombre, etiquetas)
+    contadores[clave] = contadores.get(clave, 0) + valor
+
+
+def observar(nombre, etiquetas, valor):
+    """
+    Registra una observación en un histograma.
+    """
+    histogramas = _registro().histogramas
+    clave = (nombre, etiquetas)
+    histograma = histogramas.get(clave)
+    if histograma is None:
+        histograma = histogramas[clave] = _Histograma(len(METRICAS[nombre][2]))
+    histograma.cuentas[bisect_left(METRICAS[nombre][2], valor)] += 1
+    histograma.suma += valor
+
+
+def _sumar_registros():
+    """
+    Suma los registros de todos los hilos. Se copian con dict()/list(),
+    que son atómicos en CPython, mientras los hilos siguen registrando.
+    """
+    with _candado:
+        _podar()
+        terminados = _Registro()
+        terminados.acumular(_terminados)
+        registros = [terminados] + [registro for _, registro in _registros]
+    contadores = {}
+    histogramas = {}
+    for registro in registros:
+        for clave, valor in dict(registro.contadores).items():
+            contadores[clave] = contadores.get(clave, 0) + valor
+        for clave, histograma in dict(registro.histogramas).items():
+            cuentas, suma = list(histograma.cuentas), histograma.suma
+            if clave in histogramas:
+                total = histogramas[clave]
+                histogramas[clave] = ([a + b for a, b in zip(total[0], cuentas)], total[1] + suma)
+            else:
+                histogramas[clave] = (cuentas, suma)
+    return contadores, histogramas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+def exponer():
+    """
+    Texto con todas las métricas del proceso en formato de exposición de
+    Prometheus (versión 0.0.4).
+    """
+    contadores, histogramas = _sumar_registros()
+    proceso = (('proceso', os.getpid()),)
+    lineas = []
+    for nombre, (tipo, descripcion, limites) in METRICAS.items():
+        lineas.append(f'# HELP {nombre} {descripcion}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        if tipo == 'counter':
+            for (clave, etiquetas), valor in sorted(contadores.items()):
+                if clave == nombre:
+                    lineas.append(f'{nombre}{_etiquetas(proceso + etiquetas)} {valor}')
+            continue
+        for (clave, etiquetas), (cuentas, suma) in sorted(histogramas.items()):
+            if clave != nombre:
+                continue
+            acumulado = 0
+            for limite, cuenta in zip((*limites, '+Inf'), cuentas):
+                acumulado += cuenta
+                lineas.append(f'{nombre}_bucket{_etiquetas(proceso + etiquetas + (("le", limite),))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(proceso + etiquetas)} {suma}')
+            lineas.append(f'{nombre}_count{_etiquetas(proceso + etiquetas)} {acumulado}')
+    return '\n'.join(lineas) + '\n'
+
+
+class _ContadorConsultas:
+    """
+    Cantidad de consultas SQL de una petición y el tiempo que toman.
+    """
+    __slots__ = ('cantidad', 'segundos')
+
+    def __init__(self):
+        self.cantidad = 0
+        self.segundos = 0.0
+
+    def __call__(self, ejecutar, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return ejecutar(sql, params, many, context)
+        finally:
+            self.cantidad += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+_consultas_peticion = ContextVar('consultas_peticion', default=None)
+
+
+def _contar_consulta(ejecutar, sql, params, many, context):
+    consultas = _consultas_peticion.get()
+    if consultas is None:
+        return ejecutar(sql, params, many, context)
+    return consultas(ejecutar, sql, params, many, context)
+
+
+def _instalar_contador(conexion):
+    # Se agrega al principio para no alterar los execute_wrapper temporales
+    if _contar_consulta not in conexion.execute_wrappers:
+        conexion.execute_wrappers.insert(0, _contar_consulta)
+
+
+@receiver(connection_created)
+def _al_conectar(sender, connection, **kwargs):
+    _instalar_contador(connection)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición: duración, consultas SQL (cantidad y tiempo) y
+    tamaño de la respuesta, agrupadas por nombre de vista. Debe ir primero
+    en MIDDLEWARE para incluir el tiempo del resto de los middleware.
+    Funciona con vistas síncronas y asíncronas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # La conexión del hilo pudo abrirse antes de cargar este módulo
+        _instalar_contador(connection)
+        consultas = _ContadorConsultas()
+        token = _consultas_peticion.set(consultas)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _consultas_peticion.reset(token)
+        return self._registrar(request, response, time.perf_counter() - inicio, consultas)
+
+    async def __acall__(self, request):
+        consultas = _ContadorConsultas()
+        token = _consultas_peticion.set(consultas)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _consultas_peticion.reset(token)
+        return self._registrar(request, response, time.perf_counter() - inicio, consultas)
+
+    def _registrar(self, request, response, duracion, consultas):
+        coincidencia = request.resolver_match
+        vista = (('vista', coincidencia.view_name if coincidencia else 'sin_ruta'),)
+        incrementar('simulador_peticiones_total', vista + (
+            ('metodo', request.method), ('codigo', response.status_code)
+        ))
+        observar('simulador_peticion_segundos', vista, duracion)
+        incrementar('simulador_consultas_db_total', vista, consultas.cantidad)
+        observar('simulador_consultas_db_segundos', vista, consultas.segundos)
+
+        # En las respuestas por partes el tamaño se conoce al terminar de enviarlas
+        if not response.streaming:
+            observar('simulador_respuesta_bytes', vista, len(response.content))
+        elif response.has_header('Content-Length'):
+            observar('simulador_respuesta_bytes', vista, int(response['Content-Length']))
+        elif response.is_async:
+            response.streaming_content = _acontar_bytes(response.streaming_content, vista)
+        else:
+            response.streaming_content = _contar_bytes(response.streaming_content, vista)
+        return response
+
+
+def _contar_bytes(partes, vista):
+    total = 0
+    for parte in partes:
+        total += len(parte)
+        yield parte
+    observar('simulador_respuesta_bytes', vista, total)
+
+
+async def _acontar_bytes(partes, vista):
+    """
+    Como _contar_bytes, para respuestas que se envían con un iterador
+    asíncrono.
+    """
+    total = 0
+    async for parte in partes:
+        total += len(parte)
+        yield parte
+    observar('simulador_respuesta_bytes', vista, total)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacion',
+            name='factor_estacional',
+            field=models.DecimalField(decimal_places=4, default=1, help_text='Factor de los parámetros de simulación activos aplicado a días y pérdida', max_digits=6, verbose_name='Factor estacional aplicado'),
+        ),
+    ]
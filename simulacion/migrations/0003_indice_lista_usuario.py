@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0002_factor_estacional'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='simulacion',
+            index=models.Index(fields=['usuario', '-creado_en', '-id'], name='simulacion_usuario_creado_idx'),
+        ),
+    ]
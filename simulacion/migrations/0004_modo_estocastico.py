@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0003_indice_lista_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacion',
+            name='distribucion',
+            field=models.CharField(choices=[('normal', 'Normal'), ('triangular', 'Triangular'), ('uniforme', 'Uniforme')], default='normal', max_length=20, verbose_name='Distribución'),
+        ),
+        migrations.AddField(
+            model_name='simulacion',
+            name='ensayos',
+            field=models.IntegerField(default=100000, verbose_name='Cantidad de ensayos'),
+        ),
+        migrations.AddField(
+            model_name='simulacion',
+            name='modo_estocastico',
+            field=models.BooleanField(default=False, help_text='Muestrear pérdida y tiempo de cultivo para estimar el riesgo', verbose_name='Simulación estocástica'),
+        ),
+        migrations.AddField(
+            model_name='simulacion',
+            name='resumen_montecarlo',
+            field=models.BinaryField(blank=True, help_text='Percentiles P50/P90/P99 empaquetados (ver montecarlo.py)', null=True, verbose_name='Resumen Monte Carlo'),
+        ),
+        migrations.AddField(
+            model_name='simulacion',
+            name='variacion_dias',
+            field=models.IntegerField(default=10, help_text='Desviación estándar (normal) o amplitud (triangular/uniforme) de los días de cultivo', verbose_name='Variación del tiempo de cultivo (días)'),
+        ),
+        migrations.AddField(
+            model_name='simulacion',
+            name='variacion_perdida',
+            field=models.DecimalField(decimal_places=2, default=5, help_text='Desviación estándar (normal) o amplitud (triangular/uniforme) del porcentaje de pérdida', max_digits=5, verbose_name='Variación de la pérdida (puntos %)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0004_modo_estocastico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacion',
+            name='curva_biomasa',
+            field=models.BinaryField(blank=True, help_text='Biomasa diaria desde el inicio de cultivo hasta la fecha objetivo (float32 empaquetado)', null=True, verbose_name='Curva de biomasa'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0005_curva_biomasa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('toneladas', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Toneladas en cultivo')),
+                ('tipo_alga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='simulacion.tipoalga', verbose_name='Tipo de alga')),
+            ],
+            options={
+                'verbose_name': 'Ocupación Diaria',
+                'verbose_name_plural': 'Ocupación Diaria',
+                'ordering': ['fecha', 'tipo_alga'],
+                'indexes': [models.Index(fields=['fecha'], name='ocupacion_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo_alga', 'fecha'), name='ocupacion_tipo_fecha_unica')],
+            },
+        ),
+    ]
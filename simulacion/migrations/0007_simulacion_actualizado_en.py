@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0006_ocupacion_diaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacion',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0007_simulacion_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoTrabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=200, unique=True, verbose_name='Clave del proceso')),
+                ('posicion', models.BigIntegerField(default=0, verbose_name='Posición confirmada')),
+                ('completado', models.BooleanField(default=False, verbose_name='Completado')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Progreso de Trabajo',
+                'verbose_name_plural': 'Progreso de Trabajos',
+            },
+        ),
+    ]
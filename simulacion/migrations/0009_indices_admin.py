@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0008_progreso_trabajo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='simulacion',
+            index=models.Index(fields=['creado_en'], name='simulacion_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulacion',
+            index=models.Index(fields=['fecha_objetivo'], name='simulacion_fecha_objetivo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulacion',
+            index=models.Index(fields=['tipo_alga', 'creado_en'], name='simulacion_tipo_creado_idx'),
+        ),
+    ]
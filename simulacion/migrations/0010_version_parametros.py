@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0009_indices_admin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacion',
+            name='version_parametros',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Versión de los parámetros del tipo de alga con que se calcularon los resultados', verbose_name='Versión de parámetros'),
+        ),
+        migrations.AddField(
+            model_name='tipoalga',
+            name='version_parametros',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Aumenta cada vez que cambian el tiempo de cultivo o el porcentaje de pérdida', verbose_name='Versión de parámetros'),
+        ),
+        migrations.AddIndex(
+            model_name='simulacion',
+            index=models.Index(fields=['tipo_alga', 'fecha_inicio_cultivo'], name='simulacion_tipo_inicio_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0010_version_parametros'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProduccionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('toneladas_plantadas', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Toneladas plantadas')),
+                ('toneladas_entregadas', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Toneladas entregadas')),
+                ('siembras', models.IntegerField(default=0, verbose_name='Simulaciones que se plantan')),
+                ('entregas', models.IntegerField(default=0, verbose_name='Simulaciones que se entregan')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('tipo_alga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='simulacion.tipoalga', verbose_name='Tipo de alga')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Producción Diaria',
+                'verbose_name_plural': 'Producción Diaria',
+                'ordering': ['fecha', 'tipo_alga', 'usuario'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tipo_alga', 'usuario'), name='produccion_diaria_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProduccionMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('toneladas_plantadas', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Toneladas plantadas')),
+                ('toneladas_entregadas', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Toneladas entregadas')),
+                ('siembras', models.IntegerField(default=0, verbose_name='Simulaciones que se plantan')),
+                ('entregas', models.IntegerField(default=0, verbose_name='Simulaciones que se entregan')),
+                ('mes', models.DateField(verbose_name='Mes')),
+                ('tipo_alga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='simulacion.tipoalga', verbose_name='Tipo de alga')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Producción Mensual',
+                'verbose_name_plural': 'Producción Mensual',
+                'ordering': ['mes', 'tipo_alga', 'usuario'],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'tipo_alga', 'usuario'), name='produccion_mensual_unica')],
+            },
+        ),
+    ]
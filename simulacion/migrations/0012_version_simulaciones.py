@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('simulacion', '0011_produccion_resumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionSimulaciones',
+            fields=[
+                ('usuario', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Versión')),
+            ],
+            options={
+                'verbose_name': 'Versión de Simulaciones',
+                'verbose_name_plural': 'Versiones de Simulaciones',
+            },
+        ),
+    ]
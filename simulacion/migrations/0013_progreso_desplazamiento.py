@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacion', '0012_version_simulaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='progresotrabajo',
+            name='desplazamiento',
+            field=models.BigIntegerField(default=0, verbose_name='Desplazamiento en el archivo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def eliminar_huerfanas(apps, schema_editor):
+    """
+    Elimina las versiones de usuarios que ya se borraron, antes de que la
+    señal post_delete de User las quitara.
+    """
+    User = apps.get_model('auth', 'User')
+    VersionSimulaciones = apps.get_model('simulacion', 'VersionSimulaciones')
+    VersionSimulaciones.objects.exclude(usuario_id__in=User.objects.values('pk')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('simulacion', '0013_progreso_desplazamiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_huerfanas, migrations.RunPython.noop),
+    ]
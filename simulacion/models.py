@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .montecarlo import DISTRIBUCION_CHOICES, ENSAYOS_POR_DEFECTO
+
 # Modelo para los tipos de algas que se cultivan
 class TipoAlga(models.Model):
     """
@@ -19,6 +21,12 @@ class TipoAlga(models.Model):
         verbose_name="Porcentaje de pérdida (%)",
         help_text="Porcentaje de pérdida durante el cultivo (ej: 20 para 20%)"
     )
+    version_parametros = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Versión de parámetros",
+        help_text="Aumenta cada vez que cambian el tiempo de cultivo o el porcentaje de pérdida"
+    )
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
@@ -113,6 +121,62 @@ class Simulacion(models.Model):
     dias_cultivo = models.IntegerField(
         verbose_name="Días de cultivo necesarios"
     )
+    factor_estacional = models.DecimalField(
+        max_digits=6,
+        decimal_places=4,
+        default=1,
+        verbose_name="Factor estacional aplicado",
+        help_text="Factor de los parámetros de simulación activos aplicado a días y pérdida"
+    )
+    curva_biomasa = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Curva de biomasa",
+        help_text="Biomasa diaria desde el inicio de cultivo hasta la fecha objetivo (float32 empaquetado)"
+    )
+    version_parametros = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Versión de parámetros",
+        help_text="Versión de los parámetros del tipo de alga con que se calcularon los resultados"
+    )
+    
+    # Modo estocástico (Monte Carlo)
+    modo_estocastico = models.BooleanField(
+        default=False,
+        verbose_name="Simulación estocástica",
+        help_text="Muestrear pérdida y tiempo de cultivo para estimar el riesgo"
+    )
+    distribucion = models.CharField(
+        max_length=20,
+        choices=DISTRIBUCION_CHOICES,
+        default='normal',
+        verbose_name="Distribución"
+    )
+    variacion_perdida = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=5,
+        verbose_name="Variación de la pérdida (puntos %)",
+        help_text="Desviación estándar (normal) o amplitud (triangular/uniforme) del porcentaje de pérdida"
+    )
+    variacion_dias = models.IntegerField(
+        default=10,
+        verbose_name="Variación del tiempo de cultivo (días)",
+        help_text="Desviación estándar (normal) o amplitud (triangular/uniforme) de los días de cultivo"
+    )
+    ensayos = models.IntegerField(
+        default=ENSAYOS_POR_DEFECTO,
+        verbose_name="Cantidad de ensayos"
+    )
+    resumen_montecarlo = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Resumen Monte Carlo",
+        help_text="Percentiles P50/P90/P99 empaquetados (ver montecarlo.py)"
+    )
     
     # Metadatos
     notas = models.TextField(
@@ -120,35 +184,220 @@ class Simulacion(models.Model):
         verbose_name="Notas adicionales"
     )
     creado_en = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    actualizado_en = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
     
     class Meta:
         verbose_name = "Simulación"
         verbose_name_plural = "Simulaciones"
         ordering = ['-creado_en']
+        indexes = [
+            # Lista de simulaciones del usuario paginada por (creado_en, id)
+            models.Index(fields=['usuario', '-creado_en', '-id'], name='simulacion_usuario_creado_idx'),
+            # Filtros, orden y navegación por fechas del admin
+            models.Index(fields=['creado_en'], name='simulacion_creado_idx'),
+            models.Index(fields=['fecha_objetivo'], name='simulacion_fecha_objetivo_idx'),
+            models.Index(fields=['tipo_alga', 'creado_en'], name='simulacion_tipo_creado_idx'),
+            # Simulaciones por cultivar de un tipo de alga (ver recalculo.py)
+            models.Index(fields=['tipo_alga', 'fecha_inicio_cultivo'], name='simulacion_tipo_inicio_idx'),
+        ]
 
     def __str__(self):
         return f"Simulación {self.id} - {self.tipo_alga.nombre} - {self.toneladas_deseadas}t"
 
+    @property
+    def porcentaje_perdida_aplicado(self):
+        """
+        Porcentaje de pérdida del tipo de alga con el ajuste estacional aplicado.
+        """
+        from decimal import Decimal, ROUND_HALF_UP
+
+        porcentaje = self.tipo_alga.porcentaje_perdida * self.factor_estacional
+        return porcentaje.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @property
+    def serie_biomasa(self):
+        """
+        Biomasa diaria en toneladas como arreglo NumPy float32. Se decodifica
+        sin copiar los bytes guardados, solo cuando se solicita.
+        """
+        import numpy as np
+
+        if not self.curva_biomasa:
+            return np.empty(0, dtype='<f4')
+        return np.frombuffer(self.curva_biomasa, dtype='<f4')
+
+    @property
+    def percentiles_montecarlo(self):
+        """
+        Percentiles P50/P90/P99 de toneladas a plantar y fecha de inicio,
+        decodificados desde el resumen guardado.
+        """
+        from .montecarlo import leer_resumen
+
+        return leer_resumen(self)
+
     def calcular_simulacion(self):
         """
         Método para calcular los resultados de la simulación.
         Considera el porcentaje de pérdida y el tiempo de cultivo.
+        Usa el mismo motor por lotes que los procesos masivos, de modo que
+        el resultado de una simulación individual es idéntico al del lote.
+        Los parámetros de simulación activos ajustan días y pérdida según
+        la estación (ver estaciones.py).
         """
-        # Calcular toneladas a plantar considerando pérdidas
-        # Si se pierde un 20%, necesitamos plantar más para compensar
-        factor_perdida = 1 + (self.tipo_alga.porcentaje_perdida / 100)
-        self.toneladas_a_plantar = self.toneladas_deseadas * factor_perdida
-        
-        # Calcular días de cultivo
-        self.dias_cultivo = self.tipo_alga.tiempo_cultivo_dias
-        
-        # Calcular fecha de inicio restando los días de cultivo a la fecha objetivo
-        from datetime import timedelta
-        self.fecha_inicio_cultivo = self.fecha_objetivo - timedelta(days=self.dias_cultivo)
-        
+        from .motor import calcular_simulaciones
+
+        calcular_simulaciones([self])
+
         return {
             'toneladas_a_plantar': self.toneladas_a_plantar,
             'fecha_inicio_cultivo': self.fecha_inicio_cultivo,
             'dias_cultivo': self.dias_cultivo,
-            'porcentaje_perdida': self.tipo_alga.porcentaje_perdida
+            'porcentaje_perdida': self.porcentaje_perdida_aplicado,
+            'factor_estacional': self.factor_estacional
         }
+
+
+# Modelo con la ocupación diaria de las líneas de cultivo
+class OcupacionDiaria(models.Model):
+    """
+    Toneladas en el agua por día y tipo de alga.
+    Se mantiene al día de forma incremental cada vez que se crea, recalcula
+    o elimina una simulación (ver agregados.py), para consultar el
+    calendario de cultivo sin recorrer todas las simulaciones.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    tipo_alga = models.ForeignKey(
+        TipoAlga,
+        on_delete=models.CASCADE,
+        verbose_name="Tipo de alga",
+        related_name="ocupacion"
+    )
+    toneladas = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Toneladas en cultivo"
+    )
+
+    class Meta:
+        verbose_name = "Ocupación Diaria"
+        verbose_name_plural = "Ocupación Diaria"
+        ordering = ['fecha', 'tipo_alga']
+        constraints = [
+            models.UniqueConstraint(fields=['tipo_alga', 'fecha'], name='ocupacion_tipo_fecha_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='ocupacion_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.tipo_alga_id} - {self.toneladas}t"
+
+
+# Modelos con la producción resumida por período, tipo de alga y usuario
+class ProduccionResumen(models.Model):
+    """
+    Toneladas plantadas (según la fecha de inicio de cultivo) y entregadas
+    (según la fecha objetivo) en un período, por tipo de alga y usuario.
+    Se mantiene al día de forma incremental igual que la ocupación diaria
+    (ver agregados.py), para que el tablero lea unas pocas filas en vez de
+    recorrer todas las simulaciones.
+    """
+    tipo_alga = models.ForeignKey(TipoAlga, on_delete=models.CASCADE, verbose_name="Tipo de alga", related_name="+")
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuario", related_name="+")
+    toneladas_plantadas = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, verbose_name="Toneladas plantadas"
+    )
+    toneladas_entregadas = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, verbose_name="Toneladas entregadas"
+    )
+    siembras = models.IntegerField(default=0, verbose_name="Simulaciones que se plantan")
+    entregas = models.IntegerField(default=0, verbose_name="Simulaciones que se entregan")
+
+    class Meta:
+        abstract = True
+
+
+class ProduccionDiaria(ProduccionResumen):
+    fecha = models.DateField(verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Producción Diaria"
+        verbose_name_plural = "Producción Diaria"
+        ordering = ['fecha', 'tipo_alga', 'usuario']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'tipo_alga', 'usuario'], name='produccion_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.tipo_alga_id} - {self.usuario_id}"
+
+
+class ProduccionMensual(ProduccionResumen):
+    # Primer día del mes
+    mes = models.DateField(verbose_name="Mes")
+
+    class Meta:
+        verbose_name = "Producción Mensual"
+        verbose_name_plural = "Producción Mensual"
+        ordering = ['mes', 'tipo_alga', 'usuario']
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'tipo_alga', 'usuario'], name='produccion_mensual_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} - {self.tipo_alga_id} - {self.usuario_id}"
+
+
+# Modelo con la versión de las simulaciones de cada usuario
+class VersionSimulaciones(models.Model):
+    """
+    Número que aumenta cada vez que cambian las simulaciones de un usuario.
+    Se aumenta en la misma transacción que las tablas agregadas (ver
+    agregados.py), para que la API arme el ETag de la lista con una sola
+    fila en vez de recorrer las simulaciones del usuario.
+    Sin restricción de clave foránea: al eliminar un usuario sus
+    simulaciones todavía aumentan la versión mientras se borran. La fila
+    se elimina después del usuario (ver signals.py).
+    """
+    usuario = models.OneToOneField(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        verbose_name="Usuario",
+        related_name="+"
+    )
+    version = models.BigIntegerField(default=0, verbose_name="Versión")
+
+    class Meta:
+        verbose_name = "Versión de Simulaciones"
+        verbose_name_plural = "Versiones de Simulaciones"
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.version}"
+
+
+
+# Modelo con el avance de los procesos largos
+class ProgresoTrabajo(models.Model):
+    """
+    Avance confirmado de un proceso largo (por ejemplo una importación).
+    Se actualiza en la misma transacción que cada bloque procesado, de modo
+    que si el proceso se interrumpe se puede retomar desde el último
+    bloque guardado sin repetir ni perder filas.
+    """
+    clave = models.CharField(max_length=200, unique=True, verbose_name="Clave del proceso")
+    posicion = models.BigIntegerField(default=0, verbose_name="Posición confirmada")
+    # Byte del archivo donde continúa el proceso, para los que leen archivos
+    desplazamiento = models.BigIntegerField(default=0, verbose_name="Desplazamiento en el archivo")
+    completado = models.BooleanField(default=False, verbose_name="Completado")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Progreso de Trabajo"
+        verbose_name_plural = "Progreso de Trabajos"
+
+    def __str__(self):
+        return f"{self.clave} - {self.posicion}"
@@ -0,0 +1,124 @@
+"""
+Modo estocástico (Monte Carlo) de las simulaciones.
+
+En lugar de usar un único porcentaje de pérdida y un único tiempo de
+cultivo, se muestrean ambos desde una distribución centrada en los valores
+del tipo de alga (ya ajustados por estación) y se calculan percentiles de
+las toneladas a plantar y de la fecha de inicio. Todos los ensayos se
+evalúan juntos con NumPy.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+
+# Percentiles que se guardan en el resumen
+PERCENTILES = (50, 90, 99)
+
+DISTRIBUCION_CHOICES = [
+    ('normal', 'Normal'),
+    ('triangular', 'Triangular'),
+    ('uniforme', 'Uniforme'),
+]
+
+ENSAYOS_POR_DEFECTO = 100000
+
+
+def muestrear(rng, distribucion, centro, variacion, cantidad):
+    """
+    Genera 'cantidad' muestras alrededor de 'centro'.
+    - normal: desviación estándar 'variacion'
+    - triangular: moda 'centro' entre centro ± variacion
+    - uniforme: entre centro ± variacion
+    """
+    if variacion <= 0:
+        return np.full(cantidad, float(centro))
+    if distribucion == 'normal':
+        return rng.normal(centro, variacion, cantidad)
+    if distribucion == 'triangular':
+        return rng.triangular(centro - variacion, centro, centro + variacion, cantidad)
+    if distribucion == 'uniforme':
+        return rng.uniform(centro - variacion, centro + variacion, cantidad)
+    raise ValueError(f'Distribución desconocida: {distribucion}')
+
+
+def simular(toneladas_deseadas, porcentaje_perdida, dias_cultivo, distribucion,
+            variacion_perdida, variacion_dias, ensayos=ENSAYOS_POR_DEFECTO, semilla=None):
+    """
+    Ejecuta los ensayos y retorna un arreglo int64 de 6 valores:
+    toneladas a plantar P50/P90/P99 (en centésimas) y días de cultivo
+    P50/P90/P99. Un percentil alto cubre los escenarios más desfavorables:
+    más pérdida (más toneladas) y más días (inicio más temprano).
+    """
+    rng = np.random.default_rng(semilla)
+    perdidas = muestrear(rng, distribucion, float(porcentaje_perdida), float(variacion_perdida), ensayos)
+    dias = muestrear(rng, distribucion, float(dias_cultivo), float(variacion_dias), ensayos)
+
+    np.maximum(perdidas, 0, out=perdidas)
+    toneladas = float(toneladas_deseadas) * (1 + perdidas / 100)
+    dias = np.maximum(np.ceil(dias), 1)
+
+    percentiles_toneladas = np.percentile(toneladas, PERCENTILES)
+    percentiles_dias = np.percentile(dias, PERCENTILES, method='higher')
+    return np.concatenate([
+        np.ceil(np.round(percentiles_toneladas * 100, 6)),
+        percentiles_dias,
+    ]).astype(np.int64)
+
+
+def semilla_de(simulacion):
+    """
+    Semilla derivada de los datos de la simulación, para que recalcular
+    la misma simulación entregue los mismos percentiles.
+    """
+    return [
+        int(simulacion.toneladas_deseadas * 100),
+        simulacion.fecha_objetivo.toordinal(),
+        int(simulacion.variacion_perdida * 100),
+        simulacion.variacion_dias,
+        simulacion.ensayos,
+        simulacion.tipo_alga_id or 0,
+    ]
+
+
+def calcular_resumen(simulacion):
+    """
+    Calcula el resumen Monte Carlo de una simulación ya calculada por el
+    motor y lo guarda empaquetado en 'resumen_montecarlo'.
+    """
+    if not simulacion.modo_estocastico:
+        simulacion.resumen_montecarlo = None
+        return None
+
+    resumen = simular(
+        simulacion.toneladas_deseadas,
+        simulacion.porcentaje_perdida_aplicado,
+        simulacion.dias_cultivo,
+        simulacion.distribucion,
+        simulacion.variacion_perdida,
+        simulacion.variacion_dias,
+        ensayos=simulacion.ensayos,
+        semilla=semilla_de(simulacion),
+    )
+    simulacion.resumen_montecarlo = resumen.astype('<i8').tobytes()
+    return resumen
+
+
+def leer_resumen(simulacion):
+    """
+    Decodifica el resumen guardado. Retorna una lista con un diccionario
+    por percentil, o None si la simulación no tiene resumen.
+    """
+    if not simulacion.resumen_montecarlo:
+        return None
+    valores = np.frombuffer(bytes(simulacion.resumen_montecarlo), dtype='<i8')
+    cantidad = len(PERCENTILES)
+    return [
+        {
+            'percentil': percentil,
+            'toneladas_a_plantar': Decimal(int(valores[i])).scaleb(-2),
+            'dias_cultivo': int(valores[cantidad + i]),
+            'fecha_inicio_cultivo': simulacion.fecha_objetivo - timedelta(days=int(valores[cantidad + i])),
+        }
+        for i, percentil in enumerate(PERCENTILES)
+    ]
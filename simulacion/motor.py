@@ -0,0 +1,403 @@
+"""
+Motor de cálculo por lotes de las simulaciones.
+
+Calcula toneladas a plantar, días de cultivo y fecha de inicio para un
+arreglo completo de entradas en una sola pasada de NumPy. Tanto
+Simulacion.calcular_simulacion() como las vistas, el admin y los procesos
+masivos usan este mismo motor, por lo que los resultados son idénticos.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from . import catalogo
+from .escritura import escritura
+from .estaciones import FACTOR_NEUTRO, indice_dia, tabla_factores
+from .montecarlo import calcular_resumen
+
+# Cantidad de filas que se escriben por cada bulk_create o bloque de UPDATE
+TAMANO_LOTE = 1000
+
+# Campos que el motor calcula y que se deben escribir al actualizar
+CAMPOS_CALCULADOS = [
+    'toneladas_a_plantar',
+    'fecha_inicio_cultivo',
+    'dias_cultivo',
+    'factor_estacional',
+    'resumen_montecarlo',
+    'curva_biomasa',
+    'version_parametros',
+]
+
+
+def a_centesimas(valores):
+    """
+    Convierte una secuencia de Decimal con 2 decimales a un arreglo de
+    enteros en centésimas. Trabajar con enteros evita errores de redondeo
+    de punto flotante y permite reproducir exactamente el cálculo Decimal.
+    """
+    return np.fromiter(
+        (int((Decimal(valor) * 100).to_integral_value()) for valor in valores),
+        dtype=np.int64,
+    )
+
+
+def desde_centesimas(valor):
+    """
+    Convierte un entero en centésimas a Decimal con 2 decimales.
+    """
+    return Decimal(int(valor)).scaleb(-2)
+
+
+def _ajustar(valores, factores):
+    """
+    Multiplica enteros por factores en diezmilésimas, redondeando la
+    mitad hacia arriba.
+    """
+    return (valores * factores + FACTOR_NEUTRO // 2) // FACTOR_NEUTRO
+
+
+def redondear_centesimas(valores):
+    """
+    Lleva enteros en millonésimas a centésimas redondeando la mitad al par
+    (ROUND_HALF_EVEN), el mismo redondeo que aplica el DecimalField de
+    Simulacion al guardar un Decimal con más de 2 decimales.
+    """
+    cociente, resto = np.divmod(valores, 10000)
+    return cociente + ((resto > 5000) | ((resto == 5000) & (cociente % 2 == 1)))
+
+
+def calcular_lote(toneladas_deseadas, fechas_objetivo, porcentajes_perdida, dias_cultivo,
+                  tabla_estacional=None):
+    """
+    Calcula los resultados de un lote completo de simulaciones.
+
+    Recibe arreglos alineados:
+    - toneladas_deseadas: enteros en centésimas de tonelada
+    - fechas_objetivo: arreglo datetime64[D]
+    - porcentajes_perdida: enteros en centésimas de porcentaje
+    - dias_cultivo: enteros
+    - tabla_estacional: tabla de 366 factores (ver estaciones.py) o None
+      para no aplicar ajuste estacional
+
+    Retorna un diccionario con los arreglos 'toneladas_deseadas' y
+    'toneladas_a_plantar' (en centésimas), 'dias_cultivo', 'fecha_inicio_cultivo' (datetime64[D]),
+    'porcentaje_perdida' (en centésimas, ya ajustado) y 'factor_estacional'
+    (en diezmilésimas).
+
+    El factor estacional corresponde al día en que comenzaría el cultivo
+    sin ajuste (Fecha Objetivo - Tiempo de Cultivo) y multiplica tanto los
+    días de cultivo como el porcentaje de pérdida.
+
+    Toneladas a Plantar = Toneladas Deseadas × (1 + Porcentaje Pérdida / 100),
+    redondeado a 2 decimales con la mitad al par (ROUND_HALF_EVEN), como lo
+    hace el DecimalField donde se guarda (ver redondear_centesimas).
+    """
+    toneladas = np.asarray(toneladas_deseadas, dtype=np.int64)
+    perdidas = np.asarray(porcentajes_perdida, dtype=np.int64)
+    dias = np.asarray(dias_cultivo, dtype=np.int64)
+    fechas = np.asarray(fechas_objetivo, dtype='datetime64[D]')
+
+    if tabla_estacional is None:
+        factores = np.full(fechas.shape, FACTOR_NEUTRO, dtype=np.int64)
+    else:
+        factores = tabla_estacional[indice_dia(fechas - dias.astype('timedelta64[D]'))]
+        dias = _ajustar(dias, factores)
+        perdidas = _ajustar(perdidas, factores)
+
+    # toneladas (1e-2) × (10000 + pérdida) (1e-4) queda en unidades de 1e-6
+    toneladas_a_plantar = redondear_centesimas(toneladas * (10000 + perdidas))
+
+    fecha_inicio = fechas - dias.astype('timedelta64[D]')
+
+    return {
+        'toneladas_deseadas': toneladas,
+        'toneladas_a_plantar': toneladas_a_plantar,
+        'dias_cultivo': dias,
+        'fecha_inicio_cultivo': fecha_inicio,
+        'porcentaje_perdida': perdidas,
+        'factor_estacional': factores,
+    }
+
+
+def curvas_biomasa(toneladas_a_plantar, toneladas_deseadas, dias_cultivo):
+    """
+    Calcula la biomasa diaria de un lote de simulaciones, desde el día de
+    siembra (toneladas a plantar) hasta la fecha objetivo (toneladas
+    deseadas), repartiendo la pérdida con una tasa diaria constante:
+
+        Biomasa(d) = Plantado × (Deseado / Plantado) ^ (d / Días de Cultivo)
+
+    Recibe arreglos de toneladas en centésimas y días. Todas las series se
+    calculan juntas en un solo arreglo y se retornan como bytes float32
+    (little-endian), una por simulación, con Días de Cultivo + 1 valores.
+    """
+    plantado = np.asarray(toneladas_a_plantar, dtype=np.float64) / 100
+    deseado = np.asarray(toneladas_deseadas, dtype=np.float64) / 100
+    dias = np.asarray(dias_cultivo, dtype=np.int64)
+
+    largos = dias + 1
+    finales = np.cumsum(largos)
+    inicios = finales - largos
+    # Día de cultivo de cada posición del arreglo concatenado
+    dia = np.arange(finales[-1]) - np.repeat(inicios, largos)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa = np.where(
+            (dias > 0) & (plantado > 0),
+            np.log(deseado / plantado) / dias,
+            0.0
+        )
+    biomasa = np.repeat(plantado, largos) * np.exp(np.repeat(tasa, largos) * dia)
+    biomasa = biomasa.astype('<f4')
+    return [biomasa[inicio:fin].tobytes() for inicio, fin in zip(inicios, finales)]
+
+
+def _tipos_de(simulaciones):
+    """
+    Obtiene los TipoAlga de las simulaciones desde el catálogo en memoria.
+    Se reutilizan los que ya estén cargados en la simulación (por ejemplo
+    un tipo recién editado en el admin) y solo se consultan los que no
+    estén en el catálogo.
+    """
+    from .models import TipoAlga
+
+    en_catalogo = catalogo.obtener().tipos
+    tipos = {}
+    faltantes = set()
+    for simulacion in simulaciones:
+        if _tipo_en_cache(simulacion):
+            tipos[simulacion.tipo_alga_id] = simulacion.tipo_alga
+        elif simulacion.tipo_alga_id in en_catalogo:
+            tipos.setdefault(simulacion.tipo_alga_id, en_catalogo[simulacion.tipo_alga_id])
+        else:
+            faltantes.add(simulacion.tipo_alga_id)
+    faltantes.difference_update(tipos)
+    if faltantes:
+        tipos.update(TipoAlga.objects.in_bulk(faltantes))
+    return tipos
+
+
+def _tipo_en_cache(simulacion):
+    """
+    Indica si la simulación ya tiene su TipoAlga en la caché de la relación.
+    """
+    return simulacion.__class__.tipo_alga.is_cached(simulacion)
+
+
+def calcular_simulaciones(simulaciones):
+    """
+    Calcula en una sola pasada los resultados de una lista de instancias
+    de Simulacion y los asigna a cada instancia (sin guardar).
+    """
+    simulaciones = list(simulaciones)
+    if not simulaciones:
+        return simulaciones
+
+    tipos = _tipos_de(simulaciones)
+    for simulacion in simulaciones:
+        simulacion.tipo_alga = tipos[simulacion.tipo_alga_id]
+
+    resultados = calcular_lote(
+        a_centesimas(s.toneladas_deseadas for s in simulaciones),
+        np.array([s.fecha_objetivo for s in simulaciones], dtype='datetime64[D]'),
+        a_centesimas(s.tipo_alga.porcentaje_perdida for s in simulaciones),
+        np.fromiter((s.tipo_alga.tiempo_cultivo_dias for s in simulaciones), dtype=np.int64),
+        tabla_estacional=tabla_factores(),
+    )
+
+    fechas_inicio = resultados['fecha_inicio_cultivo'].astype(object)
+    curvas = curvas_biomasa(
+        resultados['toneladas_a_plantar'], resultados['toneladas_deseadas'], resultados['dias_cultivo']
+    )
+    for i, simulacion in enumerate(simulaciones):
+        simulacion.toneladas_a_plantar = desde_centesimas(resultados['toneladas_a_plantar'][i])
+        simulacion.dias_cultivo = int(resultados['dias_cultivo'][i])
+        simulacion.fecha_inicio_cultivo = fechas_inicio[i]
+        simulacion.factor_estacional = Decimal(int(resultados['factor_estacional'][i])).scaleb(-4)
+        simulacion.curva_biomasa = curvas[i]
+        simulacion.version_parametros = simulacion.tipo_alga.version_parametros
+        calcular_resumen(simulacion)
+    return simulaciones
+
+
+def crear_simulaciones(simulaciones, tamano_lote=TAMANO_LOTE):
+    """
+    Calcula y crea un lote de simulaciones nuevas con bulk_create,
+    escribiendo por bloques dentro de una única transacción.
+    También actualiza las tablas agregadas (ver agregados.py).
+    """
+    from .agregados import ocupacion_de, registrar_cambios
+    from .models import Simulacion
+
+    simulaciones = calcular_simulaciones(simulaciones)
+    with escritura():
+        for inicio in range(0, len(simulaciones), tamano_lote):
+            Simulacion.objects.bulk_create(simulaciones[inicio:inicio + tamano_lote])
+        # Las ocupaciones del lote completo se combinan en una sola pasada
+        registrar_cambios(agregar=[ocupacion_de(s) for s in simulaciones])
+    return simulaciones
+
+
+def actualizar_simulaciones(simulaciones, tamano_lote=TAMANO_LOTE, campos=()):
+    """
+    Recalcula un lote de simulaciones existentes y guarda por bloques solo
+    las que cambian: se comparan con los valores guardados y se escriben
+    con un UPDATE por id ejecutado con executemany (ver _escribir). A las
+    que quedan iguales solo se les actualiza la versión de parámetros.
+    'campos' permite incluir campos de entrada que también hayan cambiado.
+    También actualiza las tablas agregadas con la diferencia entre los
+    valores guardados y los nuevos, y elimina los PDF en caché de las
+    simulaciones que cambiaron. Retorna las simulaciones que cambiaron.
+    """
+    from . import reportes
+    from .agregados import ocupacion_de, registrar_cambios
+
+    simulaciones = calcular_simulaciones(simulaciones)
+    campos = [_campo(campo) for campo in dict.fromkeys([*campos, *CAMPOS_CALCULADOS])]
+    # La curva depende de toneladas y días, que ya se comparan; solo se
+    # revisa que exista
+    comparados = [campo for campo in campos if campo.name not in ('curva_biomasa', 'version_parametros')]
+
+    ahora = timezone.now()
+    cambiadas = []
+    with escritura():
+        for inicio in range(0, len(simulaciones), tamano_lote):
+            bloque = simulaciones[inicio:inicio + tamano_lote]
+            guardadas = _valores_guardados(bloque, comparados)
+            escribir, anteriores, versiones = [], [], []
+            for simulacion in bloque:
+                guardada = guardadas.get(simulacion.pk)
+                if guardada is None:
+                    # Se eliminó mientras tanto
+                    continue
+                ocupacion, valores, version, sin_curva = guardada
+                if sin_curva or valores != _valores(simulacion, comparados):
+                    simulacion.actualizado_en = ahora
+                    escribir.append(simulacion)
+                    anteriores.append(ocupacion)
+                elif version != simulacion.version_parametros:
+                    versiones.append((simulacion.version_parametros, simulacion.pk))
+            _escribir(escribir, [*campos, _campo('actualizado_en')])
+            if versiones:
+                _escribir_versiones(versiones)
+            registrar_cambios(quitar=anteriores, agregar=[ocupacion_de(s) for s in escribir])
+            cambiadas.extend(escribir)
+    # Después de confirmar, para que un PDF generado mientras tanto con los
+    # valores anteriores no quede en la caché
+    transaction.on_commit(lambda: reportes.invalidar_simulaciones(cambiadas))
+    return cambiadas
+
+
+def _campo(nombre):
+    from .models import Simulacion
+
+    return Simulacion._meta.get_field(nombre)
+
+
+def _valores(simulacion, campos):
+    """
+    Valores de los campos en una instancia, comparables con los leídos de
+    la base de datos (los binarios como bytes).
+    """
+    return tuple(
+        bytes(valor) if isinstance(valor, memoryview) else valor
+        for valor in (getattr(simulacion, campo.attname) for campo in campos)
+    )
+
+
+def _valores_guardados(simulaciones, campos):
+    """
+    Lee en una consulta lo guardado de un bloque de simulaciones. Retorna
+    {pk: (ocupación, valores de 'campos', versión, sin curva)}.
+    """
+    from django.db.models import BooleanField, ExpressionWrapper, Q
+
+    from .agregados import CAMPOS_OCUPACION
+    from .models import Simulacion
+
+    largo = len(CAMPOS_OCUPACION)
+    filas = Simulacion.objects.filter(pk__in=[s.pk for s in simulaciones]).annotate(
+        sin_curva=ExpressionWrapper(Q(curva_biomasa__isnull=True), output_field=BooleanField())
+    ).values_list('pk', *CAMPOS_OCUPACION, *(campo.attname for campo in campos), 'version_parametros', 'sin_curva')
+    return {
+        pk: (
+            tuple(fila[:largo]),
+            tuple(bytes(valor) if isinstance(valor, memoryview) else valor for valor in fila[largo:-2]),
+            fila[-2],
+            fila[-1],
+        )
+        for pk, *fila in filas.order_by()
+    }
+
+
+def _escribir(simulaciones, campos):
+    """
+    Guarda los campos indicados de las simulaciones con un UPDATE por id
+    ejecutado con executemany: la sentencia se prepara una sola vez y los
+    valores se adaptan antes. bulk_update arma una expresión CASE por campo
+    y por fila, y con miles de filas eso domina el tiempo del recálculo.
+    No envía post_save ni aplica auto_now.
+    """
+    from .models import Simulacion
+
+    if not simulaciones:
+        return
+    conexion = connections[DEFAULT_DB_ALIAS]
+    nombre = conexion.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        nombre(Simulacion._meta.db_table),
+        ', '.join(f'{nombre(campo.column)} = %s' for campo in campos),
+        nombre(Simulacion._meta.pk.column),
+    )
+    filas = [
+        [campo.get_db_prep_save(getattr(simulacion, campo.attname), conexion) for campo in campos] + [simulacion.pk]
+        for simulacion in simulaciones
+    ]
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def _escribir_versiones(versiones):
+    """
+    Actualiza solo la versión de parámetros; 'versiones' son pares
+    (version_parametros, pk).
+    """
+    from .models import Simulacion
+
+    conexion = connections[DEFAULT_DB_ALIAS]
+    nombre = conexion.ops.quote_name
+    with conexion.cursor() as cursor:
+        cursor.executemany(
+            'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+                nombre(Simulacion._meta.db_table), nombre('version_parametros'), nombre(Simulacion._meta.pk.column)
+            ),
+            versiones,
+        )
+
+
+def guardar_simulacion(simulacion, recalcular=True):
+    """
+    Guarda una sola simulación pasando por el mismo motor que los lotes.
+    Si es nueva se crea; si ya existe se actualiza completa.
+    """
+    from . import reportes
+    from .agregados import ocupacion_de, ocupaciones_actuales, registrar_cambios
+
+    if simulacion.pk is None:
+        crear_simulaciones([simulacion])
+    else:
+        if recalcular:
+            calcular_simulaciones([simulacion])
+        with escritura():
+            anteriores = ocupaciones_actuales([simulacion.pk])
+            simulacion.save()
+            registrar_cambios(quitar=anteriores, agregar=[ocupacion_de(simulacion)])
+        # post_save limpia la carpeta del tipo de alga actual; si cambió, los
+        # PDF anteriores quedaron en la del tipo anterior
+        for tipo_alga_id, *_ in anteriores:
+            if tipo_alga_id != simulacion.tipo_alga_id:
+                reportes.invalidar_simulacion(simulacion.pk, tipo_alga_id)
+    return simulacion
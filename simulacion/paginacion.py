@@ -0,0 +1,43 @@
+"""
+Paginación por cursor de las listas de simulaciones.
+
+Las páginas se ordenan por (creado_en, id) descendente y cada una continúa
+desde la última simulación de la anterior, por lo que su costo no depende
+de la cantidad total de simulaciones. La usan la lista HTML (views.py) y
+la API JSON (api.py).
+"""
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def crear_cursor(simulacion):
+    """
+    Cursor de paginación con el formato "<microsegundos>-<id>".
+    """
+    microsegundos = (simulacion.creado_en - _EPOCA) // timedelta(microseconds=1)
+    return f'{microsegundos}-{simulacion.id}'
+
+
+def leer_cursor(valor):
+    """
+    Interpreta un cursor de paginación. Retorna (creado_en, id), o None si
+    no es válido.
+    """
+    try:
+        microsegundos, pk = (int(parte) for parte in valor.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return _EPOCA + timedelta(microseconds=microsegundos), pk
+
+
+def despues_de(consulta, cursor):
+    """
+    Filtra una consulta ordenada por ('-creado_en', '-id') para que
+    comience después de la simulación del cursor (ya leído).
+    """
+    if cursor is None:
+        return consulta
+    creado_en, pk = cursor
+    return consulta.filter(creado_en__lte=creado_en).exclude(creado_en=creado_en, id__gte=pk)
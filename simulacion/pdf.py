@@ -0,0 +1,307 @@
+"""
+Dibujo de los reportes PDF con ReportLab.
+
+Los estilos se construyen una sola vez, al importar el módulo. ReportLab
+tarda en importarse (una décima de segundo, más que el resto de la
+aplicación), por eso este módulo no se importa al arrancar el servidor:
+reportes.py lo carga recién al generar el primer PDF.
+
+El reporte de cartera (muchas simulaciones en un solo PDF) se dibuja
+página por página directamente sobre el canvas, leyendo las filas por
+bloques.
+"""
+import math
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Sum
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import metricas
+
+# Estilos precompilados
+_estilos = getSampleStyleSheet()
+ESTILO_TITULO = ParagraphStyle(
+    'CustomTitle',
+    parent=_estilos['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#2c3e50'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+ESTILO_SUBTITULO = ParagraphStyle(
+    'CustomSubtitle',
+    parent=_estilos['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#34495e'),
+    spaceAfter=12,
+    spaceBefore=12
+)
+ESTILO_NORMAL = _estilos['Normal']
+
+
+def _estilo_tabla(color_fondo):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(color_fondo)),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ])
+
+
+ESTILO_TABLA_DATOS = _estilo_tabla('#ecf0f1')
+ESTILO_TABLA_RESULTADOS = _estilo_tabla('#e8f5e9')
+
+
+def _estilo_listado(color_encabezado):
+    """
+    Estilo de las tablas de la cartera: encabezado en la primera fila y
+    filas alternadas, con letra chica para que entren muchas por página.
+    """
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color_encabezado)),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7f9f9')]),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ])
+
+
+ESTILO_TABLA_RESUMEN = _estilo_listado('#e8f5e9')
+ESTILO_TABLA_DETALLE = _estilo_listado('#ecf0f1')
+ESTILO_TABLA_DETALLE.add('ALIGN', (2, 1), (2, -1), 'LEFT')
+ESTILO_TABLA_DETALLE.add('ALIGN', (1, 1), (1, -1), 'LEFT')
+ESTILO_TABLA_RESUMEN.add('ALIGN', (0, 1), (0, -1), 'LEFT')
+ESTILO_TABLA_RESUMEN.add('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')
+
+# Cartera: márgenes de página y filas de la tabla de detalle en cada página
+MARGEN_CARTERA = 0.6*inch
+FILAS_POR_PAGINA_CARTERA = 40
+
+# Columnas del detalle de la cartera: (encabezado, campo, ancho)
+COLUMNAS_CARTERA = [
+    ('ID', 'id', 0.55*inch),
+    ('Usuario', 'usuario__username', 1*inch),
+    ('Tipo de Alga', 'tipo_alga__nombre', 1.2*inch),
+    ('Deseadas (t)', 'toneladas_deseadas', 0.9*inch),
+    ('Fecha Objetivo', 'fecha_objetivo', 1*inch),
+    ('A Plantar (t)', 'toneladas_a_plantar', 0.9*inch),
+    ('Inicio Cultivo', 'fecha_inicio_cultivo', 0.95*inch),
+    ('Días', 'dias_cultivo', 0.5*inch),
+]
+
+
+def renderizar_pdf(datos):
+    """
+    Genera el PDF de una simulación a partir de sus datos y retorna los bytes.
+    """
+    from io import BytesIO
+
+    inicio = time.perf_counter()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elementos = []
+
+    # Título
+    elementos.append(Paragraph('Reporte de Simulación de Cultivo de Algas', ESTILO_TITULO))
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Información general
+    elementos.append(Paragraph('Información General', ESTILO_SUBTITULO))
+    datos_generales = [
+        ['ID de Simulación:', str(datos['id'])],
+        ['Usuario:', datos['usuario']],
+        ['Fecha de Creación:', datos['creado_en']],
+        ['Tipo de Alga:', datos['tipo_alga']],
+    ]
+    tabla_general = Table(datos_generales, colWidths=[3*inch, 3*inch])
+    tabla_general.setStyle(ESTILO_TABLA_DATOS)
+    elementos.append(tabla_general)
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Datos de entrada
+    elementos.append(Paragraph('Datos de Entrada', ESTILO_SUBTITULO))
+    datos_entrada = [
+        ['Toneladas Deseadas:', f"{datos['toneladas_deseadas']} t"],
+        ['Fecha Objetivo:', datos['fecha_objetivo']],
+    ]
+    tabla_entrada = Table(datos_entrada, colWidths=[3*inch, 3*inch])
+    tabla_entrada.setStyle(ESTILO_TABLA_DATOS)
+    elementos.append(tabla_entrada)
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Resultados calculados
+    elementos.append(Paragraph('Resultados de la Simulación', ESTILO_SUBTITULO))
+    datos_resultados = [
+        ['Toneladas a Plantar:', f"{datos['toneladas_a_plantar']} t"],
+        ['Fecha Inicio de Cultivo:', datos['fecha_inicio_cultivo']],
+        ['Días de Cultivo:', f"{datos['dias_cultivo']} días"],
+        ['Porcentaje de Pérdida:', f"{datos['porcentaje_perdida']}%"],
+        ['Factor Estacional:', f"× {datos['factor_estacional']}"],
+    ]
+    tabla_resultados = Table(datos_resultados, colWidths=[3*inch, 3*inch])
+    tabla_resultados.setStyle(ESTILO_TABLA_RESULTADOS)
+    elementos.append(tabla_resultados)
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Análisis de riesgo (Monte Carlo)
+    if datos['percentiles']:
+        elementos.append(Paragraph('Análisis de Riesgo (Monte Carlo)', ESTILO_SUBTITULO))
+        tabla_riesgo = Table(
+            [['Percentil', 'Toneladas a Plantar', 'Fecha Inicio'], *datos['percentiles']],
+            colWidths=[2*inch, 2*inch, 2*inch]
+        )
+        tabla_riesgo.setStyle(ESTILO_TABLA_RESULTADOS)
+        elementos.append(tabla_riesgo)
+        elementos.append(Spacer(1, 0.3*inch))
+
+    # Notas
+    if datos['notas']:
+        elementos.append(Paragraph('Notas Adicionales', ESTILO_SUBTITULO))
+        elementos.append(Paragraph(datos['notas'], ESTILO_NORMAL))
+        elementos.append(Spacer(1, 0.3*inch))
+
+    # Explicación de cálculos
+    elementos.append(Paragraph('Explicación de Cálculos', ESTILO_SUBTITULO))
+    explicacion = f"""
+    <b>Cálculo de Toneladas a Plantar:</b><br/>
+    Para compensar las pérdidas del {datos['porcentaje_perdida']}% durante el cultivo,
+    se debe plantar {datos['toneladas_a_plantar']} toneladas para obtener {datos['toneladas_deseadas']} toneladas finales.<br/><br/>
+    <b>Fórmula:</b> Toneladas a Plantar = Toneladas Deseadas × (1 + Porcentaje Pérdida / 100)<br/><br/>
+    <b>Cálculo de Fecha de Inicio:</b><br/>
+    Considerando que el cultivo de {datos['tipo_alga']} requiere {datos['dias_cultivo']} días,
+    se debe iniciar el cultivo el {datos['fecha_inicio_cultivo']} para cumplir con la fecha objetivo.
+    """
+    elementos.append(Paragraph(explicacion, ESTILO_NORMAL))
+
+    # Construir el PDF
+    doc.build(elementos)
+    pdf = buffer.getvalue()
+    buffer.close()
+    metricas.observar('simulador_pdf_render_segundos', (), time.perf_counter() - inicio)
+    return pdf
+
+
+def resumen_cartera(consulta):
+    """
+    Totales por tipo de alga de las simulaciones de 'consulta', agrupados
+    en la base de datos: (tipo, simulaciones, toneladas deseadas, toneladas
+    a plantar, primera siembra, última entrega).
+    """
+    filas = (
+        consulta.order_by().values_list('tipo_alga__nombre')
+        .annotate(
+            Count('id'), Sum('toneladas_deseadas'), Sum('toneladas_a_plantar'),
+            Min('fecha_inicio_cultivo'), Max('fecha_objetivo'),
+        )
+        .order_by('tipo_alga__nombre')
+    )
+    centesima = Decimal('0.01')
+    return [
+        (tipo, cantidad, Decimal(deseadas).quantize(centesima), Decimal(a_plantar).quantize(centesima), inicio, fin)
+        for tipo, cantidad, deseadas, a_plantar, inicio, fin in filas
+    ]
+
+
+def _formatear_celda(valor):
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%d/%m/%Y')
+    return str(valor)
+
+
+def _pie_cartera(lienzo, pagina, paginas, generado):
+    lienzo.setFont('Helvetica', 8)
+    lienzo.setFillColor(colors.grey)
+    lienzo.drawString(MARGEN_CARTERA, MARGEN_CARTERA / 2, f'Generado el {generado}')
+    lienzo.drawRightString(A4[0] - MARGEN_CARTERA, MARGEN_CARTERA / 2, f'Página {pagina} de {paginas}')
+
+
+def _dibujar(lienzo, flowable, y):
+    """
+    Dibuja un flowable con su borde superior en 'y' y retorna la altura
+    que queda libre debajo de él.
+    """
+    _, alto = flowable.wrapOn(lienzo, A4[0] - 2 * MARGEN_CARTERA, y)
+    flowable.drawOn(lienzo, MARGEN_CARTERA, y - alto)
+    return y - alto
+
+
+def renderizar_cartera(consulta, archivo, titulo):
+    """
+    Escribe en 'archivo' un PDF con la cartera de simulaciones de
+    'consulta': una página de resumen con los totales por tipo de alga y
+    una tabla de detalle de FILAS_POR_PAGINA_CARTERA filas por página.
+
+    No se arma la lista de elementos de platypus ni una tabla con todas
+    las filas: cada página se dibuja y se cierra antes de leer la
+    siguiente, con los estilos precompilados del módulo, y las filas se
+    leen como tuplas por bloques. ReportLab sí guarda el contenido de cada
+    página cerrada hasta save(), que recién ahí lo comprime y lo escribe en
+    'archivo': la memoria crece con la cantidad de páginas, unos 30 KB
+    por página de detalle.
+    """
+    inicio = time.perf_counter()
+    total = consulta.count()
+    paginas = 1 + math.ceil(total / FILAS_POR_PAGINA_CARTERA)
+    generado = datetime.now().strftime('%d/%m/%Y %H:%M')
+    lienzo = canvas.Canvas(archivo, pagesize=A4, pageCompression=1)
+    lienzo.setTitle(titulo)
+    alto_pagina = A4[1] - MARGEN_CARTERA
+
+    # Página de resumen
+    y = _dibujar(lienzo, Paragraph(titulo, ESTILO_TITULO), alto_pagina)
+    y = _dibujar(lienzo, Paragraph('Resumen por Tipo de Alga', ESTILO_SUBTITULO), y - 12)
+    resumen = resumen_cartera(consulta)
+    filas = [
+        [tipo, cantidad, f'{deseadas} t', f'{a_plantar} t', _formatear_celda(primera), _formatear_celda(ultima)]
+        for tipo, cantidad, deseadas, a_plantar, primera, ultima in resumen
+    ]
+    filas.append([
+        'Total', total,
+        f"{sum((fila[2] for fila in resumen), Decimal('0.00'))} t",
+        f"{sum((fila[3] for fila in resumen), Decimal('0.00'))} t",
+        _formatear_celda(min((fila[4] for fila in resumen), default='-')),
+        _formatear_celda(max((fila[5] for fila in resumen), default='-')),
+    ])
+    tabla = Table(
+        [['Tipo de Alga', 'Simulaciones', 'Toneladas Deseadas', 'A Plantar', 'Primera Siembra', 'Última Entrega'], *filas],
+        colWidths=[1.4*inch, 0.95*inch, 1.35*inch, 1.1*inch, 1.1*inch, 1.05*inch],
+        style=ESTILO_TABLA_RESUMEN,
+    )
+    _dibujar(lienzo, tabla, y)
+    _pie_cartera(lienzo, 1, paginas, generado)
+    lienzo.showPage()
+
+    # Detalle, una página por bloque de filas
+    encabezado = [columna[0] for columna in COLUMNAS_CARTERA]
+    anchos = [columna[2] for columna in COLUMNAS_CARTERA]
+    filas = consulta.values_list(*(columna[1] for columna in COLUMNAS_CARTERA)).iterator(
+        chunk_size=FILAS_POR_PAGINA_CARTERA * 20
+    )
+    pagina = 1
+    while True:
+        bloque = [[_formatear_celda(valor) for valor in fila] for _, fila in zip(range(FILAS_POR_PAGINA_CARTERA), filas)]
+        if not bloque:
+            break
+        pagina += 1
+        y = _dibujar(lienzo, Paragraph('Detalle de Simulaciones', ESTILO_SUBTITULO), alto_pagina)
+        _dibujar(lienzo, Table([encabezado, *bloque], colWidths=anchos, style=ESTILO_TABLA_DETALLE), y)
+        _pie_cartera(lienzo, pagina, paginas, generado)
+        lienzo.showPage()
+
+    lienzo.save()
+    metricas.observar('simulador_pdf_cartera_segundos', (), time.perf_counter() - inicio)
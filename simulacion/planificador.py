@@ -0,0 +1,192 @@
+"""
+Planificador de siembras con capacidad limitada.
+
+Cada simulación ocupa sus toneladas a plantar en el agua desde la fecha de
+inicio de cultivo hasta la fecha objetivo. El planificador suma todas las
+ocupaciones con un barrido (arreglo de diferencias), encuentra los días en
+que se supera la capacidad de las líneas de cultivo y adelanta o divide
+las siembras involucradas para eliminar la sobrecarga, informando lo que
+no se pudo acomodar.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+
+# Tolerancia para comparar toneladas en punto flotante
+_TOLERANCIA = 1e-9
+
+
+def carga_diaria(inicios, fines, toneladas, dias_totales):
+    """
+    Toneladas en el agua por día, sumando cada siembra en [inicio, fin)
+    con un arreglo de diferencias y una suma acumulada.
+    """
+    diferencias = np.zeros(dias_totales + 1, dtype=np.float64)
+    np.add.at(diferencias, inicios, toneladas)
+    np.add.at(diferencias, fines, -toneladas)
+    return np.cumsum(diferencias[:-1])
+
+
+def ventanas_sobrecarga(carga, capacidad):
+    """
+    Tramos consecutivos de días con carga sobre la capacidad.
+    Retorna una lista de (desde, hasta_exclusivo, exceso_maximo).
+    """
+    sobre = carga > capacidad + _TOLERANCIA
+    bordes = np.flatnonzero(np.diff(np.concatenate([[False], sobre, [False]]).astype(np.int8)))
+    return [
+        (int(desde), int(hasta), float(carga[desde:hasta].max() - capacidad))
+        for desde, hasta in zip(bordes[::2], bordes[1::2])
+    ]
+
+
+def _maximo_movil(valores, ventana):
+    """
+    Máximo de cada ventana de largo 'ventana' sobre 'valores', en tiempo
+    lineal (algoritmo de van Herk/Gil-Werman con máximos por bloques).
+    """
+    cantidad = len(valores) - ventana + 1
+    relleno = (-len(valores)) % ventana
+    bloques = np.concatenate([valores, np.full(relleno, -np.inf)]).reshape(-1, ventana)
+    prefijo = np.maximum.accumulate(bloques, axis=1).ravel()
+    sufijo = np.maximum.accumulate(bloques[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(sufijo[:cantidad], prefijo[ventana - 1:ventana - 1 + cantidad])
+
+
+def _acomodar(carga, inicio, duracion, toneladas, primer_dia, capacidad, lote_minimo):
+    """
+    Coloca una siembra en la posición más tardía posible que no supere la
+    capacidad, comenzando entre 'primer_dia' e 'inicio'. Si no cabe
+    completa se divide en lotes que se adelantan. Modifica 'carga' y
+    retorna (lotes, toneladas_pendientes) con lotes = [(inicio, toneladas)].
+    """
+    lotes = []
+    pendiente = toneladas
+    if duracion <= 0:
+        return [(inicio, toneladas)], 0.0
+
+    while pendiente > _TOLERANCIA:
+        tramo = carga[primer_dia:inicio + duracion]
+        libre = capacidad - _maximo_movil(tramo, duracion)
+        minimo = max(min(lote_minimo, pendiente), 1e-6)
+        posibles = np.flatnonzero(libre >= minimo - _TOLERANCIA)
+        if len(posibles) == 0:
+            break
+        posicion = int(posibles[-1])
+        cantidad = min(pendiente, float(libre[posicion]))
+        dia = primer_dia + posicion
+        carga[dia:dia + duracion] += cantidad
+        lotes.append((dia, cantidad))
+        pendiente -= cantidad
+    return lotes, max(pendiente, 0.0)
+
+
+def planificar(simulaciones, capacidad, hoy=None, adelanto_maximo=None, lote_minimo=None):
+    """
+    Planifica un conjunto de siembras con una capacidad total en toneladas.
+
+    'simulaciones' es un iterable de tuplas
+    (id, fecha_inicio_cultivo, fecha_objetivo, toneladas_a_plantar).
+    Las siembras ya iniciadas (inicio anterior a 'hoy') quedan fijas; las
+    demás se pueden adelantar hasta 'adelanto_maximo' días, sin comenzar
+    antes de 'hoy', y dividir en lotes de al menos 'lote_minimo' toneladas.
+
+    Retorna un diccionario con las ventanas de sobrecarga encontradas, los
+    ajustes propuestos, las toneladas que no se pudieron acomodar y las
+    ventanas de sobrecarga que persisten después de planificar.
+    """
+    hoy = hoy or date.today()
+    if adelanto_maximo is None:
+        adelanto_maximo = settings.ADELANTO_MAXIMO_DIAS
+    if lote_minimo is None:
+        lote_minimo = settings.LOTE_MINIMO_TONELADAS
+
+    filas = list(simulaciones)
+    resultado = {
+        'capacidad': float(capacidad),
+        'simulaciones': len(filas),
+        'ventanas_sobrecarga': [],
+        'ajustes': [],
+        'no_satisfechas': [],
+        'ventanas_restantes': [],
+    }
+    if not filas:
+        return resultado
+
+    ids = np.fromiter((fila[0] for fila in filas), dtype=np.int64, count=len(filas))
+    inicios = np.array([fila[1] for fila in filas], dtype='datetime64[D]')
+    fines = np.array([fila[2] for fila in filas], dtype='datetime64[D]')
+    toneladas = np.fromiter((float(fila[3]) for fila in filas), dtype=np.float64, count=len(filas))
+
+    # Índices de día relativos al día más temprano del horizonte
+    origen = min(inicios.min(), np.datetime64(hoy, 'D'))
+    inicios = (inicios - origen).astype(np.int64)
+    fines = (fines - origen).astype(np.int64)
+    duraciones = fines - inicios
+    dia_hoy = int((np.datetime64(hoy, 'D') - origen).astype(np.int64))
+    dias_totales = int(fines.max()) + 1
+
+    def a_fecha(dia):
+        return (origen + np.timedelta64(int(dia), 'D')).astype(object)
+
+    carga = carga_diaria(inicios, fines, toneladas, dias_totales)
+    ventanas = ventanas_sobrecarga(carga, capacidad)
+    resultado['ventanas_sobrecarga'] = [
+        (a_fecha(desde), a_fecha(hasta - 1), exceso) for desde, hasta, exceso in ventanas
+    ]
+    if not ventanas:
+        return resultado
+
+    # Siembras movibles que tocan algún día sobrecargado
+    sobre = np.concatenate([[0], np.cumsum(carga > capacidad + _TOLERANCIA)])
+    afectadas = np.flatnonzero((sobre[fines] - sobre[inicios] > 0) & (inicios >= dia_hoy))
+
+    # Se retiran de la carga y se vuelven a colocar, las de fecha objetivo
+    # más próxima primero porque son las que tienen menos margen
+    carga -= carga_diaria(inicios[afectadas], fines[afectadas], toneladas[afectadas], dias_totales)
+    afectadas = afectadas[np.argsort(fines[afectadas], kind='stable')]
+
+    for i in afectadas:
+        primer_dia = max(dia_hoy, int(inicios[i]) - adelanto_maximo)
+        lotes, pendiente = _acomodar(
+            carga, int(inicios[i]), int(duraciones[i]), float(toneladas[i]),
+            primer_dia, capacidad, lote_minimo
+        )
+        if lotes and lotes != [(int(inicios[i]), float(toneladas[i]))]:
+            resultado['ajustes'].append({
+                'simulacion_id': int(ids[i]),
+                'lotes': [
+                    (a_fecha(dia), a_fecha(dia) + timedelta(days=int(duraciones[i])), cantidad)
+                    for dia, cantidad in lotes
+                ],
+            })
+        if pendiente > _TOLERANCIA:
+            resultado['no_satisfechas'].append({
+                'simulacion_id': int(ids[i]),
+                'toneladas_pendientes': pendiente,
+            })
+
+    resultado['ventanas_restantes'] = [
+        (a_fecha(desde), a_fecha(hasta - 1), exceso)
+        for desde, hasta, exceso in ventanas_sobrecarga(carga, capacidad)
+    ]
+    return resultado
+
+
+def planificar_pendientes(capacidad=None, hoy=None, **opciones):
+    """
+    Planifica todas las simulaciones cuya fecha objetivo aún no pasa.
+    """
+    from .models import Simulacion
+
+    hoy = hoy or date.today()
+    if capacidad is None:
+        capacidad = settings.CAPACIDAD_CULTIVO_TONELADAS
+    filas = (
+        Simulacion.objects
+        .filter(fecha_objetivo__gte=hoy)
+        .values_list('id', 'fecha_inicio_cultivo', 'fecha_objetivo', 'toneladas_a_plantar')
+        .iterator(chunk_size=5000)
+    )
+    return planificar(filas, capacidad, hoy=hoy, **opciones)
@@ -0,0 +1,154 @@
+"""
+Recálculo de simulaciones cuando cambian los parámetros de un tipo de alga.
+
+Al guardar un TipoAlga con otro tiempo de cultivo o porcentaje de pérdida
+su version_parametros aumenta (ver signals.py) y se encarga un trabajo en
+segundo plano que recalcula las simulaciones de ese tipo que todavía no
+comienzan a cultivarse. Cada simulación guarda la versión con que se
+calculó, así el trabajo solo toma las que tienen una versión anterior y,
+si se interrumpe, al retomarlo continúa con las que faltan.
+
+Las simulaciones seleccionadas en el panel de administración se recalculan
+en el mismo hilo (ver programar_seleccion).
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.db import connection, transaction
+
+from .escritura import escritura
+from .motor import actualizar_simulaciones
+
+# Campos de TipoAlga que cambian los resultados de sus simulaciones
+CAMPOS_PARAMETROS = ('tiempo_cultivo_dias', 'porcentaje_perdida')
+
+# Simulaciones que se recalculan y guardan en cada transacción
+TAMANO_BLOQUE = 5000
+
+logger = logging.getLogger(__name__)
+
+# Un solo hilo: los recálculos se ejecutan de a uno y en orden
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recalculo')
+
+
+def pendientes(tipo):
+    """
+    Simulaciones del tipo de alga calculadas con parámetros anteriores y
+    cuyo cultivo aún no comienza. Las que ya comenzaron conservan los
+    resultados con que se plantaron.
+    """
+    from .models import Simulacion
+
+    return Simulacion.objects.filter(
+        tipo_alga=tipo,
+        fecha_inicio_cultivo__gte=date.today(),
+        version_parametros__lt=tipo.version_parametros,
+    )
+
+
+def clave_trabajo(tipo):
+    return f'recalculo:{tipo.pk}:{tipo.version_parametros}'
+
+
+def recalcular_tipo(tipo_alga_id, tamano_bloque=TAMANO_BLOQUE, informar=None):
+    """
+    Recalcula las simulaciones pendientes de un tipo de alga por bloques,
+    confirmando cada bloque junto con el avance en ProgresoTrabajo.
+    'informar(recalculadas, total)' se llama después de cada bloque.
+    Si mientras tanto el tipo de alga vuelve a cambiar, se detiene: el
+    trabajo de la versión nueva recalcula todo lo que falte.
+    Retorna el ProgresoTrabajo de la versión recalculada.
+    """
+    from .models import ProgresoTrabajo, Simulacion, TipoAlga
+
+    tipo = TipoAlga.objects.get(pk=tipo_alga_id)
+    progreso, _ = ProgresoTrabajo.objects.get_or_create(clave=clave_trabajo(tipo))
+    if progreso.completado:
+        return progreso
+
+    # Los ids se leen una sola vez por el índice (tipo_alga, fecha_inicio_cultivo)
+    ids = list(pendientes(tipo).order_by('pk').values_list('pk', flat=True))
+    total = progreso.posicion + len(ids)
+    for inicio in range(0, len(ids), tamano_bloque):
+        if not TipoAlga.objects.filter(pk=tipo.pk, version_parametros=tipo.version_parametros).exists():
+            return progreso
+        # actualizar_simulaciones compara con lo guardado y solo escribe lo que cambia
+        bloque = list(Simulacion.objects.filter(
+            pk__in=ids[inicio:inicio + tamano_bloque], version_parametros__lt=tipo.version_parametros
+        ).defer('curva_biomasa', 'resumen_montecarlo', 'notas'))
+        # El tipo leído al comenzar tiene los parámetros de esta versión
+        for simulacion in bloque:
+            simulacion.tipo_alga = tipo
+        with escritura():
+            # Un solo paso por la ocupación diaria para todo el bloque
+            actualizar_simulaciones(bloque, tamano_lote=tamano_bloque)
+            progreso.posicion += len(bloque)
+            progreso.save(update_fields=['posicion', 'actualizado_en'])
+        if informar is not None:
+            informar(progreso.posicion, total)
+
+    progreso.completado = True
+    progreso.save(update_fields=['completado', 'actualizado_en'])
+    return progreso
+
+
+def programar(tipo_alga_id):
+    """
+    Encarga el recálculo del tipo de alga al hilo de recálculos cuando se
+    confirme la transacción actual, sin retener la petición que lo cambió.
+    """
+    transaction.on_commit(lambda: _ejecutor.submit(_ejecutar, tipo_alga_id))
+
+
+def _ejecutar(tipo_alga_id):
+    try:
+        recalcular_tipo(tipo_alga_id)
+    except Exception:
+        # El trabajo queda incompleto y se retoma con recalcular_simulaciones
+        logger.exception('Falló el recálculo del tipo de alga %s', tipo_alga_id)
+    finally:
+        connection.close()
+
+
+def programar_seleccion(consulta):
+    """
+    Encarga al hilo de recálculos las simulaciones de 'consulta' cuando se
+    confirme la transacción actual. Retorna el ProgresoTrabajo donde se
+    registra el avance, para informarlo sin esperar el resultado.
+    """
+    from .models import ProgresoTrabajo
+
+    progreso = ProgresoTrabajo.objects.create(clave=f'recalculo-seleccion:{uuid.uuid4().hex}')
+    transaction.on_commit(lambda: _ejecutor.submit(_ejecutar_seleccion, consulta, progreso.pk))
+    return progreso
+
+
+def recalcular_seleccion(consulta, progreso, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recalcula las simulaciones de 'consulta' recorridas por id, en bloques
+    que se confirman junto con el último id recalculado (la posición del
+    progreso). Retoma desde esa posición si el trabajo se repite.
+    """
+    consulta = consulta.select_related(None).order_by('pk').defer('curva_biomasa', 'resumen_montecarlo', 'notas')
+    while bloque := list(consulta.filter(pk__gt=progreso.posicion)[:tamano_bloque]):
+        with escritura():
+            actualizar_simulaciones(bloque, tamano_lote=tamano_bloque)
+            progreso.posicion = bloque[-1].pk
+            progreso.save(update_fields=['posicion', 'actualizado_en'])
+
+    progreso.completado = True
+    progreso.save(update_fields=['completado', 'actualizado_en'])
+    return progreso
+
+
+def _ejecutar_seleccion(consulta, progreso_id):
+    from .models import ProgresoTrabajo
+
+    try:
+        recalcular_seleccion(consulta, ProgresoTrabajo.objects.get(pk=progreso_id))
+    except Exception:
+        logger.exception('Falló el recálculo de la selección %s', progreso_id)
+    finally:
+        connection.close()
@@ -0,0 +1,427 @@
+"""
+Generación y caché de reportes PDF de simulaciones.
+
+Cada PDF se guarda en disco con un nombre derivado del hash de los datos
+que contiene (entradas, resultados y versión del tipo de alga), así que un
+cambio en la simulación o en su tipo de alga produce un archivo distinto y
+nunca se sirve un reporte desactualizado. Los PDF que no están en caché se
+generan en un grupo de hilos para no bloquear a los workers web.
+
+El dibujo de los PDF está en pdf.py, que se importa recién al generar el
+primero para no cargar ReportLab al arrancar el servidor.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError, wait
+)
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from . import exportacion, metricas
+
+# Grupo de hilos para generar los PDF fuera del ciclo de la petición
+_ejecutor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PDF_WORKERS', 2),
+    thread_name_prefix='pdf'
+)
+_pendientes = {}
+_candado = threading.Lock()
+
+# Grupo de hilos de las carteras PDF, aparte del de los reportes
+# individuales: una cartera grande tarda segundos
+_carteras = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PDF_CARTERAS', 1),
+    thread_name_prefix='cartera'
+)
+
+# Bytes de cada parte al enviar un PDF
+BLOQUE_ENVIO = 64 * 1024
+
+# Grupo de procesos para las exportaciones masivas (se crea al primer uso)
+_procesos = None
+
+# Veces que se vuelve a encargar un PDF que una invalidación borró antes
+# de poder abrirlo
+INTENTOS_APERTURA = 3
+
+
+def datos_reporte(simulacion):
+    """
+    Extrae de la simulación todo lo que se imprime en el reporte, como
+    valores simples. Incluye la versión del tipo de alga para que forme
+    parte de la clave de caché.
+    """
+    tipo = simulacion.tipo_alga
+    return {
+        'id': simulacion.id,
+        'tipo_alga_id': tipo.id,
+        'tipo_alga_version': tipo.actualizado_en.isoformat(),
+        'usuario': simulacion.usuario.username,
+        'creado_en': simulacion.creado_en.strftime('%d/%m/%Y %H:%M'),
+        'tipo_alga': tipo.nombre,
+        'toneladas_deseadas': str(simulacion.toneladas_deseadas),
+        'fecha_objetivo': simulacion.fecha_objetivo.strftime('%d/%m/%Y'),
+        'toneladas_a_plantar': str(simulacion.toneladas_a_plantar),
+        'fecha_inicio_cultivo': simulacion.fecha_inicio_cultivo.strftime('%d/%m/%Y'),
+        'dias_cultivo': simulacion.dias_cultivo,
+        'porcentaje_perdida': str(simulacion.porcentaje_perdida_aplicado),
+        'factor_estacional': str(simulacion.factor_estacional),
+        'notas': simulacion.notas,
+        'percentiles': [
+            [f"P{fila['percentil']}", f"{fila['toneladas_a_plantar']} t", fila['fecha_inicio_cultivo'].strftime('%d/%m/%Y')]
+            for fila in simulacion.percentiles_montecarlo or []
+        ],
+    }
+
+
+def clave_reporte(datos):
+    """
+    Hash SHA-256 de los datos del reporte.
+    """
+    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def respuesta_pdf(request, archivo, nombre_archivo):
+    """
+    Respuesta que envía como adjunto un PDF ya abierto, por bloques, y lo
+    cierra al terminar. FileResponse entrega el archivo con un iterador
+    síncrono que bajo ASGI se lee completo antes de enviarse; aquí el
+    contenido pasa por exportacion.contenido_para.
+    """
+    archivo.seek(0)
+    respuesta = StreamingHttpResponse(
+        exportacion.contenido_para(request, _leer_archivo(archivo)), content_type='application/pdf'
+    )
+    respuesta['Content-Length'] = str(os.fstat(archivo.fileno()).st_size)
+    respuesta['Content-Disposition'] = content_disposition_header(True, f'{nombre_archivo}.pdf')
+    return respuesta
+
+
+def _leer_archivo(archivo):
+    with archivo:
+        while bloque := archivo.read(BLOQUE_ENVIO):
+            yield bloque
+
+
+def respuesta_cartera(request, consulta, titulo, nombre_archivo):
+    """
+    Respuesta con el PDF de la cartera, generado en un archivo temporal que
+    se elimina al terminar de enviarlo. Se dibuja en el grupo de hilos de
+    las carteras, no en el de los reportes individuales, para que unas
+    pocas carteras grandes no dejen esperando a los PDF de una simulación.
+    """
+    archivo = _carteras.submit(_renderizar_cartera, consulta, titulo).result()
+    return respuesta_pdf(request, archivo, nombre_archivo)
+
+
+async def arespuesta_cartera(request, consulta, titulo, nombre_archivo):
+    """
+    Versión de respuesta_cartera para las vistas asíncronas: mientras se
+    dibuja la cartera, la petición espera sin ocupar ningún hilo.
+    """
+    archivo = await asyncio.wrap_future(_carteras.submit(_renderizar_cartera, consulta, titulo))
+    return respuesta_pdf(request, archivo, nombre_archivo)
+
+
+def cartera_admitida(cantidad):
+    """
+    Indica si una cartera de 'cantidad' simulaciones se puede generar en
+    PDF. ReportLab guarda cada página hasta terminar el archivo, así que
+    la memoria de una cartera crece con su tamaño (ver
+    pdf.renderizar_cartera); con este máximo y PDF_CARTERAS hilos queda
+    acotada la de todas las que se generan a la vez.
+    """
+    return cantidad <= settings.PDF_CARTERA_MAXIMO
+
+
+def _renderizar_cartera(consulta, titulo):
+    """
+    Tarea del grupo de hilos de las carteras: dibuja la cartera en un
+    archivo temporal y lo retorna, y cierra la conexión a la base de datos
+    que abrió el hilo para leerla.
+    """
+    from .pdf import renderizar_cartera
+
+    archivo = tempfile.TemporaryFile()
+    try:
+        renderizar_cartera(consulta, archivo, titulo)
+    except BaseException:
+        archivo.close()
+        raise
+    finally:
+        connection.close()
+    return archivo
+
+
+def directorio_cache():
+    return Path(settings.PDF_CACHE_DIR)
+
+
+def ruta_cache(datos):
+    """
+    Ruta del archivo en caché: <tipo_alga_id>/<simulacion_id>-<hash>.pdf
+    """
+    return directorio_cache() / str(datos['tipo_alga_id']) / f"{datos['id']}-{clave_reporte(datos)}.pdf"
+
+
+def _escribir_cache(pdf, ruta):
+    """
+    Escribe un PDF en la caché de forma atómica.
+    """
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(pdf)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def _guardar_pdf(datos, ruta):
+    """
+    Genera el PDF y lo escribe en la caché.
+    """
+    from .pdf import renderizar_pdf
+
+    _escribir_cache(renderizar_pdf(datos), ruta)
+    return ruta
+
+
+def _generar_pdf(datos, ruta):
+    """
+    Tarea de los procesos de exportación: genera el PDF, lo deja en la
+    caché y retorna sus bytes y los segundos del render. Las métricas que
+    se registran dentro del proceso no llegan a /metrics, por eso el
+    tiempo se registra en el worker web (ver generar_zip).
+    """
+    from .pdf import renderizar_pdf
+
+    inicio = time.perf_counter()
+    pdf = renderizar_pdf(datos)
+    segundos = time.perf_counter() - inicio
+    _escribir_cache(pdf, ruta)
+    return pdf, segundos
+
+
+def abrir_pdf(datos, espera=0):
+    """
+    Retorna el PDF en caché abierto para lectura. Si no está, encarga su
+    generación al grupo de hilos y espera hasta 'espera' segundos; si no
+    termina a tiempo retorna None para que el cliente vuelva a consultar.
+
+    No se consulta exists() antes de abrir: una invalidación puede borrar
+    el archivo en cualquier momento, así que si falta al abrirlo se vuelve
+    a encargar. Ya abierto, se puede leer completo aunque se borre.
+    """
+    ruta = ruta_cache(datos)
+    for _ in range(INTENTOS_APERTURA):
+        try:
+            return open(ruta, 'rb')
+        except FileNotFoundError:
+            pass
+        try:
+            _encargar_pdf(datos, ruta).result(timeout=espera)
+        except TimeoutError:
+            return None
+    return None
+
+
+async def aabrir_pdf(datos, espera=0):
+    """
+    Versión de abrir_pdf para las vistas asíncronas: mientras el grupo de
+    hilos genera el PDF, la petición espera sin ocupar ningún hilo.
+    """
+    ruta = ruta_cache(datos)
+    for _ in range(INTENTOS_APERTURA):
+        try:
+            return open(ruta, 'rb')
+        except FileNotFoundError:
+            pass
+        # shield() evita que el tiempo de espera cancele la generación
+        futuro = asyncio.wrap_future(_encargar_pdf(datos, ruta))
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), espera)
+        except TimeoutError:
+            return None
+    return None
+
+
+def pdf_listo(datos):
+    """
+    Indica si el PDF está en caché, para la consulta de estado de la página
+    "generando PDF". Si no lo está, encarga su generación sin esperarla.
+    El archivo puede borrarse después de responder: para entregarlo se
+    usa aabrir_pdf.
+    """
+    ruta = ruta_cache(datos)
+    if ruta.exists():
+        return True
+    _encargar_pdf(datos, ruta)
+    return False
+
+
+def _encargar_pdf(datos, ruta):
+    """
+    Futuro de la generación del PDF. Si ya se está generando, se reutiliza
+    el mismo futuro en lugar de generarlo dos veces.
+    """
+    with _candado:
+        futuro = _pendientes.get(ruta)
+        if futuro is None:
+            futuro = _ejecutor.submit(_guardar_pdf, datos, ruta)
+            _pendientes[ruta] = futuro
+            futuro.add_done_callback(lambda _f: _pendientes.pop(ruta, None))
+    return futuro
+
+
+def invalidar_simulacion(simulacion_id, tipo_alga_id):
+    """
+    Elimina los PDF en caché de una simulación, que están en la carpeta de
+    su tipo de alga.
+    """
+    for ruta in (directorio_cache() / str(tipo_alga_id)).glob(f'{simulacion_id}-*.pdf'):
+        ruta.unlink(missing_ok=True)
+
+
+def invalidar_simulaciones(simulaciones):
+    """
+    Elimina los PDF en caché de un lote de simulaciones, recorriendo una
+    sola vez la carpeta de cada tipo de alga.
+    """
+    por_tipo = {}
+    for simulacion in simulaciones:
+        por_tipo.setdefault(simulacion.tipo_alga_id, set()).add(str(simulacion.pk))
+    for tipo_alga_id, ids in por_tipo.items():
+        for ruta in (directorio_cache() / str(tipo_alga_id)).glob('*.pdf'):
+            if ruta.name.split('-', 1)[0] in ids:
+                ruta.unlink(missing_ok=True)
+
+
+def invalidar_tipo_alga(tipo_alga_id):
+    """
+    Elimina los PDF en caché de todas las simulaciones de un tipo de alga.
+    """
+    for ruta in (directorio_cache() / str(tipo_alga_id)).glob('*.pdf'):
+        ruta.unlink(missing_ok=True)
+
+
+def _cantidad_procesos():
+    return getattr(settings, 'PDF_PROCESOS', None) or os.cpu_count()
+
+
+def _iniciar_proceso():
+    django.setup()
+
+
+def _grupo_procesos():
+    """
+    Grupo de procesos de las exportaciones. El worker web ya tiene hilos
+    (los del grupo de PDF, el recálculo en segundo plano), y bifurcarlo
+    con 'fork' copiaría candados tomados por esos hilos; los procesos se
+    inician con PDF_PROCESOS_INICIO ('forkserver' o 'spawn').
+    """
+    global _procesos
+    if _procesos is None:
+        _procesos = ProcessPoolExecutor(
+            max_workers=_cantidad_procesos(),
+            mp_context=multiprocessing.get_context(getattr(settings, 'PDF_PROCESOS_INICIO', 'forkserver')),
+            initializer=_iniciar_proceso,
+        )
+    return _procesos
+
+
+class _SalidaZip:
+    """
+    Destino de escritura del ZIP que solo acumula lo escrito desde la última
+    vez que se vació. No permite seek, por lo que zipfile escribe cada
+    entrada en un solo paso (con descriptor de datos) y el archivo completo
+    nunca queda en memoria.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def generar_zip(datos_reportes):
+    """
+    Generador que produce, por partes, un ZIP con los PDF de las
+    simulaciones (bajo ASGI se envuelve con exportacion.contenido_para). Los PDF que no están en caché se generan en paralelo en
+    un grupo de procesos y se agregan al ZIP a medida que terminan. Solo
+    se mantienen en vuelo unos pocos PDF por proceso, así que la memoria
+    usada no depende de la cantidad de simulaciones.
+    """
+    grupo = _grupo_procesos()
+    maximo_en_vuelo = 2 * _cantidad_procesos()
+    datos_reportes = iter(datos_reportes)
+    salida = _SalidaZip()
+    en_vuelo = {}
+
+    def encolar():
+        for datos in datos_reportes:
+            nombre = f"simulacion_{datos['id']}.pdf"
+            ruta = ruta_cache(datos)
+            try:
+                return nombre, ruta.read_bytes()
+            except FileNotFoundError:
+                # No está en caché, o se invalidó recién: se genera
+                pass
+            en_vuelo[grupo.submit(_generar_pdf, datos, ruta)] = nombre
+            if len(en_vuelo) >= maximo_en_vuelo:
+                break
+        return None
+
+    try:
+        # Los PDF se guardan sin comprimir: ReportLab ya comprime su contenido
+        with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+            while True:
+                listo = encolar()
+                if listo is not None:
+                    archivo_zip.writestr(*listo)
+                elif en_vuelo:
+                    terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        pdf, segundos = futuro.result()
+                        metricas.observar('simulador_pdf_render_segundos', (), segundos)
+                        archivo_zip.writestr(en_vuelo.pop(futuro), pdf)
+                else:
+                    break
+                parte = salida.vaciar()
+                if parte:
+                    yield parte
+        yield salida.vaciar()
+    finally:
+        for futuro in en_vuelo:
+            futuro.cancel()
@@ -0,0 +1,151 @@
+"""
+Señales de la aplicación de simulación.
+Mantienen sincronizadas las estructuras en memoria cuando cambian los datos.
+"""
+import threading
+
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalogo, recalculo, reportes
+from .agregados import aumentar_versiones, ocupacion_de, registrar_cambios
+from .models import ParametroSimulacion, Simulacion, TipoAlga, VersionSimulaciones
+
+
+@receiver([post_save, post_delete], sender=ParametroSimulacion)
+def parametro_modificado(sender, **kwargs):
+    """
+    Publica una versión nueva del catálogo (y de la tabla de ajuste
+    estacional) cuando cambia un parámetro.
+    """
+    catalogo.invalidar()
+
+
+@receiver(post_save, sender=Simulacion)
+def simulacion_modificada(sender, instance, **kwargs):
+    """
+    Elimina los PDF en caché de la simulación modificada.
+    """
+    reportes.invalidar_simulacion(instance.pk, instance.tipo_alga_id)
+
+
+class _Eliminaciones(threading.local):
+    """
+    Simulaciones que borra una misma llamada a delete(), incluidas las que
+    se borran en cascada con su usuario o tipo de alga, y los tipos de alga
+    que borra esa llamada. Django envía pre_delete de todos los objetos
+    antes de borrar el primero y post_delete a medida que los borra;
+    'origin' identifica la llamada.
+    """
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self, origen=None):
+        self.origen = origen
+        self.esperadas = 0
+        self.eliminadas = []
+        self.tipos = set()
+
+    def comenzar(self, origen):
+        if self.origen is not origen or self.eliminadas:
+            # Otra llamada a delete(), o una anterior que terminó con un error
+            self.reiniciar(origen)
+
+
+_eliminaciones = _Eliminaciones()
+
+
+@receiver(pre_delete, sender=Simulacion)
+def simulacion_por_eliminar(sender, instance, origin=None, **kwargs):
+    """
+    Cuenta las simulaciones que borrará la llamada a delete() en curso.
+    """
+    _eliminaciones.comenzar(origin)
+    _eliminaciones.esperadas += 1
+
+
+@receiver(pre_delete, sender=TipoAlga)
+def tipo_alga_por_eliminar(sender, instance, origin=None, **kwargs):
+    """
+    Anota los tipos de alga que borrará la llamada a delete() en curso: su
+    ocupación diaria se borra en cascada con ellos.
+    """
+    _eliminaciones.comenzar(origin)
+    _eliminaciones.tipos.add(instance.pk)
+
+
+@receiver(post_delete, sender=Simulacion)
+def simulacion_borrada(sender, instance, origin=None, **kwargs):
+    """
+    Reúne las simulaciones borradas y, con la última de la llamada a
+    delete(), quita sus ocupaciones de las tablas agregadas en una sola
+    pasada y elimina sus PDF en caché una sola vez por tipo de alga.
+    """
+    if _eliminaciones.origen is not origin:
+        eliminadas, tipos = [instance], set()
+    else:
+        _eliminaciones.eliminadas.append(instance)
+        if len(_eliminaciones.eliminadas) < _eliminaciones.esperadas:
+            return
+        eliminadas, tipos = _eliminaciones.eliminadas, _eliminaciones.tipos
+        _eliminaciones.reiniciar()
+    # Dentro de la misma transacción que el borrado
+    registrar_cambios(quitar=[
+        ocupacion_de(simulacion) for simulacion in eliminadas if simulacion.tipo_alga_id not in tipos
+    ])
+    if tipos:
+        aumentar_versiones(simulacion.usuario_id for simulacion in eliminadas if simulacion.tipo_alga_id in tipos)
+    # Si la transacción se revierte las simulaciones y sus PDF siguen vigentes
+    transaction.on_commit(lambda: reportes.invalidar_simulaciones(eliminadas))
+
+
+@receiver(post_delete, sender=User)
+def usuario_borrado(sender, instance, **kwargs):
+    """
+    Elimina la versión de las simulaciones del usuario. Django borra al
+    usuario después de sus simulaciones, así la fila ya no vuelve a
+    crearse al quitarlas de las tablas agregadas.
+    """
+    VersionSimulaciones.objects.filter(usuario_id=instance.pk).delete()
+
+
+@receiver(pre_save, sender=TipoAlga)
+def tipo_alga_por_guardar(sender, instance, **kwargs):
+    """
+    Aumenta la versión de parámetros del tipo de alga si cambió alguno de
+    los parámetros que usan sus simulaciones.
+    """
+    instance._parametros_cambiados = False
+    if instance.pk is None:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).values(*recalculo.CAMPOS_PARAMETROS, 'version_parametros').first()
+    if anterior is not None and any(
+        anterior[campo] != getattr(instance, campo) for campo in recalculo.CAMPOS_PARAMETROS
+    ):
+        instance.version_parametros = anterior['version_parametros'] + 1
+        instance._parametros_cambiados = True
+
+
+@receiver([post_save, post_delete], sender=TipoAlga)
+def tipo_alga_modificado(sender, instance, **kwargs):
+    """
+    Elimina los PDF en caché de las simulaciones del tipo de alga, publica
+    una versión nueva del catálogo y, si cambiaron sus parámetros, encarga
+    el recálculo de sus simulaciones.
+    """
+    reportes.invalidar_tipo_alga(instance.pk)
+    catalogo.invalidar()
+    if instance.__dict__.pop('_parametros_cambiados', False):
+        recalculo.programar(instance.pk)
+
+
+@receiver(request_started)
+def peticion_iniciada(sender, **kwargs):
+    """
+    Descarta el catálogo en memoria si otro proceso lo modificó.
+    """
+    catalogo.verificar_version()
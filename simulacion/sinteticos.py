@@ -0,0 +1,89 @@
+"""
+Generador de datos sintéticos para pruebas de rendimiento.
+
+Crea usuarios, tipos de alga y simulaciones con valores aleatorios pero
+reproducibles (misma semilla, mismos datos). Las simulaciones se generan y
+guardan por bloques con el motor de cálculo, por lo que se pueden crear
+cientos de miles sin cargar todas en memoria.
+"""
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+
+from . import catalogo
+from .motor import crear_simulaciones
+
+PREFIJO_USUARIO = 'sintetico_'
+PREFIJO_TIPO = 'Sintética '
+
+
+def generar_usuarios(cantidad):
+    """
+    Crea (o reutiliza) 'cantidad' usuarios sintéticos sin contraseña
+    utilizable. Retorna la lista de ids.
+    """
+    nombres = [f'{PREFIJO_USUARIO}{numero}' for numero in range(cantidad)]
+    existentes = set(User.objects.filter(username__in=nombres).values_list('username', flat=True))
+    User.objects.bulk_create([
+        User(username=nombre, password='!') for nombre in nombres if nombre not in existentes
+    ])
+    return list(User.objects.filter(username__in=nombres).order_by('id').values_list('id', flat=True))
+
+
+def generar_tipos(cantidad, semilla=0):
+    """
+    Crea (o reutiliza) 'cantidad' tipos de alga sintéticos con tiempos de
+    cultivo entre 20 y 120 días y pérdidas entre 0% y 40%.
+    Retorna la lista de TipoAlga.
+    """
+    from .models import TipoAlga
+
+    rng = np.random.default_rng(semilla)
+    nombres = [f'{PREFIJO_TIPO}{numero}' for numero in range(cantidad)]
+    existentes = set(TipoAlga.objects.filter(nombre__in=nombres).values_list('nombre', flat=True))
+    TipoAlga.objects.bulk_create([
+        TipoAlga(
+            nombre=nombre,
+            tiempo_cultivo_dias=int(rng.integers(20, 121)),
+            porcentaje_perdida=Decimal(int(rng.integers(0, 4001))).scaleb(-2),
+        )
+        for nombre in nombres if nombre not in existentes
+    ])
+    # bulk_create no envía señales: el catálogo se publica aquí
+    catalogo.invalidar()
+    return list(TipoAlga.objects.filter(nombre__in=nombres).order_by('id'))
+
+
+def generar_simulaciones(cantidad, usuarios, tipos, semilla=0, desde=None, dias=730,
+                         tamano_bloque=20000):
+    """
+    Crea 'cantidad' simulaciones repartidas entre los usuarios (ids) y los
+    tipos de alga indicados, con fechas objetivo en los 'dias' siguientes a
+    'desde'. Se guardan por bloques de 'tamano_bloque'.
+    Retorna la cantidad creada.
+    """
+    from .models import Simulacion
+
+    rng = np.random.default_rng(semilla)
+    desde = np.datetime64(desde or date.today(), 'D')
+    usuarios = np.asarray(usuarios)
+    creadas = 0
+    while creadas < cantidad:
+        largo = min(tamano_bloque, cantidad - creadas)
+        indices_usuario = rng.integers(0, len(usuarios), largo)
+        indices_tipo = rng.integers(0, len(tipos), largo)
+        toneladas = rng.integers(100, 100001, largo)
+        fechas = (desde + rng.integers(1, dias + 1, largo).astype('timedelta64[D]')).astype(object)
+        crear_simulaciones([
+            Simulacion(
+                usuario_id=int(usuarios[indices_usuario[i]]),
+                tipo_alga=tipos[indices_tipo[i]],
+                toneladas_deseadas=Decimal(int(toneladas[i])).scaleb(-2),
+                fecha_objetivo=fechas[i],
+            )
+            for i in range(largo)
+        ])
+        creadas += largo
+    return creadas
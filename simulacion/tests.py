@@ -1,3 +1,1420 @@
-from django.test import TestCase
+import base64
+import csv
+import gc
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import weakref
+import zipfile
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import ROUND_CEILING, Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import analisis, catalogo, exportacion, metricas, montecarlo, planificador, recalculo, reportes
+from .admin import PaginadorEstimado
+from .agregados import CAMPOS_PRODUCCION
+from .analisis import resolver_entregas
+from .management.commands import importar_simulaciones
+from .forms import validar_presupuesto_ensayos
+from .estaciones import FACTOR_NEUTRO, construir_tabla, indice_dia
+from .models import (
+    OcupacionDiaria, ParametroSimulacion, ProduccionDiaria, ProduccionMensual, ProgresoTrabajo, Simulacion, TipoAlga,
+    VersionSimulaciones,
+)
+from .motor import (
+    a_centesimas, actualizar_simulaciones, calcular_lote, calcular_simulaciones, crear_simulaciones, curvas_biomasa,
+    desde_centesimas, guardar_simulacion,
+)
+from .paginacion import crear_cursor, despues_de, leer_cursor
+
+# Grilla de entradas de las pruebas de paridad
+TONELADAS = [Decimal(valor) for valor in (
+    '0.01', '0.10', '0.50', '0.99', '1.00', '1.25', '2.50', '3.33', '10.10', '12.34', '99.99', '1000.00',
+)]
+PERDIDAS = [Decimal(valor) for valor in ('0', '0.01', '1.50', '5', '12.50', '20', '25', '33.33', '40', '99.99')]
+
+
+class ParidadMotorTest(TestCase):
+    """
+    El motor por lotes entrega lo mismo que el cálculo original por objeto
+    (Decimal, guardado en el DecimalField de Simulacion).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='paridad')
+        cls.tipo = TipoAlga.objects.create(nombre='Paridad', tiempo_cultivo_dias=30, porcentaje_perdida=0)
+        cls.simulacion = Simulacion.objects.create(
+            usuario=cls.usuario, tipo_alga=cls.tipo, toneladas_deseadas=1, fecha_objetivo=date(2025, 1, 1),
+            toneladas_a_plantar=1, fecha_inicio_cultivo=date(2024, 12, 2), dias_cultivo=30,
+        )
+
+    def calculo_original(self, toneladas, perdida):
+        """
+        Toneladas a plantar como las calculaba Simulacion.calcular_simulacion
+        antes del motor por lotes, leídas desde la base de datos.
+        """
+        Simulacion.objects.filter(pk=self.simulacion.pk).update(
+            toneladas_a_plantar=toneladas * (1 + perdida / 100)
+        )
+        return Simulacion.objects.values_list('toneladas_a_plantar', flat=True).get(pk=self.simulacion.pk)
+
+    def test_toneladas_a_plantar(self):
+        grilla = [(toneladas, perdida) for toneladas in TONELADAS for perdida in PERDIDAS]
+        resultado = calcular_lote(
+            a_centesimas(toneladas for toneladas, _ in grilla),
+            np.full(len(grilla), np.datetime64('2025-01-01')),
+            a_centesimas(perdida for _, perdida in grilla),
+            np.full(len(grilla), 30),
+        )
+        for (toneladas, perdida), calculado in zip(grilla, resultado['toneladas_a_plantar'].tolist()):
+            with self.subTest(toneladas=toneladas, perdida=perdida):
+                self.assertEqual(desde_centesimas(calculado), self.calculo_original(toneladas, perdida))
+
+    def test_mitad_al_par(self):
+        casos = [('0.50', '5', '0.52'), ('0.10', '25', '0.12'), ('0.30', '5', '0.32'), ('0.70', '5', '0.74')]
+        for toneladas, perdida, esperado in casos:
+            with self.subTest(toneladas=toneladas, perdida=perdida):
+                resultado = calcular_lote(
+                    a_centesimas([Decimal(toneladas)]), np.array(['2025-01-01'], dtype='datetime64[D]'),
+                    a_centesimas([Decimal(perdida)]), np.array([30]),
+                )
+                self.assertEqual(desde_centesimas(resultado['toneladas_a_plantar'][0]), Decimal(esperado))
+
+    def test_simulacion_individual(self):
+        for perdida in PERDIDAS:
+            self.tipo.porcentaje_perdida = perdida
+            for toneladas in TONELADAS:
+                simulacion = Simulacion(
+                    usuario=self.usuario, tipo_alga=self.tipo, toneladas_deseadas=toneladas,
+                    fecha_objetivo=date(2025, 1, 1),
+                )
+                simulacion.calcular_simulacion()
+                with self.subTest(toneladas=toneladas, perdida=perdida):
+                    self.assertEqual(simulacion.toneladas_a_plantar, self.calculo_original(toneladas, perdida))
+                    self.assertEqual(simulacion.dias_cultivo, 30)
+                    self.assertEqual(simulacion.fecha_inicio_cultivo, date(2025, 1, 1) - timedelta(days=30))
+
+
+class TablaEstacionalTest(SimpleTestCase):
+    """
+    Factores por día del año según el calendario de estaciones.
+    """
+
+    def test_indice_dia(self):
+        casos = [
+            ('2024-01-01', 0), ('2024-02-29', 59), ('2024-03-01', 60),
+            # Un año no bisiesto salta la entrada del 29 de febrero
+            ('2023-02-28', 58), ('2023-03-01', 60), ('2023-12-31', 365),
+        ]
+        for fecha, indice in casos:
+            with self.subTest(fecha=fecha):
+                self.assertEqual(indice_dia(np.datetime64(fecha)), indice)
+
+    def test_factores_por_estacion(self):
+        tabla = construir_tabla([('invierno', Decimal('1.50')), (None, Decimal('1.10'))])
+        casos = [
+            # El invierno comienza el 21 de junio; el verano cruza el fin de año
+            ('2025-06-20', 11000), ('2025-06-21', 16500), ('2025-09-22', 16500), ('2025-09-23', 11000),
+            ('2025-12-31', 11000), ('2026-01-01', 11000),
+        ]
+        for fecha, factor in casos:
+            with self.subTest(fecha=fecha):
+                self.assertEqual(tabla[indice_dia(np.datetime64(fecha))], factor)
+
+    def test_factor_segun_inicio_sin_ajustar(self):
+        """
+        El factor se busca con la fecha de inicio calculada con los días
+        base del tipo de alga.
+        """
+        tabla = construir_tabla([('invierno', Decimal('1.50'))])
+        resultado = calcular_lote(
+            a_centesimas([Decimal('10')] * 2),
+            np.array(['2025-07-21', '2025-07-20'], dtype='datetime64[D]'),
+            a_centesimas([Decimal('10')] * 2),
+            np.array([30, 30]),
+            tabla_estacional=tabla,
+        )
+        self.assertEqual(resultado['factor_estacional'].tolist(), [15000, FACTOR_NEUTRO])
+        self.assertEqual(resultado['dias_cultivo'].tolist(), [45, 30])
+        self.assertEqual(resultado['porcentaje_perdida'].tolist(), [1500, 1000])
+        self.assertEqual(resultado['toneladas_a_plantar'].tolist(), [1150, 1100])
+
+
+class CatalogoTest(TestCase):
+    """
+    Base para las pruebas que leen tipos y parámetros desde el catálogo en
+    memoria: se publica al crear los datos y al terminar.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(catalogo.invalidar)
+
+    @classmethod
+    def publicar_catalogo(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            catalogo.invalidar()
+
+
+class FactorEstacionalSimulacionTest(CatalogoTest):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='estaciones')
+        cls.tipo = TipoAlga.objects.create(nombre='Estacional', tiempo_cultivo_dias=30, porcentaje_perdida=10)
+        ParametroSimulacion.objects.create(nombre='Invierno', estacion='invierno', factor_ajuste=Decimal('1.50'))
+        ParametroSimulacion.objects.create(nombre='Inactivo', factor_ajuste=Decimal('2.00'), activo=False)
+        cls.publicar_catalogo()
+
+    def test_simulacion_en_invierno(self):
+        simulacion = Simulacion(
+            usuario=self.usuario, tipo_alga=self.tipo, toneladas_deseadas=Decimal('10'),
+            fecha_objetivo=date(2025, 7, 21),
+        )
+        resultado = simulacion.calcular_simulacion()
+        self.assertEqual(resultado['factor_estacional'], Decimal('1.5000'))
+        self.assertEqual(resultado['dias_cultivo'], 45)
+        self.assertEqual(resultado['porcentaje_perdida'], Decimal('15.00'))
+        self.assertEqual(resultado['toneladas_a_plantar'], Decimal('11.50'))
+        self.assertEqual(resultado['fecha_inicio_cultivo'], date(2025, 6, 6))
+
+    def test_simulacion_fuera_de_estacion(self):
+        simulacion = Simulacion(
+            usuario=self.usuario, tipo_alga=self.tipo, toneladas_deseadas=Decimal('10'),
+            fecha_objetivo=date(2025, 1, 31),
+        )
+        resultado = simulacion.calcular_simulacion()
+        self.assertEqual(resultado['factor_estacional'], Decimal('1.0000'))
+        self.assertEqual(resultado['dias_cultivo'], 30)
+
+
+class ResolverEntregasTest(CatalogoTest):
+    """
+    Las toneladas entregables son exactamente el mayor valor cuyo cálculo
+    directo no supera lo disponible para plantar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, dias, perdida in (('Corta', 20, '0'), ('Media', 45, '12.50'), ('Larga', 90, '33.33')):
+            TipoAlga.objects.create(nombre=nombre, tiempo_cultivo_dias=dias, porcentaje_perdida=Decimal(perdida))
+        ParametroSimulacion.objects.create(nombre='Verano', estacion='verano', factor_ajuste=Decimal('0.80'))
+        cls.publicar_catalogo()
+
+    def test_inverso_exacto(self):
+        for disponible in (1, 2, 99, 100, 105, 1234, 1235, 100000):
+            resultado = resolver_entregas(disponible, date(2025, 1, 1), 12, paso=7)
+            siembras = np.array(resultado['fechas_siembra'], dtype='datetime64[D]')
+            self.assertEqual(len(resultado['tipos']), 3)
+            for tipo in resultado['tipos']:
+                tipo_alga = TipoAlga.objects.get(pk=tipo['id'])
+                entregas = np.array(tipo['fechas_entrega'], dtype='datetime64[D]')
+                entregables = a_centesimas(Decimal(valor) for valor in tipo['toneladas_entregables'])
+                calculo = [
+                    calcular_lote(
+                        entregables + extra, entregas, a_centesimas([tipo_alga.porcentaje_perdida]),
+                        np.array([tipo_alga.tiempo_cultivo_dias]), tabla_estacional=catalogo.obtener().tabla_factores,
+                    )
+                    for extra in (0, 1)
+                ]
+                with self.subTest(disponible=disponible, tipo=tipo['nombre']):
+                    self.assertTrue((calculo[0]['toneladas_a_plantar'] <= disponible).all())
+                    self.assertTrue((calculo[1]['toneladas_a_plantar'] > disponible).all())
+                    self.assertTrue((calculo[0]['fecha_inicio_cultivo'] >= siembras).all())
+                    self.assertEqual(calculo[0]['dias_cultivo'].tolist(), tipo['dias_cultivo'])
+
+    def test_cache_por_version(self):
+        # Al publicar otra versión del catálogo la caché no retiene la anterior
+        self.publicar_catalogo()
+        anterior = weakref.ref(catalogo.obtener())
+        primero = resolver_entregas(100, date(2025, 1, 1), 1)
+        self.assertIs(resolver_entregas(100, date(2025, 1, 1), 1), primero)
+        resolver_entregas(200, date(2025, 1, 1), 1)
+
+        # Las limpiezas corren antes de deshacer la transacción de la prueba
+        self.addCleanup(self.publicar_catalogo)
+        self.addCleanup(TipoAlga.objects.filter(nombre='Corta').update, tiempo_cultivo_dias=20)
+        TipoAlga.objects.filter(nombre='Corta').update(tiempo_cultivo_dias=30)
+        self.publicar_catalogo()
+        segundo = resolver_entregas(100, date(2025, 1, 1), 1)
+        self.assertNotEqual(segundo['tipos'][0]['dias_cultivo'], primero['tipos'][0]['dias_cultivo'])
+        self.assertEqual(list(analisis._resolver_entregas.resultados.values()), [segundo])
+        gc.collect()
+        self.assertIsNone(anterior())
+
+
+class BarridoTest(CatalogoTest):
+    """
+    La grilla del barrido tiene la forma [tipo, variación, fecha, toneladas]
+    y cada celda es el resultado de calcular_lote para esa combinación.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='barrido')
+        for nombre, dias, perdida in (('Corta', 20, '0'), ('Larga', 90, '33.33')):
+            TipoAlga.objects.create(nombre=nombre, tiempo_cultivo_dias=dias, porcentaje_perdida=Decimal(perdida))
+        ParametroSimulacion.objects.create(nombre='Invierno', estacion='invierno', factor_ajuste=Decimal('1.35'))
+        cls.publicar_catalogo()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('barrido_simulaciones')
+
+    def test_forma_y_valores(self):
+        respuesta = self.client.get(self.url, {
+            'toneladas_desde': '0.5', 'toneladas_hasta': '3.75', 'toneladas_paso': '1.25',
+            'fecha_desde': '2031-01-10', 'fecha_hasta': '2031-12-31', 'paso_dias': '30',
+            # -50 deja la pérdida en cero, sin valores negativos
+            'variaciones': '5,-2.5,0,-50',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        resultado = respuesta.json()
+        self.assertEqual([tipo['nombre'] for tipo in resultado['tipos']], ['Corta', 'Larga'])
+        self.assertEqual(resultado['variaciones_perdida'], ['-50.00', '-2.50', '0.00', '5.00'])
+        fechas = np.array(resultado['fechas_objetivo'], dtype='datetime64[D]')
+        self.assertEqual(len(fechas), 12)
+        self.assertEqual(resultado['toneladas_deseadas'], {'desde': '0.50', 'paso': '1.25', 'cantidad': 3})
+        toneladas = np.array([50, 175, 300])
+
+        grilla = resultado['toneladas_a_plantar']
+        self.assertEqual(grilla['forma'], [2, 4, 12, 3])
+        matriz = np.frombuffer(base64.b64decode(grilla['datos']), dtype=grilla['tipo']).reshape(grilla['forma'])
+
+        tabla = catalogo.obtener().tabla_factores
+        tipos = TipoAlga.objects.in_bulk([tipo['id'] for tipo in resultado['tipos']])
+        for i, tipo in enumerate(tipos[tipo['id']] for tipo in resultado['tipos']):
+            for j, variacion in enumerate((-5000, -250, 0, 500)):
+                perdida = max(int(tipo.porcentaje_perdida * 100) + variacion, 0)
+                for k, fecha in enumerate(fechas):
+                    esperado = calcular_lote(
+                        toneladas, np.full(3, fecha), np.full(3, perdida), np.full(3, tipo.tiempo_cultivo_dias),
+                        tabla_estacional=tabla,
+                    )
+                    with self.subTest(tipo=tipo.nombre, variacion=variacion, fecha=str(fecha)):
+                        self.assertEqual(matriz[i, j, k].tolist(), esperado['toneladas_a_plantar'].tolist())
+                        self.assertEqual(resultado['dias_cultivo'][i][k], int(esperado['dias_cultivo'][0]))
+        # El invierno alarga el cultivo y aumenta la pérdida
+        self.assertGreater(max(resultado['dias_cultivo'][1]), min(resultado['dias_cultivo'][1]))
+
+    @override_settings(BARRIDO_MAXIMO_CELDAS=100)
+    def test_maximo_de_celdas(self):
+        def pedir(hasta):
+            return self.client.get(self.url, {
+                'toneladas_desde': '1', 'toneladas_hasta': hasta, 'fecha_desde': '2031-01-01', 'fecha_hasta': '2031-01-05',
+            })
+
+        # 2 tipos × 1 variación × 5 fechas × 10 toneladas
+        self.assertEqual(pedir('10').json()['toneladas_a_plantar']['forma'], [2, 1, 5, 10])
+        respuesta = pedir('11')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('110 celdas', respuesta.json()['error'])
+
+
+class CursorTest(TestCase):
+    """
+    Paginación por cursor sobre (creado_en, id).
+    """
+
+    def test_ida_y_vuelta(self):
+        creado_en = datetime(2025, 3, 4, 5, 6, 7, 891011, tzinfo=timezone.utc)
+        simulacion = Simulacion(id=42, creado_en=creado_en)
+        self.assertEqual(leer_cursor(crear_cursor(simulacion)), (creado_en, 42))
+
+    def test_cursor_invalido(self):
+        for valor in (None, '', 'abc', '1-2-3', '12'):
+            with self.subTest(valor=valor):
+                self.assertIsNone(leer_cursor(valor))
+
+    def test_recorre_todas_las_paginas(self):
+        usuario = User.objects.create(username='cursor')
+        tipo = TipoAlga.objects.create(nombre='Cursor', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        crear_simulaciones([
+            Simulacion(usuario=usuario, tipo_alga=tipo, toneladas_deseadas=1, fecha_objetivo=date(2030, 1, 1))
+            for _ in range(23)
+        ])
+        # Varias simulaciones con el mismo creado_en: el id desempata
+        ids = list(Simulacion.objects.order_by('id').values_list('id', flat=True))
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for posicion, pk in enumerate(ids):
+            Simulacion.objects.filter(pk=pk).update(creado_en=base + timedelta(seconds=posicion // 4))
+
+        consulta = Simulacion.objects.filter(usuario=usuario).order_by('-creado_en', '-id')
+        vistos, cursor = [], None
+        while True:
+            pagina = list(despues_de(consulta, cursor)[:5])
+            if not pagina:
+                break
+            vistos.extend(simulacion.id for simulacion in pagina)
+            cursor = leer_cursor(crear_cursor(pagina[-1]))
+        self.assertEqual(vistos, list(consulta.values_list('id', flat=True)))
+        self.assertEqual(sorted(vistos), ids)
+
+
+class OcupacionTest(TestCase):
+    """
+    La ocupación diaria y la producción diaria y mensual se mantienen
+    iguales a las calculadas desde las simulaciones al crear, modificar y
+    eliminar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = [User.objects.create(username=f'ocupacion{i}') for i in range(2)]
+        cls.tipos = [
+            TipoAlga.objects.create(nombre=f'Ocupacion {i}', tiempo_cultivo_dias=10 + 5 * i, porcentaje_perdida=i)
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        crear_simulaciones([
+            Simulacion(
+                usuario=self.usuarios[i % 2], tipo_alga=self.tipos[i % 3 % 2],
+                toneladas_deseadas=Decimal('1.25') * (i + 1), fecha_objetivo=date(2030, 1, 1) + timedelta(days=3 * i),
+            )
+            for i in range(12)
+        ])
+        self.assertAgregadosCoinciden()
+
+    def assertAgregadosCoinciden(self):
+        self.assertOcupacionCoincide()
+        self.assertProduccionCoincide()
+
+    def assertOcupacionCoincide(self):
+        esperada = defaultdict(Decimal)
+        for tipo_alga_id, inicio, fin, toneladas in Simulacion.objects.values_list(
+            'tipo_alga_id', 'fecha_inicio_cultivo', 'fecha_objetivo', 'toneladas_a_plantar'
+        ):
+            for dia in range((fin - inicio).days):
+                esperada[tipo_alga_id, inicio + timedelta(days=dia)] += toneladas
+        guardada = {
+            (tipo_alga_id, fecha): toneladas
+            for tipo_alga_id, fecha, toneladas in OcupacionDiaria.objects.values_list('tipo_alga_id', 'fecha', 'toneladas')
+        }
+        self.assertEqual(guardada, {clave: valor for clave, valor in esperada.items() if valor})
+
+    def assertProduccionCoincide(self):
+        diaria = defaultdict(lambda: [Decimal(0), Decimal(0), 0, 0])
+        for tipo_alga_id, usuario_id, inicio, fin, plantadas, entregadas in Simulacion.objects.values_list(
+            'tipo_alga_id', 'usuario_id', 'fecha_inicio_cultivo', 'fecha_objetivo',
+            'toneladas_a_plantar', 'toneladas_deseadas',
+        ):
+            siembra = diaria[inicio, tipo_alga_id, usuario_id]
+            siembra[0] += plantadas
+            siembra[2] += 1
+            entrega = diaria[fin, tipo_alga_id, usuario_id]
+            entrega[1] += entregadas
+            entrega[3] += 1
+        mensual = defaultdict(lambda: [Decimal(0), Decimal(0), 0, 0])
+        for (fecha, tipo_alga_id, usuario_id), valores in diaria.items():
+            acumulado = mensual[fecha.replace(day=1), tipo_alga_id, usuario_id]
+            for posicion, valor in enumerate(valores):
+                acumulado[posicion] += valor
+
+        campos = ('tipo_alga_id', 'usuario_id') + CAMPOS_PRODUCCION
+        for modelo, campo_fecha, esperada in (
+            (ProduccionDiaria, 'fecha', diaria), (ProduccionMensual, 'mes', mensual)
+        ):
+            with self.subTest(modelo=modelo.__name__):
+                guardada = {
+                    (fecha, tipo_alga_id, usuario_id): list(valores)
+                    for fecha, tipo_alga_id, usuario_id, *valores in modelo.objects.values_list(campo_fecha, *campos)
+                }
+                self.assertEqual(guardada, dict(esperada))
+
+    def test_modificar(self):
+        simulacion = Simulacion.objects.order_by('id').first()
+        simulacion.toneladas_deseadas = Decimal('7.77')
+        simulacion.fecha_objetivo += timedelta(days=40)
+        simulacion.tipo_alga = self.tipos[1]
+        guardar_simulacion(simulacion)
+        self.assertAgregadosCoinciden()
+        simulacion.usuario = self.usuarios[1]
+        simulacion.fecha_objetivo += timedelta(days=1)
+        guardar_simulacion(simulacion)
+        self.assertAgregadosCoinciden()
+
+    def test_recalcular_lote(self):
+        simulaciones = list(Simulacion.objects.all())
+        for simulacion in simulaciones:
+            simulacion.toneladas_deseadas += 1
+        actualizar_simulaciones(simulaciones, campos=['toneladas_deseadas'])
+        self.assertAgregadosCoinciden()
+
+    def test_eliminar(self):
+        Simulacion.objects.order_by('id').first().delete()
+        self.assertAgregadosCoinciden()
+        Simulacion.objects.filter(pk__in=Simulacion.objects.order_by('-id').values('pk')[:3]).delete()
+        self.assertAgregadosCoinciden()
+
+    def test_eliminar_en_cascada(self):
+        usuario_id = self.usuarios[0].pk
+        self.usuarios[0].delete()
+        self.assertAgregadosCoinciden()
+        # La versión de sus simulaciones se elimina con el usuario
+        self.assertEqual(
+            list(VersionSimulaciones.objects.values_list('usuario_id', flat=True)), [self.usuarios[1].pk]
+        )
+        self.assertFalse(VersionSimulaciones.objects.filter(usuario_id=usuario_id).exists())
+        with self.assertNoLogs('simulacion.agregados'):
+            self.tipos[1].delete()
+        self.assertAgregadosCoinciden()
+
+
+class RecalculoTest(CatalogoTest):
+    """
+    Al cambiar los parámetros de un tipo de alga se recalculan por bloques
+    las simulaciones que aún no comienzan, y el trabajo se puede retomar.
+    """
+
+    class Interrupcion(Exception):
+        pass
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = User.objects.create(username='recalculo')
+        cls.tipo = TipoAlga.objects.create(nombre='Recalculo', tiempo_cultivo_dias=30, porcentaje_perdida=10)
+        hoy = date.today()
+        crear_simulaciones([
+            Simulacion(
+                usuario=usuario, tipo_alga=cls.tipo, toneladas_deseadas=Decimal('1.50') * (i + 1),
+                fecha_objetivo=hoy + timedelta(days=60 + i),
+            )
+            for i in range(6)
+        ] + [
+            # Con 0.01 t las toneladas a plantar siguen en 0.01 con 10% y 25%
+            Simulacion(usuario=usuario, tipo_alga=cls.tipo, toneladas_deseadas=Decimal('0.01'),
+                       fecha_objetivo=hoy + timedelta(days=90)),
+            # Ya comenzó a cultivarse: conserva sus resultados
+            Simulacion(usuario=usuario, tipo_alga=cls.tipo, toneladas_deseadas=5, fecha_objetivo=hoy + timedelta(days=5)),
+        ])
+        cls.antes = {simulacion.pk: simulacion for simulacion in Simulacion.objects.all()}
+
+    def setUp(self):
+        # El recálculo en segundo plano se encarga al confirmar; aquí no se ejecuta
+        with self.captureOnCommitCallbacks():
+            self.tipo.porcentaje_perdida = Decimal('25')
+            self.tipo.save()
+
+    def assertRecalculadas(self):
+        for simulacion in Simulacion.objects.all():
+            anterior = self.antes[simulacion.pk]
+            with self.subTest(simulacion=simulacion.pk):
+                if anterior.fecha_inicio_cultivo < date.today():
+                    self.assertEqual(simulacion.version_parametros, 1)
+                    self.assertEqual(simulacion.toneladas_a_plantar, anterior.toneladas_a_plantar)
+                    continue
+                esperada, = calcular_simulaciones([Simulacion(
+                    tipo_alga=self.tipo, toneladas_deseadas=simulacion.toneladas_deseadas,
+                    fecha_objetivo=simulacion.fecha_objetivo,
+                )])
+                self.assertEqual(simulacion.version_parametros, 2)
+                self.assertEqual(simulacion.toneladas_a_plantar, esperada.toneladas_a_plantar)
+                self.assertEqual(simulacion.fecha_inicio_cultivo, esperada.fecha_inicio_cultivo)
+                self.assertEqual(bytes(simulacion.curva_biomasa), esperada.curva_biomasa)
+                # Solo se escriben las que cambian
+                if simulacion.toneladas_a_plantar == anterior.toneladas_a_plantar:
+                    self.assertEqual(simulacion.actualizado_en, anterior.actualizado_en)
+                else:
+                    self.assertGreater(simulacion.actualizado_en, anterior.actualizado_en)
+
+    def test_recalcula_pendientes(self):
+        avance = []
+        progreso = recalculo.recalcular_tipo(self.tipo.pk, tamano_bloque=3, informar=lambda *datos: avance.append(datos))
+        self.assertEqual(avance, [(3, 7), (6, 7), (7, 7)])
+        self.assertTrue(progreso.completado)
+        self.assertRecalculadas()
+        self.assertFalse(recalculo.pendientes(self.tipo).exists())
+
+    def test_retoma_despues_de_interrupcion(self):
+        def interrumpir(recalculadas, total):
+            raise self.Interrupcion
+
+        with self.assertRaises(self.Interrupcion):
+            recalculo.recalcular_tipo(self.tipo.pk, tamano_bloque=3, informar=interrumpir)
+        progreso = ProgresoTrabajo.objects.get(clave=recalculo.clave_trabajo(self.tipo))
+        self.assertEqual((progreso.posicion, progreso.completado), (3, False))
+        self.assertEqual(recalculo.pendientes(self.tipo).count(), 4)
+
+        avance = []
+        progreso = recalculo.recalcular_tipo(self.tipo.pk, tamano_bloque=3, informar=lambda *datos: avance.append(datos))
+        self.assertEqual(avance, [(6, 7), (7, 7)])
+        self.assertEqual((progreso.posicion, progreso.completado), (7, True))
+        self.assertRecalculadas()
+
+    def test_seleccion_desde_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin-recalculo'))
+        seleccion = sorted(pk for pk, simulacion in self.antes.items() if simulacion.fecha_inicio_cultivo >= date.today())
+        # La acción responde sin recalcular: el trabajo queda encargado
+        with self.captureOnCommitCallbacks() as encargados:
+            respuesta = self.client.post(reverse('admin:simulacion_simulacion_changelist'), {
+                'action': 'recalcular', 'index': 0, '_selected_action': seleccion,
+            })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(encargados)
+        progreso = ProgresoTrabajo.objects.get(clave__startswith='recalculo-seleccion:')
+        self.assertEqual((progreso.posicion, progreso.completado), (0, False))
+        self.assertFalse(Simulacion.objects.filter(version_parametros=2).exists())
+
+        # Lo que hace el hilo de recálculos, interrumpido después del primer
+        # bloque. Al confirmarse el cambio del tipo de alga se publicó el catálogo
+        self.publicar_catalogo()
+        progreso.posicion = seleccion[2]
+        progreso.save()
+        recalculo.recalcular_seleccion(Simulacion.objects.filter(pk__in=seleccion), progreso, tamano_bloque=3)
+        self.assertEqual(
+            set(Simulacion.objects.filter(version_parametros=2).values_list('pk', flat=True)), set(seleccion[3:])
+        )
+        progreso.posicion = 0
+        recalculo.recalcular_seleccion(Simulacion.objects.filter(pk__in=seleccion), progreso, tamano_bloque=3)
+        self.assertEqual((progreso.posicion, progreso.completado), (seleccion[-1], True))
+        self.assertRecalculadas()
+
+
+class ImportarSimulacionesTest(CatalogoTest):
+    """
+    La importación guarda con cada bloque la fila y el byte donde termina,
+    retoma desde ahí después de una interrupción y con --reiniciar vuelve a
+    comenzar.
+    """
+
+    class Interrupcion(Exception):
+        pass
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username='importador')
+        TipoAlga.objects.create(nombre='Nori', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        cls.publicar_catalogo()
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = f'{directorio.name}/pedidos.csv'
+        self.errores = f'{directorio.name}/errores.csv'
+        filas = [
+            ['importador', 'Nori', '1.50', '2030-01-01', ''],
+            ['importador', 'Nori', '2.50', '2030-01-02', 'Notas\nen dos líneas, con "comillas"'],
+            ['desconocido', 'Nori', '3.50', '2030-01-03', ''],
+            ['importador', 'nori', '4.50', '2030-01-04', 'ñ'],
+            ['importador', 'Nori', '5.50', '2030-01-05', ''],
+        ]
+        with open(self.ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow([*importar_simulaciones.COLUMNAS, 'notas'])
+            escritor.writerows(filas)
+
+    def importar(self, *opciones):
+        call_command(
+            'importar_simulaciones', self.ruta, '--tamano-bloque', '2', '--errores', self.errores, *opciones,
+            stdout=io.StringIO(),
+        )
+        return ProgresoTrabajo.objects.get(clave__startswith='importar_simulaciones:')
+
+    def revisar(self, progreso, veces=1):
+        self.assertEqual((progreso.posicion, progreso.completado), (5, True))
+        self.assertEqual(progreso.desplazamiento, os.path.getsize(self.ruta))
+        self.assertEqual(
+            sorted(Simulacion.objects.values_list('toneladas_deseadas', flat=True)),
+            sorted([Decimal('1.50'), Decimal('2.50'), Decimal('4.50'), Decimal('5.50')] * veces),
+        )
+        self.assertEqual(
+            set(Simulacion.objects.filter(toneladas_deseadas=Decimal('2.50')).values_list('notas', flat=True)),
+            {'Notas\nen dos líneas, con "comillas"'},
+        )
+        with open(self.errores, newline='', encoding='utf-8') as archivo:
+            self.assertEqual([fila[0] for fila in csv.reader(archivo)], ['fila', '3'])
+
+    def test_retoma_despues_de_interrupcion(self):
+        crear = importar_simulaciones.crear_simulaciones
+        bloques = []
+
+        def crear_e_interrumpir(simulaciones):
+            bloques.append(len(simulaciones))
+            if len(bloques) == 2:
+                raise self.Interrupcion
+            return crear(simulaciones)
+
+        with mock.patch.object(importar_simulaciones, 'crear_simulaciones', crear_e_interrumpir):
+            with self.assertRaises(self.Interrupcion):
+                self.importar()
+        progreso = ProgresoTrabajo.objects.get()
+        self.assertEqual((progreso.posicion, progreso.completado), (2, False))
+        with open(self.ruta, 'rb') as archivo:
+            # El byte guardado es el comienzo de la tercera fila
+            archivo.seek(progreso.desplazamiento)
+            self.assertTrue(archivo.readline().startswith(b'desconocido,'))
+
+        self.revisar(self.importar())
+
+    def test_reiniciar(self):
+        self.revisar(self.importar())
+        # Ya importado: no se repite sin --reiniciar
+        self.revisar(self.importar())
+        self.revisar(self.importar('--reiniciar'), veces=2)
+
+
+class MonteCarloTest(CatalogoTest):
+    """
+    Los percentiles Monte Carlo quedan ordenados y son reproducibles, y una
+    petición no calcula más ensayos de los que admite.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='montecarlo')
+        cls.tipo = TipoAlga.objects.create(nombre='Montecarlo', tiempo_cultivo_dias=40, porcentaje_perdida=10)
+        cls.publicar_catalogo()
+
+    def estocastica(self, distribucion, **cambios):
+        return Simulacion(**{
+            'usuario': self.usuario, 'tipo_alga': self.tipo, 'toneladas_deseadas': Decimal('12.34'),
+            'fecha_objetivo': date(2031, 3, 1), 'modo_estocastico': True, 'distribucion': distribucion,
+            'variacion_perdida': Decimal('4'), 'variacion_dias': 6, 'ensayos': 20000, **cambios,
+        })
+
+    def test_percentiles_ordenados(self):
+        simulaciones = crear_simulaciones([
+            self.estocastica(distribucion) for distribucion, _ in montecarlo.DISTRIBUCION_CHOICES
+        ])
+        for simulacion in Simulacion.objects.filter(pk__in=[simulacion.pk for simulacion in simulaciones]):
+            with self.subTest(distribucion=simulacion.distribucion):
+                filas = simulacion.percentiles_montecarlo
+                self.assertEqual([fila['percentil'] for fila in filas], list(montecarlo.PERCENTILES))
+                toneladas = [fila['toneladas_a_plantar'] for fila in filas]
+                dias = [fila['dias_cultivo'] for fila in filas]
+                inicios = [fila['fecha_inicio_cultivo'] for fila in filas]
+                # Los percentiles altos cubren más pérdida y más días de cultivo
+                self.assertEqual(toneladas, sorted(toneladas))
+                self.assertEqual(dias, sorted(dias))
+                self.assertEqual(inicios, sorted(inicios, reverse=True))
+                # Las distribuciones están centradas en el cálculo determinista
+                self.assertLessEqual(abs(toneladas[0] - simulacion.toneladas_a_plantar), Decimal('0.10'))
+                self.assertLessEqual(abs(dias[0] - simulacion.dias_cultivo), 1)
+                self.assertGreater(toneladas[2], toneladas[0])
+
+    def test_reproducible_y_sin_variacion(self):
+        fija, = crear_simulaciones([self.estocastica('normal', variacion_perdida=0, variacion_dias=0)])
+        exactas = Decimal('12.34') * Decimal('1.10')
+        for fila in fija.percentiles_montecarlo:
+            # Los percentiles se redondean hacia arriba al centésimo
+            self.assertEqual(fila['toneladas_a_plantar'], exactas.quantize(Decimal('0.01'), rounding=ROUND_CEILING))
+            self.assertEqual(fila['fecha_inicio_cultivo'], fija.fecha_inicio_cultivo)
+        una, otra = calcular_simulaciones([self.estocastica('triangular'), self.estocastica('triangular')])
+        self.assertEqual(bytes(una.resumen_montecarlo), bytes(otra.resumen_montecarlo))
+
+    @override_settings(MONTECARLO_ENSAYOS_POR_PETICION=40000)
+    def test_ensayos_por_peticion(self):
+        self.assertEqual(validar_presupuesto_ensayos(40000), 40000)
+        with self.assertRaises(ValidationError):
+            validar_presupuesto_ensayos(40001)
+
+        # El admin no encarga el recálculo de una selección que lo supera
+        simulaciones = crear_simulaciones([self.estocastica('uniforme') for _ in range(3)])
+        self.client.force_login(User.objects.create_superuser('admin-montecarlo'))
+        with self.captureOnCommitCallbacks() as encargados:
+            respuesta = self.client.post(reverse('admin:simulacion_simulacion_changelist'), {
+                'action': 'recalcular', 'index': 0, '_selected_action': [simulacion.pk for simulacion in simulaciones],
+            }, follow=True)
+        self.assertContains(respuesta, '60.000 ensayos')
+        self.assertFalse(encargados)
+        self.assertFalse(ProgresoTrabajo.objects.exists())
+
+
+class PlanificadorTest(SimpleTestCase):
+    """
+    Después de planificar, la carga diaria de las siembras no supera la
+    capacidad, y cada ajuste respeta el adelanto máximo, el lote mínimo y
+    las siembras ya iniciadas.
+    """
+    hoy = date(2030, 1, 1)
+
+    def planificar(self, filas, capacidad, adelanto_maximo=60, lote_minimo=1):
+        return planificador.planificar(
+            filas, capacidad, hoy=self.hoy, adelanto_maximo=adelanto_maximo, lote_minimo=lote_minimo
+        )
+
+    def colocadas(self, filas, resultado):
+        """
+        Siembras del plan resultante: [(id, inicio, fin, toneladas)].
+        """
+        ajustes = {ajuste['simulacion_id']: ajuste['lotes'] for ajuste in resultado['ajustes']}
+        pendientes = {fila['simulacion_id']: fila['toneladas_pendientes'] for fila in resultado['no_satisfechas']}
+        plan = []
+        for pk, inicio, fin, toneladas in filas:
+            if pk in ajustes:
+                plan += [(pk, *lote) for lote in ajustes[pk]]
+            elif toneladas - pendientes.get(pk, 0) > 1e-9:
+                plan.append((pk, inicio, fin, toneladas - pendientes.get(pk, 0)))
+        return plan
+
+    def carga(self, plan):
+        por_dia = defaultdict(float)
+        for _, inicio, fin, toneladas in plan:
+            for dias in range((fin - inicio).days):
+                por_dia[inicio + timedelta(days=dias)] += toneladas
+        return por_dia
+
+    def test_adelanta_la_segunda(self):
+        filas = [
+            (1, date(2030, 3, 1), date(2030, 4, 1), 8.0),
+            (2, date(2030, 3, 10), date(2030, 4, 10), 8.0),
+        ]
+        resultado = self.planificar(filas, 10)
+        self.assertEqual(resultado['ventanas_sobrecarga'], [(date(2030, 3, 10), date(2030, 3, 31), 6.0)])
+        # La de fecha objetivo más próxima conserva su inicio; de la otra
+        # queda en su fecha lo que cabe y el resto se adelanta por lotes, cada
+        # uno en el inicio más tardío con lugar
+        self.assertEqual(resultado['ajustes'], [{'simulacion_id': 2, 'lotes': [
+            (date(2030, 3, 10), date(2030, 4, 10), 2.0),
+            (date(2030, 2, 7), date(2030, 3, 10), 2.0),
+            (date(2030, 1, 29), date(2030, 3, 1), 4.0),
+        ]}])
+        self.assertEqual(resultado['no_satisfechas'], [])
+        self.assertEqual(resultado['ventanas_restantes'], [])
+
+    def test_respeta_la_capacidad(self):
+        azar = random.Random(8)
+        filas = []
+        for pk in range(1, 301):
+            inicio = self.hoy + timedelta(days=azar.randint(-5, 200))
+            filas.append((pk, inicio, inicio + timedelta(days=azar.randint(10, 60)), round(azar.uniform(0.5, 12), 2)))
+        capacidad = 150.0
+        iniciadas = {pk for pk, inicio, _, _ in filas if inicio < self.hoy}
+        # Las ya iniciadas solas caben: toda sobrecarga se puede resolver
+        self.assertLessEqual(max(self.carga([fila for fila in filas if fila[0] in iniciadas]).values()), capacidad)
+
+        resultado = self.planificar(filas, capacidad, adelanto_maximo=45, lote_minimo=2)
+        self.assertTrue(resultado['ventanas_sobrecarga'])
+        self.assertTrue(resultado['ajustes'])
+        plan = self.colocadas(filas, resultado)
+        self.assertLessEqual(max(self.carga(plan).values()), capacidad + 1e-6)
+        self.assertEqual(resultado['ventanas_restantes'], [])
+
+        originales = {fila[0]: fila for fila in filas}
+        pendientes = {fila['simulacion_id']: fila['toneladas_pendientes'] for fila in resultado['no_satisfechas']}
+        for ajuste in resultado['ajustes']:
+            pk, inicio, fin, toneladas = originales[ajuste['simulacion_id']]
+            with self.subTest(simulacion=pk):
+                self.assertNotIn(pk, iniciadas)
+                for desde, hasta, cantidad in ajuste['lotes']:
+                    self.assertEqual(hasta - desde, fin - inicio)
+                    self.assertTrue(max(self.hoy, inicio - timedelta(days=45)) <= desde <= inicio)
+                    self.assertGreaterEqual(cantidad, min(2, toneladas) - 1e-9)
+                self.assertAlmostEqual(
+                    sum(lote[2] for lote in ajuste['lotes']) + pendientes.get(pk, 0), toneladas
+                )
+        self.assertAlmostEqual(
+            sum(fila[3] for fila in plan) + sum(pendientes.values()), sum(fila[3] for fila in filas)
+        )
+
+    def test_carga_y_maximo_movil(self):
+        rng = np.random.default_rng(8)
+        inicios = rng.integers(0, 90, 200)
+        fines = inicios + rng.integers(1, 30, 200)
+        toneladas = rng.uniform(0, 5, 200)
+        esperada = np.zeros(120)
+        for inicio, fin, cantidad in zip(inicios, fines, toneladas):
+            esperada[inicio:fin] += cantidad
+        np.testing.assert_allclose(planificador.carga_diaria(inicios, fines, toneladas, 120), esperada, atol=1e-9)
+
+        valores = rng.uniform(0, 10, 101)
+        for ventana in (1, 3, 7, 101):
+            with self.subTest(ventana=ventana):
+                np.testing.assert_array_equal(
+                    planificador._maximo_movil(valores, ventana),
+                    [valores[i:i + ventana].max() for i in range(len(valores) - ventana + 1)],
+                )
+
+
+class MetricasTest(TestCase):
+    """
+    /metrics responde en el formato de texto de Prometheus y los contadores
+    no disminuyen cuando termina el hilo que los registró.
+    """
+    MUESTRA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*",?)*\})? (\S+)$')
+
+    def leer(self, texto):
+        """
+        Valida el texto y retorna {(nombre, etiquetas): valor} y los tipos
+        declarados.
+        """
+        self.assertTrue(texto.endswith('\n'))
+        valores, tipos = {}, {}
+        for linea in texto.splitlines():
+            if linea.startswith('# HELP '):
+                continue
+            if linea.startswith('# TYPE '):
+                _, _, nombre, tipo = linea.split(' ')
+                tipos[nombre] = tipo
+                continue
+            coincidencia = self.MUESTRA.match(linea)
+            self.assertIsNotNone(coincidencia, linea)
+            nombre, etiquetas, valor = coincidencia.groups()
+            # Cada muestra sigue a la declaración de su métrica
+            familia = nombre if nombre in tipos else re.sub(r'_(bucket|sum|count)$', '', nombre)
+            self.assertIn(familia, tipos)
+            valores[nombre, etiquetas or ''] = float(valor)
+        return valores, tipos
+
+    def exponer(self):
+        respuesta = self.client.get(reverse('metricas'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return self.leer(respuesta.content.decode())
+
+    def contador(self, valores, vista):
+        return sum(
+            valor for (nombre, etiquetas), valor in valores.items()
+            if nombre == 'simulador_peticiones_total' and f'vista="{vista}"' in etiquetas
+        )
+
+    def test_formato(self):
+        self.client.get(reverse('inicio'))
+        valores, tipos = self.exponer()
+        self.assertEqual(tipos, {nombre: tipo for nombre, (tipo, _, _) in metricas.METRICAS.items()})
+        self.assertGreaterEqual(self.contador(valores, 'inicio'), 1)
+
+        # Los buckets de cada histograma son acumulados y el último es el total
+        for (nombre, etiquetas), total in valores.items():
+            if not nombre.endswith('_count'):
+                continue
+            base = nombre[:-len('_count')]
+            buckets = [
+                valor for (otro, otras), valor in valores.items()
+                if otro == f'{base}_bucket' and re.sub(r',le="[^"]*"', '', otras) == etiquetas
+            ]
+            with self.subTest(histograma=base, etiquetas=etiquetas):
+                self.assertEqual(len(buckets), len(metricas.METRICAS[base][2]) + 1)
+                self.assertEqual(buckets, sorted(buckets))
+                self.assertEqual(buckets[-1], total)
+
+    def test_etiquetas_escapadas(self):
+        metricas.incrementar('simulador_peticiones_total', (('vista', 'con "comillas"\\y\nsalto'),))
+        valores, _ = self.exponer()
+        self.assertEqual(self.contador(valores, r'con \"comillas\"\\y\nsalto'), 1)
+
+    def test_acceso(self):
+        self.assertEqual(self.client.get(reverse('metricas'), REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    def test_contadores_despues_de_terminar_el_hilo(self):
+        vista = f'hilo-{id(self)}'
+
+        def registrar():
+            for _ in range(5):
+                metricas.incrementar('simulador_peticiones_total', (('vista', vista),))
+            metricas.observar('simulador_peticion_segundos', (('vista', vista),), 0.2)
+
+        hilo = threading.Thread(target=registrar)
+        hilo.start()
+        hilo.join()
+        antes, _ = self.exponer()
+        self.assertEqual(self.contador(antes, vista), 5)
+
+        # El registro del hilo terminado pasa a los acumulados y sigue sumando
+        del hilo
+        despues, _ = self.exponer()
+        self.assertEqual(self.contador(despues, vista), 5)
+        hilo = threading.Thread(target=registrar)
+        hilo.start()
+        hilo.join()
+        despues, _ = self.exponer()
+        self.assertEqual(self.contador(despues, vista), 10)
+        self.assertEqual(
+            [valor for (nombre, etiquetas), valor in despues.items()
+             if nombre == 'simulador_peticion_segundos_count' and f'vista="{vista}"' in etiquetas],
+            [2],
+        )
+        # Ningún contador disminuyó
+        for clave, valor in antes.items():
+            if clave[0] in {'simulador_peticiones_total', 'simulador_consultas_db_total'} or clave[0].endswith('_count'):
+                self.assertGreaterEqual(despues.get(clave, 0), valor, clave)
+
+
+class PaginasCondicionalesTest(CatalogoTest):
+    """
+    La lista y el detalle responden 304 si el navegador ya tiene la misma
+    versión, y sus fragmentos en caché se renuevan al guardar la simulación
+    o su tipo de alga.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='condicional')
+        cls.tipo = TipoAlga.objects.create(nombre='Condicional', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        cls.simulacion, = crear_simulaciones([Simulacion(
+            usuario=cls.usuario, tipo_alga=cls.tipo, toneladas_deseadas=Decimal('12.50'), fecha_objetivo=date(2031, 1, 1),
+        )])
+        cls.publicar_catalogo()
+
+    def setUp(self):
+        caches['fragmentos'].clear()
+        self.addCleanup(caches['fragmentos'].clear)
+        # El catálogo pudo quedar cargado con un tipo de alga de otra prueba
+        self.publicar_catalogo()
+        self.client.force_login(self.usuario)
+
+    def revisar(self, url, antes, despues):
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, antes)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        etag = respuesta['ETag']
+        no_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertEqual(no_modificada.content, b'')
+        self.assertEqual(no_modificada['ETag'], etag)
+
+        # Un cambio que no pasa por save() no renueva la versión: se
+        # sigue sirviendo el fragmento guardado
+        Simulacion.objects.filter(pk=self.simulacion.pk).update(toneladas_deseadas=Decimal('99.25'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertContains(self.client.get(url), antes)
+
+        # Al guardar cambia la versión de la fila
+        simulacion = Simulacion.objects.get(pk=self.simulacion.pk)
+        simulacion.toneladas_deseadas = Decimal('13.75')
+        guardar_simulacion(simulacion)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertContains(respuesta, despues)
+        self.assertNotContains(respuesta, antes)
+        etag = respuesta['ETag']
+
+        # Y al guardar el tipo de alga, la de todas sus simulaciones
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tipo.nombre = 'Renombrada'
+            self.tipo.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Renombrada')
+        self.assertNotContains(respuesta, 'Condicional')
+
+    def test_lista(self):
+        self.revisar(reverse('lista_simulaciones'), '12,50 toneladas', '13,75 toneladas')
+
+    def test_detalle(self):
+        url = reverse('detalle_simulacion', args=[self.simulacion.pk])
+        self.revisar(url, '12,50', '13,75')
+        respuesta = self.client.get(url)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified']).status_code, 304
+        )
+
+
+class ExportacionTest(TestCase):
+    """
+    Las exportaciones CSV y NDJSON entregan todas las simulaciones del
+    usuario, un bloque por parte, con WSGI y con ASGI.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, otro = User.objects.create(username='exportacion'), User.objects.create(username='otro')
+        tipo = TipoAlga.objects.create(nombre='Exportacion', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        cls.cantidad = exportacion.FILAS_POR_BLOQUE + 5
+        crear_simulaciones([
+            Simulacion(usuario=usuario, tipo_alga=tipo, toneladas_deseadas=Decimal('1.25'), fecha_objetivo=date(2030, 1, 1))
+            for usuario in [cls.usuario] * cls.cantidad + [otro] * 3
+        ])
+        cls.ids = sorted(Simulacion.objects.filter(usuario=cls.usuario).values_list('id', flat=True))
+        cls.encabezado = [encabezado for encabezado, _ in exportacion.COLUMNAS_SIMULACIONES]
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('exportar_simulaciones')
+
+    def leer_csv(self, partes):
+        filas = list(csv.reader(''.join(parte.decode() for parte in partes).splitlines()))
+        self.assertEqual(filas[0], self.encabezado)
+        self.assertEqual(sorted(int(fila[0]) for fila in filas[1:]), self.ids)
+        self.assertEqual({fila[1] for fila in filas[1:]}, {'exportacion'})
+        self.assertEqual({fila[5] for fila in filas[1:]}, {'1.31'})
+
+    def leer_ndjson(self, partes):
+        filas = [json.loads(linea) for linea in b''.join(partes).decode().splitlines()]
+        self.assertEqual(sorted(fila['id'] for fila in filas), self.ids)
+        self.assertEqual(list(filas[0]), self.encabezado)
+        self.assertEqual({fila['toneladas_a_plantar'] for fila in filas}, {'1.31'})
+
+    def test_csv(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        partes = list(respuesta.streaming_content)
+        # Encabezado y un fragmento por bloque
+        self.assertEqual(len(partes), 3)
+        self.leer_csv(partes)
+
+    def test_ndjson(self):
+        respuesta = self.client.get(self.url, {'formato': 'ndjson'})
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        partes = list(respuesta.streaming_content)
+        self.assertEqual(len(partes), 2)
+        self.leer_ndjson(partes)
+
+    async def test_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        for formato, leer, bloques in (('csv', self.leer_csv, 3), ('ndjson', self.leer_ndjson, 2)):
+            with self.subTest(formato=formato):
+                respuesta = await self.async_client.get(self.url, {'formato': formato})
+                self.assertTrue(respuesta.is_async)
+                partes = [parte async for parte in respuesta.streaming_content]
+                self.assertEqual(len(partes), bloques)
+                leer(partes)
+
+
+@override_settings(PDF_PROCESOS=1)
+class PdfCacheTest(CatalogoTest):
+    """
+    El PDF de una simulación se sirve desde la caché, se genera si falta y
+    se vuelve a generar si una invalidación lo borra antes de abrirlo.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='pdf')
+        cls.tipo = TipoAlga.objects.create(nombre='Pdf', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        cls.simulacion, = crear_simulaciones([Simulacion(
+            usuario=cls.usuario, tipo_alga=cls.tipo, toneladas_deseadas=10, fecha_objetivo=date(2030, 1, 1),
+        )])
+        cls.publicar_catalogo()
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = self.settings(PDF_CACHE_DIR=directorio.name, PDF_ESPERA_SEGUNDOS=60)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        # Un catálogo cargado en otra prueba puede traer el tipo de alga que
+        # test_invalidacion_por_tipo_alga modificó y revirtió
+        self.publicar_catalogo()
+        self.client.force_login(self.usuario)
+        self.url = reverse('exportar_pdf', args=[self.simulacion.pk])
+
+    def datos(self):
+        return reportes.datos_reporte(Simulacion.objects.select_related('tipo_alga', 'usuario').get())
+
+    def descargar(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        return b''.join(respuesta.streaming_content)
+
+    def test_en_cache(self):
+        reportes._escribir_cache(b'%PDF-en-cache', reportes.ruta_cache(self.datos()))
+        self.assertEqual(self.descargar(), b'%PDF-en-cache')
+
+    def test_sin_cache(self):
+        ruta = reportes.ruta_cache(self.datos())
+        self.assertFalse(ruta.exists())
+        pdf = self.descargar()
+        self.assertTrue(pdf.startswith(b'%PDF-'))
+        self.assertEqual(ruta.read_bytes(), pdf)
+        self.assertTrue(reportes.pdf_listo(self.datos()))
+
+    def test_invalidacion_por_tipo_alga(self):
+        ruta = reportes.ruta_cache(self.datos())
+        reportes._escribir_cache(b'%PDF-en-cache', ruta)
+        # Sin ejecutar el recálculo en segundo plano que encarga el cambio
+        with self.captureOnCommitCallbacks():
+            self.tipo.porcentaje_perdida = 7
+            self.tipo.save()
+        self.publicar_catalogo()
+        self.assertFalse(ruta.exists())
+        self.assertNotEqual(reportes.ruta_cache(self.datos()), ruta)
+        self.assertTrue(self.descargar().startswith(b'%PDF-'))
+
+    def test_borrado_antes_de_abrir(self):
+        guardar = reportes._guardar_pdf
+        generados = []
+
+        def guardar_e_invalidar(datos, ruta):
+            guardar(datos, ruta)
+            generados.append(ruta)
+            # La primera vez una invalidación lo borra apenas se escribe
+            if len(generados) == 1:
+                reportes.invalidar_simulacion(datos['id'], datos['tipo_alga_id'])
+            return ruta
+
+        with mock.patch.object(reportes, '_guardar_pdf', guardar_e_invalidar):
+            archivo = reportes.abrir_pdf(self.datos(), espera=60)
+        with archivo:
+            self.assertTrue(archivo.read().startswith(b'%PDF-'))
+        self.assertEqual(len(generados), 2)
+
+
+class CarteraTest(TransactionTestCase):
+    """
+    La cartera PDF se dibuja en su propio grupo de hilos, sin esperar a los
+    reportes individuales, y se envía por partes también bajo ASGI. Los
+    datos se confirman porque ese hilo los lee con su propia conexión.
+    """
+
+    def setUp(self):
+        self.usuario = User.objects.create(username='cartera')
+        tipo = TipoAlga.objects.create(nombre='Cartera', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        crear_simulaciones([
+            Simulacion(usuario=self.usuario, tipo_alga=tipo, toneladas_deseadas=i + 1, fecha_objetivo=date(2030, 1, 1))
+            for i in range(3)
+        ])
+        self.client.force_login(self.usuario)
+        self.url = reverse('exportar_cartera')
+
+    def revisar(self, respuesta, contenido):
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertEqual(respuesta['Content-Disposition'], 'attachment; filename="cartera.pdf"')
+        self.assertEqual(int(respuesta['Content-Length']), len(contenido))
+        self.assertTrue(contenido.startswith(b'%PDF-'))
+
+    def test_con_reportes_ocupados(self):
+        liberar = threading.Event()
+        ocupados = [reportes._ejecutor.submit(liberar.wait, 30) for _ in range(settings.PDF_WORKERS)]
+        try:
+            respuesta = self.client.get(self.url)
+            self.revisar(respuesta, b''.join(respuesta.streaming_content))
+            # La cartera no esperó a que se liberara un hilo de los reportes
+            self.assertFalse(any(futuro.done() for futuro in ocupados))
+        finally:
+            liberar.set()
+
+    @override_settings(PDF_CARTERA_MAXIMO=2)
+    def test_maximo(self):
+        respuesta = self.client.get(self.url)
+        self.assertRedirects(respuesta, reverse('lista_simulaciones'), fetch_redirect_response=False)
+
+    async def test_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(self.url)
+        self.assertTrue(respuesta.is_async)
+        self.revisar(respuesta, b''.join([parte async for parte in respuesta.streaming_content]))
+
+
+class ZipTest(TestCase):
+    """
+    El ZIP trae un PDF por simulación seleccionada, tomado de la caché o
+    generado, con WSGI y con ASGI.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='zip')
+        tipo = TipoAlga.objects.create(nombre='Zip', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        crear_simulaciones([
+            Simulacion(usuario=cls.usuario, tipo_alga=tipo, toneladas_deseadas=i + 1, fecha_objetivo=date(2030, 1, 1))
+            for i in range(3)
+        ])
+        cls.simulaciones = list(Simulacion.objects.select_related('tipo_alga', 'usuario').order_by('pk'))
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = self.settings(PDF_CACHE_DIR=directorio.name)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        # La primera ya está en caché
+        reportes._escribir_cache(b'%PDF-en-cache', reportes.ruta_cache(reportes.datos_reporte(self.simulaciones[0])))
+        self.client.force_login(self.usuario)
+        self.url = reverse('exportar_zip')
+        self.seleccion = {'simulaciones': [str(simulacion.pk) for simulacion in self.simulaciones]}
+
+    def revisar(self, contenido):
+        with zipfile.ZipFile(io.BytesIO(contenido)) as archivo_zip:
+            self.assertIsNone(archivo_zip.testzip())
+            self.assertEqual(
+                archivo_zip.namelist(), [f'simulacion_{simulacion.pk}.pdf' for simulacion in self.simulaciones]
+            )
+            contenidos = [archivo_zip.read(nombre) for nombre in archivo_zip.namelist()]
+        self.assertEqual(contenidos[0], b'%PDF-en-cache')
+        for pdf in contenidos[1:]:
+            self.assertTrue(pdf.startswith(b'%PDF-'))
+        # Los generados quedaron en la caché
+        for simulacion in self.simulaciones[1:]:
+            self.assertTrue(reportes.ruta_cache(reportes.datos_reporte(simulacion)).exists())
+
+    def test_zip(self):
+        respuesta = self.client.post(self.url, self.seleccion)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        self.revisar(b''.join(respuesta.streaming_content))
+
+    async def test_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.post(self.url, self.seleccion)
+        self.assertTrue(respuesta.is_async)
+        self.revisar(b''.join([parte async for parte in respuesta.streaming_content]))
+
+
+class CurvaBiomasaTest(TestCase):
+    """
+    La curva de biomasa se guarda como float32 y se entrega por bloques.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='biomasa')
+        # Más días que filas por bloque, para que la curva ocupe dos
+        tipo = TipoAlga.objects.create(nombre='Biomasa', tiempo_cultivo_dias=1500, porcentaje_perdida=20)
+        cls.simulacion, = crear_simulaciones([Simulacion(
+            usuario=cls.usuario, tipo_alga=tipo, toneladas_deseadas=100, fecha_objetivo=date(2034, 1, 1),
+        )])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('curva_biomasa', args=[self.simulacion.pk])
+
+    def test_codificacion(self):
+        curvas = curvas_biomasa([12000, 500, 700], [10000, 500, 700], [4, 0, 2])
+        series = [np.frombuffer(curva, dtype='<f4') for curva in curvas]
+        self.assertEqual([len(serie) for serie in series], [5, 1, 3])
+        esperada = 120 * (100 / 120) ** (np.arange(5) / 4)
+        np.testing.assert_allclose(series[0], esperada, rtol=1e-6)
+        # Sin días de cultivo o sin pérdida la biomasa no cambia
+        self.assertEqual(series[1].tolist(), [5.0])
+        self.assertEqual(series[2].tolist(), [7.0] * 3)
+
+        guardada = Simulacion.objects.get(pk=self.simulacion.pk).serie_biomasa
+        self.assertEqual(len(guardada), 1501)
+        self.assertAlmostEqual(float(guardada[0]), 120, places=4)
+        self.assertAlmostEqual(float(guardada[-1]), 100, places=3)
+        self.assertTrue((np.diff(guardada) < 0).all())
+
+    def revisar(self, filas):
+        serie = Simulacion.objects.get(pk=self.simulacion.pk).serie_biomasa
+        self.assertEqual([int(fila['dia']) for fila in filas], list(range(1501)))
+        self.assertEqual(filas[0]['fecha'], self.simulacion.fecha_inicio_cultivo.isoformat())
+        self.assertEqual(filas[-1]['fecha'], '2034-01-01')
+        self.assertEqual([float(fila['toneladas']) for fila in filas], [round(valor, 4) for valor in serie.tolist()])
+
+    def test_csv(self):
+        partes = list(self.client.get(self.url).streaming_content)
+        self.assertEqual(len(partes), 3)
+        self.revisar(list(csv.DictReader(b''.join(partes).decode().splitlines())))
+
+    async def test_ndjson_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(self.url, {'formato': 'ndjson'})
+        self.assertTrue(respuesta.is_async)
+        partes = [parte async for parte in respuesta.streaming_content]
+        self.assertEqual(len(partes), 2)
+        await sync_to_async(self.revisar)([json.loads(linea) for linea in b''.join(partes).decode().splitlines()])
+
+
+@override_settings(API_MAXIMO_LOTE=50, MONTECARLO_ENSAYOS_POR_PETICION=10000)
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='api')
+        cls.tipo = TipoAlga.objects.create(nombre='Api', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_simulaciones')
+
+    def fila(self, **cambios):
+        return {'tipo_alga': self.tipo.pk, 'toneladas_deseadas': '2.50', 'fecha_objetivo': '2030-01-01', **cambios}
+
+    def crear(self, filas):
+        return self.client.post(self.url, json.dumps({'simulaciones': filas}), content_type='application/json')
+
+    def test_lista_no_modificada(self):
+        self.assertEqual(self.crear([self.fila()]).status_code, 201)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.assertEqual(self.crear([self.fila()]).status_code, 201)
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['simulaciones']), 2)
+        etag = respuesta['ETag']
+
+        Simulacion.objects.filter(usuario=self.usuario).first().delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detalle_no_modificado(self):
+        pk = self.crear([self.fila()]).json()['simulaciones'][0]['id']
+        url = reverse('api_detalle_simulacion', args=[pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_lote_invalido_no_crea_ninguna(self):
+        respuesta = self.crear([
+            self.fila(), self.fila(toneladas_deseadas='0'), self.fila(tipo_alga=0), 'texto',
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        detalle = {error['posicion']: error['errores'] for error in respuesta.json()['detalle']}
+        self.assertEqual(sorted(detalle), [1, 2, 3])
+        self.assertIn('toneladas_deseadas', detalle[1])
+        self.assertIn('tipo_alga', detalle[2])
+        self.assertFalse(Simulacion.objects.exists())
+
+    def test_limites_del_lote(self):
+        self.assertEqual(self.crear([self.fila()] * 51).status_code, 413)
+        estocastica = self.fila(modo_estocastico=True, distribucion='normal', ensayos=5000)
+        self.assertEqual(self.crear([estocastica] * 3).status_code, 413)
+        self.assertFalse(Simulacion.objects.exists())
+        self.assertEqual(self.crear([estocastica] * 2).status_code, 201)
+
+
+@override_settings(ADMIN_CONTEO_EXACTO_MAXIMO=25)
+class PaginadorEstimadoTest(TestCase):
+    """
+    Por sobre el límite de conteo exacto se puede llegar a todas las páginas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = User.objects.create(username='paginador')
+        tipo = TipoAlga.objects.create(nombre='Paginador', tiempo_cultivo_dias=30, porcentaje_perdida=5)
+        crear_simulaciones([
+            Simulacion(usuario=usuario, tipo_alga=tipo, toneladas_deseadas=1, fecha_objetivo=date(2030, 1, 1))
+            for _ in range(53)
+        ])
+        # Ids sin usar: el mayor id ya no es la cantidad de filas
+        Simulacion.objects.filter(pk__in=Simulacion.objects.order_by('-pk').values('pk')[:3]).delete()
+
+    def paginador(self, consulta=None):
+        return PaginadorEstimado((consulta or Simulacion.objects.all()).order_by('-pk'), 10)
+
+    def test_minimo_y_paginas_siguientes(self):
+        paginador = self.paginador()
+        self.assertEqual((paginador.count, paginador.tipo_conteo), (26, 'minimo'))
+        self.assertEqual(paginador.num_pages, 3)
+
+        pagina = paginador.page(4)
+        self.assertEqual(len(pagina), 10)
+        self.assertTrue(pagina.has_next())
+        self.assertEqual((paginador.count, paginador.tipo_conteo), (41, 'minimo'))
+
+        pagina = paginador.page(5)
+        self.assertFalse(pagina.has_next())
+        self.assertEqual((paginador.count, paginador.tipo_conteo), (50, 'exacto'))
+        with self.assertRaises(EmptyPage):
+            self.paginador().page(6)
+
+    def test_con_filtros(self):
+        paginador = self.paginador(Simulacion.objects.filter(toneladas_deseadas=1))
+        self.assertEqual((paginador.count, paginador.tipo_conteo), (26, 'minimo'))
+        self.assertEqual(len(paginador.page(5)), 10)
+
+    def test_bajo_el_limite(self):
+        paginador = self.paginador(Simulacion.objects.filter(pk__in=Simulacion.objects.values('pk')[:20]))
+        self.assertEqual((paginador.count, paginador.tipo_conteo), (20, 'exacto'))
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Página de inicio
@@ -8,7 +8,28 @@ urlpatterns = [
     # Simulaciones
     path('simulaciones/', views.lista_simulaciones, name='lista_simulaciones'),
     path('simulaciones/nueva/', views.nueva_simulacion, name='nueva_simulacion'),
+    path('simulaciones/exportar/zip/', views.exportar_zip, name='exportar_zip'),
+    path('simulaciones/exportar/cartera/', views.exportar_cartera, name='exportar_cartera'),
+    path('simulaciones/exportar/', views.exportar_simulaciones, name='exportar_simulaciones'),
     path('simulaciones/<int:pk>/', views.detalle_simulacion, name='detalle_simulacion'),
     path('simulaciones/<int:pk>/eliminar/', views.eliminar_simulacion, name='eliminar_simulacion'),
     path('simulaciones/<int:pk>/pdf/', views.exportar_pdf, name='exportar_pdf'),
+    path('simulaciones/<int:pk>/biomasa/', views.curva_biomasa, name='curva_biomasa'),
+    
+    # Análisis sobre el catálogo de tipos de alga
+    path('analisis/entregas/', views.solver_entregas, name='solver_entregas'),
+    path('analisis/barrido/', views.barrido_simulaciones, name='barrido_simulaciones'),
+    
+    # Calendario de cultivo
+    path('ocupacion/', views.calendario_ocupacion, name='calendario_ocupacion'),
+    
+    # Tablero de producción
+    path('produccion/', views.tablero_produccion, name='tablero_produccion'),
+    
+    # Métricas para Prometheus
+    path('metrics', views.exponer_metricas, name='metricas'),
+    
+    # API JSON
+    path('api/simulaciones/', api.simulaciones, name='api_simulaciones'),
+    path('api/simulaciones/<int:pk>/', api.detalle, name='api_detalle_simulacion'),
 ]
@@ -1,10 +1,24 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
-from .models import Simulacion, TipoAlga
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.middleware.csrf import get_token
+from django.views.decorators.http import require_POST
+from .models import Simulacion
 from .forms import SimulacionForm
-from datetime import date
+from . import analisis, catalogo, exportacion, metricas, reportes
+from .agregados import ocupacion_en_rango, produccion_del_anio
+from .escritura import escritura
+from .motor import guardar_simulacion
+from .paginacion import crear_cursor, despues_de, leer_cursor
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_DOWN, Decimal, InvalidOperation
+import hashlib
 
 # Vista principal - Página de inicio
 def inicio(request):
@@ -19,44 +33,146 @@ def inicio(request):
     return render(request, 'simulacion/inicio.html', context)
 
 
+async def _usuario(request):
+    """
+    Obtiene el usuario de la sesión con el ORM asíncrono y lo deja en
+    request.user, para que las plantillas no lo consulten de forma síncrona.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
 # Vista para listar todas las simulaciones
 @login_required
-def lista_simulaciones(request):
+async def lista_simulaciones(request):
     """
-    Muestra todas las simulaciones realizadas por el usuario actual.
+    Muestra las simulaciones realizadas por el usuario actual.
+    Pagina por cursor sobre (creado_en, id): cada página continúa desde la
+    última simulación de la anterior, por lo que su costo no depende de la
+    cantidad total de simulaciones del usuario.
+    La página responde 304 si no cambió ninguna de sus simulaciones, y las
+    tarjetas se guardan en caché ya renderizadas (ver la plantilla).
     """
-    simulaciones = Simulacion.objects.filter(usuario=request.user).order_by('-creado_en')
+    usuario = await _usuario(request)
+    por_pagina = settings.SIMULACIONES_POR_PAGINA
+    simulaciones = (
+        Simulacion.objects
+        .filter(usuario=usuario)
+        .only(*CAMPOS_TARJETA)
+        .order_by('-creado_en', '-id')
+    )
+
+    cursor = leer_cursor(request.GET.get('despues'))
+    simulaciones = despues_de(simulaciones, cursor)
+
+    # Se pide una fila extra solo para saber si existe una página siguiente
+    simulaciones = [simulacion async for simulacion in simulaciones[:por_pagina + 1]]
+    # El tipo de alga de cada tarjeta sale del catálogo en memoria
+    await catalogo.aasignar_tipos(simulaciones)
+    siguiente = None
+    if len(simulaciones) > por_pagina:
+        simulaciones = simulaciones[:por_pagina]
+        siguiente = crear_cursor(simulaciones[-1])
+
+    # La página cambia si cambia alguna de sus simulaciones o tipos de alga
+    etag = _etag_pagina(
+        request, 'lista', cursor, siguiente, (await catalogo.aobtener()).ultima_modificacion,
+        [(simulacion.id, simulacion.actualizado_en) for simulacion in simulaciones],
+    )
+    no_modificada = _no_modificada(request, etag)
+    if no_modificada is not None:
+        return _marcar_version(no_modificada, etag)
+
     context = {
         'simulaciones': simulaciones,
+        'cursor_siguiente': siguiente,
+        'es_primera_pagina': cursor is None,
         'titulo': 'Mis Simulaciones'
     }
-    return render(request, 'simulacion/lista_simulaciones.html', context)
+    return _marcar_version(render(request, 'simulacion/lista_simulaciones.html', context), etag)
+
+
+# Campos que usan las tarjetas de la lista de simulaciones
+CAMPOS_TARJETA = (
+    'id',
+    'creado_en',
+    'toneladas_deseadas',
+    'fecha_objetivo',
+    'toneladas_a_plantar',
+    'fecha_inicio_cultivo',
+    'tipo_alga',
+    'actualizado_en',
+)
+
+def _etag_pagina(request, *partes):
+    """
+    ETag de una página del usuario a partir de los datos que muestra.
+    Incluye el usuario y el secreto CSRF, que aparecen en el menú y los
+    formularios. Retorna None si hay mensajes pendientes: esos se deben
+    mostrar en una página nueva.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    # En la primera visita el secreto CSRF se crea al renderizar; se crea
+    # antes para que el ETag corresponda a la página que se envía
+    get_token(request)
+    datos = repr((request.user.pk, request.META.get('CSRF_COOKIE'), *partes))
+    return quote_etag(hashlib.sha256(datos.encode()).hexdigest()[:32])
+
+
+def _no_modificada(request, etag, ultima_modificacion=None):
+    """
+    Respuesta 304 si el navegador ya tiene esta versión de la página, o
+    None si hay que generarla.
+    """
+    if etag is None:
+        return None
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(ultima_modificacion.timestamp()) if ultima_modificacion else None,
+    )
+
+
+def _marcar_version(response, etag, ultima_modificacion=None):
+    """
+    Agrega ETag y Last-Modified a la respuesta. Con no-cache el navegador
+    consulta antes de reutilizar la página, así nunca muestra datos viejos.
+    """
+    if etag is not None:
+        response['ETag'] = etag
+        if ultima_modificacion:
+            response['Last-Modified'] = http_date(ultima_modificacion.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 # Vista para crear una nueva simulación
 @login_required
-def nueva_simulacion(request):
+async def nueva_simulacion(request):
     """
     Formulario para crear una nueva simulación.
     Calcula automáticamente los resultados al guardar.
+    El guardado usa el motor de cálculo, que necesita una transacción, por
+    lo que se ejecuta en un hilo con sync_to_async.
     """
+    usuario = await _usuario(request)
+    # Las opciones del tipo de alga salen del catálogo en memoria
+    vigente = await catalogo.aobtener()
     if request.method == 'POST':
-        form = SimulacionForm(request.POST)
+        form = SimulacionForm(request.POST, catalogo=vigente)
         if form.is_valid():
             # Crear la simulación pero no guardarla aún
             simulacion = form.save(commit=False)
-            simulacion.usuario = request.user
+            simulacion.usuario = usuario
             
-            # Calcular los resultados de la simulación
-            simulacion.calcular_simulacion()
-            
-            # Guardar la simulación con los resultados
-            simulacion.save()
+            # Calcular los resultados y guardar usando el motor de cálculo
+            await sync_to_async(guardar_simulacion)(simulacion)
             
             messages.success(request, '¡Simulación creada exitosamente!')
             return redirect('detalle_simulacion', pk=simulacion.pk)
     else:
-        form = SimulacionForm()
+        form = SimulacionForm(catalogo=vigente)
     
     context = {
         'form': form,
@@ -67,18 +183,42 @@ def nueva_simulacion(request):
 
 # Vista para ver el detalle de una simulación
 @login_required
-def detalle_simulacion(request, pk):
+async def detalle_simulacion(request, pk):
     """
     Muestra los detalles completos de una simulación específica.
     Incluye todos los cálculos y resultados.
+    Responde 304 si la simulación no cambió y el navegador ya tiene la
+    página del día; las partes fijas se guardan en caché ya renderizadas.
     """
-    simulacion = get_object_or_404(Simulacion, pk=pk, usuario=request.user)
+    usuario = await _usuario(request)
+    simulacion = await aget_object_or_404(
+        Simulacion.objects.defer('curva_biomasa'),
+        pk=pk,
+        usuario=usuario
+    )
+    simulacion.usuario = usuario
+    await catalogo.aasignar_tipos([simulacion])
+    hoy = date.today()
+
+    # Los días que faltan cambian a medianoche, así que la página también
+    ultima_modificacion = max(
+        simulacion.actualizado_en,
+        simulacion.tipo_alga.actualizado_en,
+        # Medianoche en la hora local del servidor, igual que date.today()
+        datetime.combine(hoy, time.min).astimezone(),
+    )
+    etag = _etag_pagina(
+        request, 'detalle', simulacion.id, simulacion.actualizado_en, simulacion.tipo_alga.actualizado_en, hoy
+    )
+    no_modificada = _no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return _marcar_version(no_modificada, etag, ultima_modificacion)
     
     # Calcular días hasta la fecha objetivo
-    dias_hasta_objetivo = (simulacion.fecha_objetivo - date.today()).days
+    dias_hasta_objetivo = (simulacion.fecha_objetivo - hoy).days
     
     # Calcular días hasta inicio de cultivo
-    dias_hasta_inicio = (simulacion.fecha_inicio_cultivo - date.today()).days
+    dias_hasta_inicio = (simulacion.fecha_inicio_cultivo - hoy).days
     
     context = {
         'simulacion': simulacion,
@@ -86,19 +226,27 @@ def detalle_simulacion(request, pk):
         'dias_hasta_inicio': dias_hasta_inicio,
         'titulo': f'Simulación #{simulacion.id}'
     }
-    return render(request, 'simulacion/detalle_simulacion.html', context)
+    return _marcar_version(
+        render(request, 'simulacion/detalle_simulacion.html', context), etag, ultima_modificacion
+    )
 
 
 # Vista para eliminar una simulación
 @login_required
-def eliminar_simulacion(request, pk):
+async def eliminar_simulacion(request, pk):
     """
     Elimina una simulación específica.
     """
-    simulacion = get_object_or_404(Simulacion, pk=pk, usuario=request.user)
+    usuario = await _usuario(request)
+    simulacion = await aget_object_or_404(
+        Simulacion.objects.defer('curva_biomasa'),
+        pk=pk,
+        usuario=usuario
+    )
+    await catalogo.aasignar_tipos([simulacion])
     
     if request.method == 'POST':
-        simulacion.delete()
+        await sync_to_async(_eliminar)(simulacion)
         messages.success(request, 'Simulación eliminada correctamente.')
         return redirect('lista_simulaciones')
     
@@ -109,142 +257,303 @@ def eliminar_simulacion(request, pk):
     return render(request, 'simulacion/eliminar_simulacion.html', context)
 
 
+def _eliminar(simulacion):
+    """
+    Elimina la simulación dentro de escritura(), que ordena las escrituras y
+    actualiza la ocupación en la misma transacción.
+    """
+    with escritura():
+        simulacion.delete()
+
+
 # Vista para exportar simulación a PDF
 @login_required
-def exportar_pdf(request, pk):
+async def exportar_pdf(request, pk):
     """
     Exporta una simulación a formato PDF.
     Genera un reporte completo con todos los datos y cálculos.
+    Si el PDF ya está en caché se entrega de inmediato; si no, se genera
+    en segundo plano y se muestra una página que vuelve a consultar.
+    Mientras se espera el PDF la petición no ocupa ningún hilo.
     """
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER
-    from io import BytesIO
-    
-    simulacion = get_object_or_404(Simulacion, pk=pk, usuario=request.user)
-    
-    # Crear el PDF en memoria
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elementos = []
-    
-    # Estilos
-    estilos = getSampleStyleSheet()
-    estilo_titulo = ParagraphStyle(
-        'CustomTitle',
-        parent=estilos['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
+    usuario = await _usuario(request)
+    simulacion = await aget_object_or_404(
+        Simulacion.objects.defer('curva_biomasa'),
+        pk=pk,
+        usuario=usuario
     )
-    estilo_subtitulo = ParagraphStyle(
-        'CustomSubtitle',
-        parent=estilos['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#34495e'),
-        spaceAfter=12,
-        spaceBefore=12
+    simulacion.usuario = usuario
+    await catalogo.aasignar_tipos([simulacion])
+
+    # Consulta de estado usada por la página "generando PDF"
+    if request.GET.get('estado'):
+        return JsonResponse({'listo': reportes.pdf_listo(reportes.datos_reporte(simulacion))})
+
+    archivo = await reportes.aabrir_pdf(
+        reportes.datos_reporte(simulacion),
+        espera=settings.PDF_ESPERA_SEGUNDOS
     )
-    estilo_normal = estilos['Normal']
-    
-    # Título
-    elementos.append(Paragraph('Reporte de Simulación de Cultivo de Algas', estilo_titulo))
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    # Información general
-    elementos.append(Paragraph('Información General', estilo_subtitulo))
-    datos_generales = [
-        ['ID de Simulación:', str(simulacion.id)],
-        ['Usuario:', simulacion.usuario.username],
-        ['Fecha de Creación:', simulacion.creado_en.strftime('%d/%m/%Y %H:%M')],
-        ['Tipo de Alga:', simulacion.tipo_alga.nombre],
-    ]
-    tabla_general = Table(datos_generales, colWidths=[3*inch, 3*inch])
-    tabla_general.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elementos.append(tabla_general)
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    # Datos de entrada
-    elementos.append(Paragraph('Datos de Entrada', estilo_subtitulo))
-    datos_entrada = [
-        ['Toneladas Deseadas:', f"{simulacion.toneladas_deseadas} t"],
-        ['Fecha Objetivo:', simulacion.fecha_objetivo.strftime('%d/%m/%Y')],
-    ]
-    tabla_entrada = Table(datos_entrada, colWidths=[3*inch, 3*inch])
-    tabla_entrada.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elementos.append(tabla_entrada)
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    # Resultados calculados
-    elementos.append(Paragraph('Resultados de la Simulación', estilo_subtitulo))
-    datos_resultados = [
-        ['Toneladas a Plantar:', f"{simulacion.toneladas_a_plantar} t"],
-        ['Fecha Inicio de Cultivo:', simulacion.fecha_inicio_cultivo.strftime('%d/%m/%Y')],
-        ['Días de Cultivo:', f"{simulacion.dias_cultivo} días"],
-        ['Porcentaje de Pérdida:', f"{simulacion.tipo_alga.porcentaje_perdida}%"],
-    ]
-    tabla_resultados = Table(datos_resultados, colWidths=[3*inch, 3*inch])
-    tabla_resultados.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f5e9')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elementos.append(tabla_resultados)
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    # Notas
-    if simulacion.notas:
-        elementos.append(Paragraph('Notas Adicionales', estilo_subtitulo))
-        elementos.append(Paragraph(simulacion.notas, estilo_normal))
-        elementos.append(Spacer(1, 0.3*inch))
-    
-    # Explicación de cálculos
-    elementos.append(Paragraph('Explicación de Cálculos', estilo_subtitulo))
-    explicacion = f"""
-    <b>Cálculo de Toneladas a Plantar:</b><br/>
-    Para compensar las pérdidas del {simulacion.tipo_alga.porcentaje_perdida}% durante el cultivo,
-    se debe plantar {simulacion.toneladas_a_plantar} toneladas para obtener {simulacion.toneladas_deseadas} toneladas finales.<br/><br/>
-    <b>Fórmula:</b> Toneladas a Plantar = Toneladas Deseadas × (1 + Porcentaje Pérdida / 100)<br/><br/>
-    <b>Cálculo de Fecha de Inicio:</b><br/>
-    Considerando que el cultivo de {simulacion.tipo_alga.nombre} requiere {simulacion.dias_cultivo} días,
-    se debe iniciar el cultivo el {simulacion.fecha_inicio_cultivo.strftime('%d/%m/%Y')} para cumplir con la fecha objetivo.
-    """
-    elementos.append(Paragraph(explicacion, estilo_normal))
-    
-    # Construir el PDF
-    doc.build(elementos)
-    
-    # Obtener el PDF del buffer
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    # Crear la respuesta HTTP
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="simulacion_{simulacion.id}.pdf"'
-    response.write(pdf)
-    
+    if archivo is None:
+        context = {
+            'simulacion': simulacion,
+            'titulo': 'Generando PDF'
+        }
+        return render(request, 'simulacion/generando_pdf.html', context, status=202)
+
+    return reportes.respuesta_pdf(request, archivo, f'simulacion_{simulacion.id}')
+
+
+# Vista para exportar varias simulaciones a un ZIP de PDF
+@login_required
+@require_POST
+def exportar_zip(request):
+    """
+    Exporta las simulaciones seleccionadas en un único archivo ZIP.
+    Los PDF se generan en paralelo y el ZIP se envía por partes a medida
+    que cada reporte está listo, también bajo ASGI.
+    """
+    ids = request.POST.getlist('simulaciones')
+    simulaciones = (
+        Simulacion.objects
+        .filter(usuario=request.user, pk__in=[i for i in ids if i.isdigit()])
+        .select_related('tipo_alga', 'usuario')
+        .order_by('pk')
+    )
+    if not simulaciones.exists():
+        messages.warning(request, 'Seleccione al menos una simulación para exportar.')
+        return redirect('lista_simulaciones')
+
+    datos = (reportes.datos_reporte(simulacion) for simulacion in simulaciones.iterator(chunk_size=200))
+    response = StreamingHttpResponse(
+        exportacion.contenido_para(request, reportes.generar_zip(datos)), content_type='application/zip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="simulaciones.zip"'
     return response
+
+
+# Vista para exportar la cartera de simulaciones del usuario a PDF
+@login_required
+async def exportar_cartera(request):
+    """
+    Exporta todas las simulaciones del usuario en un solo PDF, con los
+    totales por tipo de alga y el detalle paginado. Se genera página por
+    página en un archivo temporal (ver pdf.renderizar_cartera), en el
+    grupo de hilos de las carteras; mientras tanto la petición no ocupa
+    ningún hilo.
+    """
+    usuario = await _usuario(request)
+    simulaciones = Simulacion.objects.filter(usuario=usuario).order_by('-creado_en', '-id')
+    if not reportes.cartera_admitida(await simulaciones.acount()):
+        messages.warning(
+            request,
+            f'La cartera tiene más de {settings.PDF_CARTERA_MAXIMO} simulaciones, '
+            'demasiadas para un PDF. Expórtela en CSV o NDJSON.'
+        )
+        return redirect('lista_simulaciones')
+    return await reportes.arespuesta_cartera(request, simulaciones, f'Cartera de {usuario.username}', 'cartera')
+
+
+# Vista para descargar la curva de biomasa diaria
+@login_required
+def curva_biomasa(request, pk):
+    """
+    Entrega la biomasa diaria de una simulación en CSV o NDJSON
+    (?formato=ndjson). El contenido se genera y envía por bloques, también
+    bajo ASGI.
+    """
+    simulacion = get_object_or_404(
+        Simulacion.objects.only('id', 'fecha_inicio_cultivo', 'curva_biomasa'),
+        pk=pk,
+        usuario=request.user
+    )
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacion.GENERADORES:
+        formato = 'csv'
+
+    return exportacion.respuesta_streaming(
+        formato,
+        ['dia', 'fecha', 'toneladas'],
+        exportacion.bloques_biomasa(simulacion),
+        f'biomasa_simulacion_{simulacion.id}',
+        request,
+    )
+
+
+# Vista para exportar las simulaciones del usuario en CSV o NDJSON
+@login_required
+def exportar_simulaciones(request):
+    """
+    Exporta todas las simulaciones del usuario en CSV o NDJSON
+    (?formato=ndjson). El archivo se envía por partes a medida que se lee
+    la base de datos, sin importar cuántas simulaciones tenga el usuario,
+    tanto bajo WSGI como bajo ASGI (ver exportacion.contenido_para).
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacion.GENERADORES:
+        formato = 'csv'
+
+    simulaciones = Simulacion.objects.filter(usuario=request.user).order_by('-creado_en', '-id')
+    return exportacion.exportar_simulaciones(simulaciones, formato, request=request)
+
+
+# Vista con la ocupación diaria de las líneas de cultivo
+@login_required
+def calendario_ocupacion(request):
+    """
+    Toneladas en cultivo por día y tipo de alga en un rango de fechas
+    (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&tipo_alga=id), en JSON.
+    Se lee desde la tabla de ocupación diaria.
+    """
+    try:
+        desde = date.fromisoformat(request.GET['desde']) if 'desde' in request.GET else date.today()
+        hasta = date.fromisoformat(request.GET['hasta']) if 'hasta' in request.GET else desde + timedelta(days=90)
+        tipo_alga_id = int(request.GET['tipo_alga']) if request.GET.get('tipo_alga') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+    if hasta < desde or (hasta - desde).days > 3660:
+        return JsonResponse({'error': 'El rango de fechas debe ser válido y de hasta 10 años.'}, status=400)
+
+    dias = [
+        {'fecha': fecha.isoformat(), 'tipo_alga': tipo, 'toneladas': str(toneladas)}
+        for fecha, tipo, toneladas in ocupacion_en_rango(desde, hasta, tipo_alga_id)
+    ]
+    return JsonResponse({'desde': desde.isoformat(), 'hasta': hasta.isoformat(), 'dias': dias})
+
+
+# Vista con el tablero de producción mensual
+@login_required
+def tablero_produccion(request):
+    """
+    Toneladas plantadas y entregadas por mes de un año (?anio=), agrupadas
+    por tipo de alga o, para usuarios staff, por usuario (?agrupar=usuario).
+    Los usuarios staff ven la producción de todos; los demás, la propia.
+    Se lee desde la tabla de producción mensual, no desde las simulaciones.
+    """
+    try:
+        anio = min(max(int(request.GET.get('anio', '')), 1), 9999)
+    except ValueError:
+        anio = date.today().year
+    agrupar = 'usuario' if request.user.is_staff and request.GET.get('agrupar') == 'usuario' else 'tipo_alga'
+    filas = produccion_del_anio(anio, agrupar, None if request.user.is_staff else request.user.pk)
+
+    if agrupar == 'usuario':
+        nombres = dict(User.objects.filter(pk__in={fila[1] for fila in filas}).values_list('pk', 'username'))
+    else:
+        nombres = {pk: tipo.nombre for pk, tipo in catalogo.obtener().tipos.items()}
+
+    meses, totales = [], {}
+    for mes, grupo, plantadas, entregadas, siembras, entregas in filas:
+        if not meses or meses[-1]['mes'] != mes:
+            meses.append({'mes': mes, 'filas': []})
+        nombre = nombres.get(grupo, grupo)
+        meses[-1]['filas'].append({
+            'nombre': nombre, 'plantadas': plantadas, 'entregadas': entregadas,
+            'siembras': siembras, 'entregas': entregas,
+        })
+        total = totales.setdefault(grupo, {
+            'nombre': nombre, 'plantadas': 0, 'entregadas': 0, 'siembras': 0, 'entregas': 0,
+        })
+        total['plantadas'] += plantadas
+        total['entregadas'] += entregadas
+        total['siembras'] += siembras
+        total['entregas'] += entregas
+
+    return render(request, 'simulacion/tablero_produccion.html', {
+        'anio': anio,
+        'agrupar': agrupar,
+        'meses': meses,
+        'totales': sorted(totales.values(), key=lambda total: str(total['nombre'])),
+    })
+
+
+# Vista para calcular qué se puede entregar con lo que hay para plantar
+@login_required
+def solver_entregas(request):
+    """
+    Problema inverso de la simulación: dadas las toneladas disponibles para
+    plantar (?toneladas=), desde una fecha de siembra (?inicio=, por defecto
+    hoy) y durante los próximos meses (?meses=, por defecto 6), entrega para
+    cada tipo de alga y cada fecha de siembra (?paso= días) la fecha de
+    entrega y las toneladas entregables, en JSON.
+    """
+    try:
+        toneladas = Decimal(request.GET.get('toneladas', ''))
+        inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else date.today()
+        meses = int(request.GET.get('meses', 6))
+        paso = int(request.GET.get('paso', 1))
+    except (InvalidOperation, ValueError):
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+    if not toneladas.is_finite() or toneladas <= 0 or toneladas >= Decimal('1e8'):
+        return JsonResponse({'error': 'Las toneladas deben ser un número positivo.'}, status=400)
+    if not 1 <= meses <= 36 or not 1 <= paso <= 31:
+        return JsonResponse({'error': 'Meses debe estar entre 1 y 36 y paso entre 1 y 31.'}, status=400)
+
+    toneladas_centesimas = int(toneladas.quantize(Decimal('0.01'), rounding=ROUND_DOWN) * 100)
+    return JsonResponse(analisis.resolver_entregas(toneladas_centesimas, inicio, meses, paso))
+
+
+# Vista para comparar alternativas de simulación en una grilla
+@login_required
+def barrido_simulaciones(request):
+    """
+    Calcula las toneladas a plantar para todas las combinaciones de
+    toneladas deseadas (?toneladas_desde=&toneladas_hasta=&toneladas_paso=),
+    fechas objetivo (?fecha_desde=&fecha_hasta=&paso_dias=, por defecto el
+    próximo año), tipos de alga y variaciones de la pérdida en puntos
+    porcentuales (?variaciones=-5,0,5), en JSON (ver analisis.barrido).
+    """
+    try:
+        toneladas = [
+            Decimal(request.GET.get(nombre, defecto))
+            for nombre, defecto in (('toneladas_desde', ''), ('toneladas_hasta', ''), ('toneladas_paso', '1'))
+        ]
+        variaciones = [Decimal(valor) for valor in request.GET.get('variaciones', '0').split(',')]
+        fecha_desde = (
+            date.fromisoformat(request.GET['fecha_desde']) if request.GET.get('fecha_desde')
+            else date.today() + timedelta(days=1)
+        )
+        fecha_hasta = (
+            date.fromisoformat(request.GET['fecha_hasta']) if request.GET.get('fecha_hasta')
+            else fecha_desde + timedelta(days=364)
+        )
+        paso_dias = int(request.GET.get('paso_dias', 1))
+    except (InvalidOperation, ValueError):
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+    if not all(valor.is_finite() for valor in toneladas + variaciones):
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+
+    desde, hasta, paso = (int(valor.quantize(Decimal('0.01'), rounding=ROUND_DOWN) * 100) for valor in toneladas)
+    if not 0 < desde <= hasta < 10 ** 8 or paso <= 0:
+        return JsonResponse(
+            {'error': 'Las toneladas deben ser positivas, con desde <= hasta y un paso positivo.'}, status=400
+        )
+    variaciones = tuple(sorted({int(valor.quantize(Decimal('0.01')) * 100) for valor in variaciones}))
+    if len(variaciones) > 21 or any(abs(valor) > 10000 for valor in variaciones):
+        return JsonResponse({'error': 'Hasta 21 variaciones de la pérdida, entre -100 y 100 puntos.'}, status=400)
+    if fecha_hasta < fecha_desde or (fecha_hasta - fecha_desde).days > 3660 or not 1 <= paso_dias <= 31:
+        return JsonResponse(
+            {'error': 'El rango de fechas debe ser válido y de hasta 10 años, con un paso de 1 a 31 días.'},
+            status=400
+        )
+
+    celdas = (
+        len(catalogo.obtener().tipos) * len(variaciones)
+        * ((fecha_hasta - fecha_desde).days // paso_dias + 1) * ((hasta - desde) // paso + 1)
+    )
+    if celdas > settings.BARRIDO_MAXIMO_CELDAS:
+        return JsonResponse(
+            {'error': f'La grilla tiene {celdas} celdas; el máximo es {settings.BARRIDO_MAXIMO_CELDAS}.'},
+            status=400
+        )
+    return JsonResponse(analisis.barrido((desde, hasta, paso), (fecha_desde, fecha_hasta, paso_dias), variaciones))
+
+
+# Vista con las métricas del proceso para Prometheus
+def exponer_metricas(request):
+    """
+    Métricas en formato de texto de Prometheus. Solo para usuarios staff o
+    para las direcciones de METRICAS_IPS_PERMITIDAS (el servidor Prometheus).
+    """
+    if not (request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.METRICAS_IPS_PERMITIDAS):
+        return HttpResponse('Acceso denegado.', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
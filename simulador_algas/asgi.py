@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simulador_algas.settings')
 
 application = get_asgi_application()
+
+# Con PRECALENTAR_AL_ARRANCAR, todo lo que la primera petición cargaría se
+# carga ahora (ver simulacion/arranque.py)
+from simulacion.arranque import precalentar  # noqa: E402
+
+precalentar()
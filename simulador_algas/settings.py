@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'simulacion.metricas.MetricasMiddleware',  # Primero, para medir la petición completa
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +81,34 @@ DATABASES = {
     }
 }
 
+# Ajustes de SQLite para atender con varios hilos. No se aplican en
+# desarrollo: el modo WAL queda grabado en el archivo de la base de datos.
+# Los aplica settings_produccion.py, y prueba_concurrencia y prueba_carga
+# sobre su base de datos temporal.
+# escritura.py pone en fila las escrituras solo dentro de un proceso; con
+# varios workers las ordena SQLite (IMMEDIATE y 'timeout'), por lo que una
+# escritura que espera más que 'timeout' falla con "database is locked".
+SQLITE_CONCURRENTE = {
+    # Conexiones persistentes: se reutilizan entre peticiones
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # Segundos que una escritura espera el bloqueo antes de fallar
+        'timeout': 20,
+        # Las transacciones toman el bloqueo de escritura al comenzar, así
+        # dos transacciones nunca se bloquean al pasar de leer a escribir
+        'transaction_mode': 'IMMEDIATE',
+        # WAL: los lectores no bloquean al escritor ni el escritor a los lectores
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA cache_size=-20000;'
+            'PRAGMA temp_store=MEMORY;'
+            'PRAGMA mmap_size=134217728;'
+        ),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,3 +155,83 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Cantidad de simulaciones por página en "Mis Simulaciones"
+SIMULACIONES_POR_PAGINA = 24
+
+# Planificación con capacidad limitada (ver simulacion/planificador.py)
+# Toneladas que caben en el agua al mismo tiempo en las líneas de cultivo
+CAPACIDAD_CULTIVO_TONELADAS = 500
+# Días que una siembra se puede adelantar para liberar capacidad
+ADELANTO_MAXIMO_DIAS = 60
+# Tamaño mínimo de un lote al dividir una siembra
+LOTE_MINIMO_TONELADAS = 1
+
+# Reportes PDF
+# Carpeta donde se guardan los PDF ya generados
+PDF_CACHE_DIR = BASE_DIR / 'cache' / 'pdf'
+# Hilos dedicados a generar PDF en segundo plano
+PDF_WORKERS = 2
+# Hilos que dibujan las carteras PDF, aparte de los anteriores
+PDF_CARTERAS = 1
+# Máximo de simulaciones de una cartera PDF. Cada página de 40 ocupa unos
+# 30 KB hasta terminar el archivo: 20.000 simulaciones son unos 15 MB por
+# cada uno de los PDF_CARTERAS hilos
+PDF_CARTERA_MAXIMO = 20000
+# Procesos para exportaciones ZIP masivas (None = un proceso por núcleo)
+PDF_PROCESOS = None
+# Cómo se inician esos procesos: 'forkserver' o 'spawn'. No usar 'fork': el
+# worker web ya tiene hilos y el proceso hijo heredaría sus candados tomados
+PDF_PROCESOS_INICIO = 'forkserver'
+# Segundos que la petición espera al PDF antes de responder "generando..."
+PDF_ESPERA_SEGUNDOS = 0.5
+
+# Cachés
+# 'fragmentos' guarda las partes ya renderizadas de las páginas de
+# simulaciones; las claves incluyen la versión de cada fila, por lo que no
+# necesitan vencer (las más antiguas se descartan al llenarse)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragmentos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Barrido de alternativas (ver simulacion/analisis.py)
+# Máximo de celdas (tipos × variaciones × fechas × toneladas) de una grilla
+BARRIDO_MAXIMO_CELDAS = 2_000_000
+
+# Catálogo en memoria de tipos de alga y parámetros (ver simulacion/catalogo.py)
+# Archivo con la versión vigente, compartido por todos los procesos
+CATALOGO_VERSION_ARCHIVO = BASE_DIR / 'cache' / 'catalogo.version'
+
+# Admin
+# Filas que se cuentan de forma exacta en la lista de simulaciones; por
+# sobre este número se muestra una estimación
+ADMIN_CONTEO_EXACTO_MAXIMO = 10000
+
+# API JSON (ver simulacion/api.py)
+# Simulaciones por página en la lista de la API
+API_SIMULACIONES_POR_PAGINA = 100
+# Máximo de simulaciones que se pueden crear en una sola petición
+API_MAXIMO_LOTE = 10000
+# Máximo de ensayos Monte Carlo (suma de los ensayos de las simulaciones
+# estocásticas) que se calculan dentro de una sola petición, sea un lote de
+# la API o la acción "Recalcular seleccionadas" del admin. Un millón de
+# ensayos toma del orden de 0,1 s
+MONTECARLO_ENSAYOS_POR_PETICION = 5_000_000
+# Tamaño máximo del cuerpo de una petición, suficiente para un lote completo
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
+# Arranque (ver simulacion/arranque.py)
+# Cargar URL, vistas, plantillas y catálogo antes de la primera petición
+PRECALENTAR_AL_ARRANCAR = False
+
+# Métricas (ver simulacion/metricas.py)
+# Direcciones que pueden leer /metrics sin iniciar sesión
+METRICAS_IPS_PERMITIDAS = ['127.0.0.1', '::1']
@@ -0,0 +1,72 @@
+"""
+Configuración de producción del simulador.
+
+Parte de settings.py y cambia solo lo necesario para atender con DEBUG
+desactivado y con el menor trabajo posible al arrancar y en cada petición:
+
+- SQLite en modo WAL, con transacciones IMMEDIATE y conexiones
+  persistentes (SQLITE_CONCURRENTE en settings.py).
+- Plantillas compiladas una sola vez (cargador en caché) y precargadas al
+  arrancar junto con las URL, las vistas y el catálogo
+  (PRECALENTAR_AL_ARRANCAR, ver simulacion/arranque.py).
+- Sesiones en cookies firmadas: leer la sesión no consulta la base de datos
+  y no se escriben filas de sesión. La caché local es de cada proceso, por
+  lo que no sirve para compartir sesiones entre workers.
+- Archivos estáticos con nombre versionado, comprimidos de antemano y
+  servidos como inmutables (ver simulacion/estaticos.py).
+
+Uso: DJANGO_SETTINGS_MODULE=simulador_algas.settings_produccion, con
+DJANGO_SECRET_KEY y DJANGO_ALLOWED_HOSTS (separados por comas) en el
+entorno, y python manage.py collectstatic antes de arrancar.
+"""
+import os
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE, SQLITE_CONCURRENTE, TEMPLATES
+
+DEBUG = False
+
+# Con sesiones en cookies, quien conozca la clave puede crear sesiones válidas
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Defina DJANGO_SECRET_KEY en el entorno.') from None
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+DATABASES['default']['NAME'] = os.environ.get('DJANGO_BASE_DATOS', DATABASES['default']['NAME'])
+# WAL, transacciones IMMEDIATE y conexiones persistentes
+DATABASES['default'].update(SQLITE_CONCURRENTE)
+
+# Plantillas: se compilan una vez por proceso y no se revisan en disco
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+PRECALENTAR_AL_ARRANCAR = True
+
+# Sesiones
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+# Las cookies solo viajan por HTTPS (DJANGO_COOKIES_SEGURAS=0 para probar sin HTTPS)
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = os.environ.get('DJANGO_COOKIES_SEGURAS', '1') == '1'
+
+# Archivos estáticos
+STATIC_ROOT = Path(os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'simulacion.estaticos.AlmacenEstaticos'},
+}
+# Los estáticos se atienden antes que todo lo demás, sin medirlos como vistas
+MIDDLEWARE = ['simulacion.estaticos.EstaticosMiddleware', *MIDDLEWARE]